@@ -0,0 +1,110 @@
+"""
+Shared helpers for the Jarvis benchmark scripts: latency summaries, result
+files and baseline comparison.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(REPO_DIR, "server")
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def summarize(latencies: List[float], duration: float, errors: int = 0) -> Dict[str, float]:
+    """Latency percentiles (milliseconds) and throughput for one scenario"""
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+        "throughput_per_s": round(len(values) / duration, 2) if duration > 0 else 0.0,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def run_metadata(args) -> Dict:
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": vars(args),
+    }
+
+
+def save_results(name: str, results: Dict, output: Optional[str] = None) -> str:
+    """Write results as JSON (default: benchmarks/results/<name>-<timestamp>.json)"""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{name}-{stamp}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return output
+
+
+def print_table(headers: List[str], rows: List[List]):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) if rows else len(str(h))
+              for i, h in enumerate(headers)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(row, widths)))
+
+
+def compare_to_baseline(baseline_path: str, current: Dict[str, Dict[str, float]],
+                        metrics: List[str], threshold_pct: float) -> bool:
+    """
+    Print per-scenario deltas against a saved result file.
+
+    current and the baseline's "scenarios" map scenario name -> summary. Returns
+    False if any metric got worse by more than threshold_pct (higher is worse
+    for latencies and memory, lower is worse for throughput).
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f).get("scenarios", {})
+    rows, ok = [], True
+    for scenario, summary in current.items():
+        base = baseline.get(scenario)
+        if not base:
+            continue
+        for metric in metrics:
+            if metric not in summary or not base.get(metric):
+                continue
+            delta = (summary[metric] - base[metric]) / base[metric] * 100
+            worse = -delta if metric.startswith("throughput") else delta
+            regressed = worse > threshold_pct
+            ok = ok and not regressed
+            rows.append([scenario, metric, base[metric], summary[metric], f"{delta:+.1f}%",
+                         "REGRESSION" if regressed else ""])
+    print(f"\nComparison with {baseline_path}:")
+    print_table(["scenario", "metric", "baseline", "current", "delta", ""], rows)
+    return ok
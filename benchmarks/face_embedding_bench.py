@@ -0,0 +1,166 @@
+"""
+Accuracy versus latency of the face embedding backends
+
+Reads a fixture set of face photos laid out one directory per person,
+
+    benchmarks/fixtures/faces/<person>/<photo>.jpg
+
+crops the largest face of each photo once (DeepFace's opencv detector), then
+for every backend measures model load time, per-face embedding latency,
+leave-one-out top-1 identification accuracy, and the true/false accept
+rates of same/different-person pairs at the backend's distance threshold:
+
+    python benchmarks/face_embedding_bench.py
+    python benchmarks/face_embedding_bench.py --backend deepface,onnx=models/arcface.onnx
+    python benchmarks/face_embedding_bench.py --quantize models/arcface.onnx
+
+--quantize writes a static int8 copy of an fp32 ONNX model next to it
+(<name>.int8.onnx), calibrated on the fixture faces, and benchmarks the fp32
+and int8 models alongside DeepFace.
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+from common import SERVER_DIR, compare_to_baseline, print_table, run_metadata, save_results, summarize
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "faces")
+
+
+def load_fixtures(directory: str, face_embeddings, detect):
+    """[(person, photo path, face crop)] for every readable photo"""
+    import cv2
+
+    faces = []
+    for person in sorted(os.listdir(directory)):
+        person_dir = os.path.join(directory, person)
+        if not os.path.isdir(person_dir):
+            continue
+        for name in sorted(os.listdir(person_dir)):
+            if not name.lower().endswith(face_embeddings.IMAGE_EXTENSIONS):
+                continue
+            image = cv2.imread(os.path.join(person_dir, name))
+            if image is not None:
+                faces.append((person, name, face_embeddings.largest_face(image, detect(image))))
+    return faces
+
+
+def detect_faces(image):
+    from deepface import DeepFace
+
+    faces = DeepFace.extract_faces(image, detector_backend="opencv", enforce_detection=False, align=False)
+    return [tuple(int(face["facial_area"][k]) for k in ("x", "y", "w", "h"))
+            for face in faces if face.get("confidence", 0) > 0]
+
+
+def make_backend(face_embeddings, spec: str):
+    """Backend for "deepface", "onnx" or "onnx=<model path>" """
+    name, _, model_path = spec.partition("=")
+    if name == face_embeddings.ONNX:
+        return face_embeddings.OnnxBackend(model_path or face_embeddings.ONNX_MODEL_PATH)
+    if name == face_embeddings.DEEPFACE:
+        return face_embeddings.DeepFaceBackend()
+    raise SystemExit(f"Unknown backend: {spec}")
+
+
+def accuracy(people, embeddings, threshold: float):
+    """(top-1 leave-one-out accuracy, true accept rate, false accept rate)"""
+    import numpy as np
+
+    matrix = np.stack(embeddings)
+    distances = 1.0 - matrix @ matrix.T
+    np.fill_diagonal(distances, np.inf)
+    top1 = sum(people[int(np.argmin(row))] == person for row, person in zip(distances, people)) / len(people)
+
+    same = [distances[i, j] for i, j in itertools.combinations(range(len(people)), 2) if people[i] == people[j]]
+    diff = [distances[i, j] for i, j in itertools.combinations(range(len(people)), 2) if people[i] != people[j]]
+    tar = sum(d <= threshold for d in same) / len(same) if same else 0.0
+    far = sum(d <= threshold for d in diff) / len(diff) if diff else 0.0
+    return top1, tar, far
+
+
+def bench_backend(face_embeddings, spec: str, faces):
+    started = time.perf_counter()
+    backend = make_backend(face_embeddings, spec)
+    # First inference builds graphs and allocates buffers; count it as load time
+    backend.represent(faces[0][2])
+    load_seconds = time.perf_counter() - started
+
+    latencies, embeddings = [], []
+    run_started = time.perf_counter()
+    for _, _, face in faces:
+        t0 = time.perf_counter()
+        embeddings.append(backend.represent(face))
+        latencies.append(time.perf_counter() - t0)
+    summary = summarize(latencies, time.perf_counter() - run_started)
+
+    top1, tar, far = accuracy([person for person, _, _ in faces], embeddings, backend.threshold)
+    summary.update({
+        "load_s": round(load_seconds, 3),
+        "threshold": backend.threshold,
+        "top1_accuracy": round(top1, 4),
+        "true_accept_rate": round(tar, 4),
+        "false_accept_rate": round(far, 4),
+    })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare face embedding backends on a fixture set")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="directory with one sub-directory of photos per person")
+    parser.add_argument("--backend", type=lambda s: s.split(","), default=["deepface", "onnx"],
+                        help="comma-separated backends: deepface, onnx or onnx=<model path>")
+    parser.add_argument("--quantize", help="fp32 ONNX model to quantize to int8 on the fixture faces and compare")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/face_embedding_bench-<time>.json)")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=20.0,
+                        help="regression threshold in percent for --baseline (exit 1 if exceeded)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.fixtures):
+        raise SystemExit(f"No fixture set at {args.fixtures} (expected <person>/<photo>.jpg)")
+    sys.path.insert(0, SERVER_DIR)
+    import face_embeddings
+
+    print(f"Cropping faces in {args.fixtures}...")
+    faces = load_fixtures(args.fixtures, face_embeddings, detect_faces)
+    if len(faces) < 2:
+        raise SystemExit("Need at least two fixture photos")
+    print(f"{len(faces)} faces of {len({p for p, _, _ in faces})} people")
+
+    specs = list(args.backend)
+    if args.quantize:
+        quantized = os.path.splitext(args.quantize)[0] + ".int8.onnx"
+        print(f"Quantizing {args.quantize} -> {quantized}...")
+        face_embeddings.quantize_int8(args.quantize, quantized, [face for _, _, face in faces])
+        specs = [s for s in specs if s.partition("=")[0] != face_embeddings.ONNX]
+        specs += [f"onnx={args.quantize}", f"onnx={quantized}"]
+
+    scenarios = {}
+    for spec in specs:
+        print(f"[{spec}] embedding {len(faces)} faces...")
+        try:
+            scenarios[spec] = bench_backend(face_embeddings, spec, faces)
+        except Exception as e:
+            print(f"[{spec}] skipped: {e}")
+
+    headers = ["backend", "load s", "p50 ms", "p95 ms", "top-1", "TAR", "FAR", "threshold"]
+    rows = [[spec, s["load_s"], s["p50_ms"], s["p95_ms"], f"{s['top1_accuracy']:.1%}",
+             f"{s['true_accept_rate']:.1%}", f"{s['false_accept_rate']:.1%}", s["threshold"]]
+            for spec, s in scenarios.items()]
+    print()
+    print_table(headers, rows)
+
+    results = {"benchmark": "face_embedding_bench", **run_metadata(args), "faces": len(faces), "scenarios": scenarios}
+    path = save_results("face_embedding_bench", results, args.output)
+    print(f"\nSaved results to {path}")
+
+    if args.baseline and not compare_to_baseline(args.baseline, scenarios, ["p50_ms", "p95_ms"], args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Micro-benchmark for SettingsManager at scale
+
+Seeds a fresh settings store in a temporary directory with N events and N
+face recognition models for each size in --sizes, times every SettingsManager
+method, and prints a scaling table (median ms per call) with the growth
+exponent between the smallest and largest size (~1.0 means the call is
+linear in the number of stored items):
+
+    python benchmarks/settings_bench.py
+    python benchmarks/settings_bench.py --sizes 10,1000 --repeat 50
+    python benchmarks/settings_bench.py --baseline benchmarks/results/settings_bench-20261019-101500.json
+    python benchmarks/settings_bench.py --backend mongita,sqlite --sizes 1000,10000
+
+Writes keep the store size constant (each saved event or model is deleted
+again), so every repetition runs against N items. With several --backend
+values every backend is seeded and timed the same way and the table gets one
+row per operation and backend.
+"""
+
+import argparse
+import logging
+import math
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+from common import SERVER_DIR, compare_to_baseline, print_table, run_metadata, save_results, summarize
+
+OPERATIONS = (
+    "get_settings",
+    "update_settings",
+    "get_events",
+    "save_event",
+    "update_event",
+    "delete_event",
+    "get_face_recognition_models",
+    "save_face_recognition_model",
+    "delete_face_recognition_model",
+)
+
+
+def load_settings_module(workdir: str):
+    """Import server/settings.py with its module-level store created inside workdir"""
+    # Always benchmark the in-process store, never a multi-worker broker
+    os.environ.pop("JARVIS_SHARED_STATE_ADDRESS", None)
+    # Benchmark stores start empty rather than importing the workdir's ./db
+    os.environ["JARVIS_STORAGE_MIGRATE_FROM"] = ""
+    sys.path.insert(0, SERVER_DIR)
+    os.chdir(workdir)
+    import settings
+    # Deleting models whose image file does not exist logs a warning per call
+    logging.getLogger("jarvis").setLevel(logging.ERROR)
+    return settings
+
+
+def make_event(i) -> dict:
+    return {
+        "id": f"event-{i}",
+        "title": f"Benchmark event {i}",
+        "description": "Seeded by settings_bench.py",
+        "time": "2026-01-01T09:00:00",
+        "completed": False,
+    }
+
+
+def make_model(i) -> dict:
+    return {
+        "id": f"model-{i}",
+        "name": f"Person {i}",
+        "filename": f"model-{i}.jpg",
+        "filepath": os.path.join("faces", f"model-{i}.jpg"),
+        "uploadedAt": "2026-01-01T09:00:00",
+    }
+
+
+def seed(manager, size: int):
+    # One write for the whole array; seeding through save_event would itself be quadratic
+    manager.update_settings({
+        "events": [make_event(i) for i in range(size)],
+        "faceRecognitionModels": [make_model(i) for i in range(size)],
+    })
+
+
+def timed(samples, op, func, *args):
+    started = time.perf_counter()
+    func(*args)
+    samples[op].append(time.perf_counter() - started)
+
+
+def bench_size(settings_module, backend: str, size: int, repeat: int, workdir: str):
+    store_path = os.path.join(workdir, f"{backend}-{size}")
+    if backend == "sqlite":
+        store_path += ".sqlite3"
+    manager = settings_module.SettingsManager(store_path, backend=backend)
+    seed(manager, size)
+    samples = {op: [] for op in OPERATIONS}
+
+    for i in range(repeat):
+        timed(samples, "get_settings", manager.get_settings)
+        timed(samples, "update_settings", manager.update_settings, {"theme": "dark" if i % 2 else "light"})
+        timed(samples, "get_events", manager.get_events)
+        timed(samples, "get_face_recognition_models", manager.get_face_recognition_models)
+
+        event = make_event(f"bench-{uuid.uuid4()}")
+        timed(samples, "save_event", manager.save_event, event)
+        timed(samples, "update_event", manager.update_event, dict(event, completed=True))
+        timed(samples, "delete_event", manager.delete_event, event["id"])
+
+        model = make_model(f"bench-{uuid.uuid4()}")
+        timed(samples, "save_face_recognition_model", manager.save_face_recognition_model, model)
+        timed(samples, "delete_face_recognition_model", manager.delete_face_recognition_model, model["id"])
+
+    manager.store.close()
+    if os.path.isdir(store_path):
+        shutil.rmtree(store_path, ignore_errors=True)
+    else:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(store_path + suffix):
+                os.remove(store_path + suffix)
+    return samples
+
+
+def scenario_key(backend: str, op: str, size: int) -> str:
+    # Mongita keeps the unprefixed keys so earlier result files stay comparable
+    return f"{op}@{size}" if backend == "mongita" else f"{backend}:{op}@{size}"
+
+
+def growth_exponent(sizes, medians):
+    """Slope of log(time) against log(size) between the smallest and largest size"""
+    (n0, t0), (n1, t1) = (sizes[0], medians[0]), (sizes[-1], medians[-1])
+    if n0 == n1 or t0 <= 0 or t1 <= 0:
+        return None
+    return round(math.log(t1 / t0) / math.log(n1 / n0), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SettingsManager operations against store size")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[10, 1000, 10000, 100000],
+                        help="comma-separated numbers of seeded events and face models")
+    parser.add_argument("--backend", type=lambda s: s.split(","), default=["mongita"],
+                        help="comma-separated storage backends to compare (mongita, sqlite)")
+    parser.add_argument("--repeat", type=int, default=10, help="timed calls per operation and size")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/settings_bench-<time>.json)")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=20.0,
+                        help="regression threshold in percent for --baseline (exit 1 if exceeded)")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="jarvis-settings-bench-")
+    try:
+        settings_module = load_settings_module(workdir)
+        scenarios = {}
+        medians = {(backend, op): [] for backend in args.backend for op in OPERATIONS}
+        for backend in args.backend:
+            for size in args.sizes:
+                print(f"[{backend}] Seeding {size} events and face models, {args.repeat} calls per operation...")
+                samples = bench_size(settings_module, backend, size, args.repeat, workdir)
+                for op, values in samples.items():
+                    scenarios[scenario_key(backend, op, size)] = summarize(values, sum(values))
+                    medians[backend, op].append(statistics.median(values))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    headers = ["operation", "backend"] + [f"n={size} ms" for size in args.sizes] + ["growth"]
+    rows, growth = [], {}
+    for op in OPERATIONS:
+        for backend in args.backend:
+            exponent = growth_exponent(args.sizes, medians[backend, op])
+            rows.append([op, backend] + [round(m * 1000, 3) for m in medians[backend, op]] +
+                        [f"n^{exponent}" if exponent is not None else "-"])
+            growth[op if backend == "mongita" else f"{backend}:{op}"] = rows[-1][-1]
+    print()
+    print_table(headers, rows)
+
+    results = {"benchmark": "settings_bench", **run_metadata(args), "scenarios": scenarios, "growth": growth}
+    path = save_results("settings_bench", results, args.output)
+    print(f"\nSaved results to {path}")
+
+    if args.baseline and not compare_to_baseline(args.baseline, scenarios, ["p50_ms", "p95_ms"], args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+WebSocket load test for the Jarvis server
+
+Starts server/main.py on a free port (in a temporary working directory, so the
+real ./db is untouched), drives N concurrent clients against /communicate,
+/info, /hotword and /face_recognition, and reports p50/p95/p99 latency,
+throughput and server memory per connection. Results are saved as JSON and can
+be compared against an earlier run:
+
+    python benchmarks/ws_load.py --clients 50 --duration 20
+    python benchmarks/ws_load.py --baseline benchmarks/results/ws_load-20261019-101500.json
+
+Hotword fixtures are 16 kHz mono 16-bit WAV recordings in --wav-dir; files
+whose name contains "jarvis" are expected to trigger the wake word and also
+measure detection latency. Requires the `websockets` and `psutil` packages.
+"""
+
+import argparse
+import asyncio
+import glob
+import io
+import json
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import wave
+
+import psutil
+
+from common import SERVER_DIR, compare_to_baseline, print_table, run_metadata, save_results, summarize
+
+try:
+    import websockets
+except ImportError:
+    sys.exit("ws_load.py needs the 'websockets' package: pip install websockets")
+
+DEFAULT_WAV_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "audio")
+# Samples per chunk: the browser client sends 4096-sample buffers resampled from 48 kHz to 16 kHz
+CHUNK_SAMPLES = 1365
+SAMPLE_RATE = 16000
+SCENARIOS = ("communicate", "info", "hotword", "face_recognition")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, workdir: str) -> subprocess.Popen:
+    env = dict(os.environ, JARVIS_LOG_LEVEL="WARNING")
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(SERVER_DIR, "main.py"), "--host", "127.0.0.1", "--port", str(port)],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup:\n{process.stderr.read().decode(errors='replace')}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.5)
+    process.kill()
+    raise RuntimeError("Server did not become ready within 120s")
+
+
+def wav_chunk(samples: bytes) -> bytes:
+    """Wrap raw 16-bit PCM in its own WAV container, as the browser client does"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(samples)
+    return buffer.getvalue()
+
+
+def load_fixtures(wav_dir: str):
+    """[(name, expects_wakeword, [chunk bytes, ...])]; synthesized noise if no recordings exist"""
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(wav_dir, "*.wav"))):
+        with wave.open(path, "rb") as wf:
+            if (wf.getnchannels(), wf.getsampwidth(), wf.getframerate()) != (1, 2, SAMPLE_RATE):
+                raise ValueError(f"{path}: fixtures must be 16 kHz mono 16-bit WAV")
+            pcm = wf.readframes(wf.getnframes())
+        step = CHUNK_SAMPLES * 2
+        chunks = [wav_chunk(pcm[i:i + step]) for i in range(0, len(pcm), step)]
+        fixtures.append((os.path.basename(path), "jarvis" in os.path.basename(path).lower(), chunks))
+    if not fixtures:
+        print(f"No WAV fixtures in {wav_dir}; using 3s of synthesized noise (decode load only)")
+        rng = random.Random(0)
+        pcm = struct.pack(f"<{SAMPLE_RATE * 3}h", *(rng.randint(-300, 300) for _ in range(SAMPLE_RATE * 3)))
+        step = CHUNK_SAMPLES * 2
+        fixtures.append(("noise", False, [wav_chunk(pcm[i:i + step]) for i in range(0, len(pcm), step)]))
+    return fixtures
+
+
+async def recv_matching(ws, request_id: str):
+    """Wait for the reply carrying request_id, skipping echoes and broadcasts"""
+    while True:
+        message = await ws.recv()
+        if isinstance(message, bytes):
+            continue
+        try:
+            data = json.loads(message)
+        except ValueError:
+            continue
+        if isinstance(data, dict) and data.get("request_id") == request_id:
+            return data
+
+
+async def communicate_client(base_url, client_id, stop_at, stats, mix):
+    async with websockets.connect(f"{base_url}/communicate", max_size=None) as ws:
+        i = 0
+        while time.perf_counter() < stop_at:
+            request_id = f"{client_id}-{i}"
+            message_type = mix[i % len(mix)]
+            started = time.perf_counter()
+            await ws.send(json.dumps({"type": message_type, "request_id": request_id}))
+            await recv_matching(ws, request_id)
+            stats["latencies"].append(time.perf_counter() - started)
+            i += 1
+
+
+async def face_recognition_client(base_url, client_id, stop_at, stats):
+    async with websockets.connect(f"{base_url}/face_recognition", max_size=None) as ws:
+        i = 0
+        while time.perf_counter() < stop_at:
+            request_id = f"{client_id}-{i}"
+            started = time.perf_counter()
+            await ws.send(json.dumps({"action": "get_models", "request_id": request_id}))
+            await recv_matching(ws, request_id)
+            stats["latencies"].append(time.perf_counter() - started)
+            i += 1
+
+
+async def info_client(base_url, client_id, stop_at, stats):
+    """Latency = time from connect to the first telemetry frame; frames counted as throughput"""
+    started = time.perf_counter()
+    async with websockets.connect(f"{base_url}/info", max_size=None) as ws:
+        first = True
+        while time.perf_counter() < stop_at:
+            try:
+                await asyncio.wait_for(ws.recv(), timeout=max(0.1, stop_at - time.perf_counter()))
+            except asyncio.TimeoutError:
+                break
+            if first:
+                stats["latencies"].append(time.perf_counter() - started)
+                first = False
+            stats["frames"] = stats.get("frames", 0) + 1
+
+
+async def hotword_client(base_url, client_id, stop_at, stats, fixtures, realtime):
+    """Streams fixture chunks; latency = last chunk sent -> wakeword_detected (wake fixtures only)"""
+    chunk_seconds = CHUNK_SAMPLES / SAMPLE_RATE
+    async with websockets.connect(f"{base_url}/hotword", max_size=None) as ws:
+        while time.perf_counter() < stop_at:
+            for name, expects_wake, chunks in fixtures:
+                for chunk in chunks:
+                    await ws.send(chunk)
+                    stats["chunks"] = stats.get("chunks", 0) + 1
+                    if realtime:
+                        await asyncio.sleep(chunk_seconds)
+                if not expects_wake:
+                    continue
+                sent = time.perf_counter()
+                try:
+                    while True:
+                        message = await asyncio.wait_for(ws.recv(), timeout=2.0)
+                        if "wakeword_detected" in str(message):
+                            stats["latencies"].append(time.perf_counter() - sent)
+                            break
+                except asyncio.TimeoutError:
+                    stats["missed_wakewords"] = stats.get("missed_wakewords", 0) + 1
+                if time.perf_counter() >= stop_at:
+                    break
+
+
+async def run_scenario(name, base_url, clients, duration, args, fixtures):
+    stats = {"latencies": []}
+    errors = 0
+    stop_at = time.perf_counter() + duration
+    mix = args.communicate_mix.split(",")
+
+    async def one(client_id):
+        nonlocal errors
+        try:
+            if name == "communicate":
+                await communicate_client(base_url, client_id, stop_at, stats, mix)
+            elif name == "info":
+                await info_client(base_url, client_id, stop_at, stats)
+            elif name == "hotword":
+                await hotword_client(base_url, client_id, stop_at, stats, fixtures, args.realtime)
+            elif name == "face_recognition":
+                await face_recognition_client(base_url, client_id, stop_at, stats)
+        except Exception as e:
+            errors += 1
+            if args.verbose:
+                print(f"{name} client {client_id} failed: {e!r}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+    summary = summarize(stats.pop("latencies"), elapsed, errors)
+    for key, value in stats.items():
+        summary[key] = value
+        summary[f"{key}_per_s"] = round(value / elapsed, 2)
+    return summary
+
+
+async def measure_connection_memory(base_url, server_pid, clients):
+    """Server RSS growth per idle /communicate connection"""
+    process = psutil.Process(server_pid)
+    before = process.memory_info().rss
+    sockets = [await websockets.connect(f"{base_url}/communicate") for _ in range(clients)]
+    await asyncio.sleep(1.0)
+    after = process.memory_info().rss
+    for ws in sockets:
+        await ws.close()
+    return {
+        "connections": clients,
+        "rss_before_mb": round(before / 2**20, 2),
+        "rss_after_mb": round(after / 2**20, 2),
+        "bytes_per_connection": round((after - before) / clients),
+    }
+
+
+async def main_async(args):
+    fixtures = load_fixtures(args.wav_dir) if "hotword" in args.scenarios else []
+    workdir = tempfile.mkdtemp(prefix="jarvis-bench-")
+    server = None
+    if args.url:
+        base_url, server_pid = args.url.rstrip("/"), args.server_pid
+    else:
+        port = free_port()
+        print(f"Starting server on port {port} (workdir {workdir})...")
+        server = start_server(port, workdir)
+        base_url, server_pid = f"ws://127.0.0.1:{port}", server.pid
+
+    scenarios = {}
+    try:
+        for name in args.scenarios:
+            print(f"Running {name}: {args.clients} clients for {args.duration}s...")
+            scenarios[name] = await run_scenario(name, base_url, args.clients, args.duration, args, fixtures)
+        memory = await measure_connection_memory(base_url, server_pid, args.clients) if server_pid else None
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    rows = [[name, s["count"], s["errors"], s["p50_ms"], s["p95_ms"], s["p99_ms"], s["throughput_per_s"]]
+            for name, s in scenarios.items()]
+    print()
+    print_table(["scenario", "count", "errors", "p50 ms", "p95 ms", "p99 ms", "ops/s"], rows)
+    if memory:
+        print(f"\nServer memory: {memory['bytes_per_connection'] / 1024:.1f} KiB per idle connection "
+              f"({memory['rss_before_mb']} -> {memory['rss_after_mb']} MiB with {memory['connections']} connections)")
+
+    results = {"benchmark": "ws_load", **run_metadata(args), "scenarios": scenarios, "memory": memory}
+    path = save_results("ws_load", results, args.output)
+    print(f"\nSaved results to {path}")
+
+    if args.baseline:
+        ok = compare_to_baseline(args.baseline, scenarios,
+                                 ["p50_ms", "p95_ms", "p99_ms", "throughput_per_s"], args.threshold)
+        if not ok:
+            return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Jarvis WebSocket endpoints")
+    parser.add_argument("--clients", type=int, default=20, help="concurrent clients per scenario")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--scenarios", type=lambda s: s.split(","), default=list(SCENARIOS),
+                        help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--communicate-mix", default="get_settings,get_events",
+                        help="message types cycled by /communicate clients")
+    parser.add_argument("--wav-dir", default=DEFAULT_WAV_DIR, help="directory of 16 kHz mono WAV fixtures")
+    parser.add_argument("--realtime", action="store_true", help="pace hotword audio at real-time speed")
+    parser.add_argument("--url", help="benchmark an already running server (e.g. ws://127.0.0.1:8000)")
+    parser.add_argument("--server-pid", type=int, help="pid of the --url server, for memory measurement")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/ws_load-<time>.json)")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="regression threshold in percent for --baseline (exit 1 if exceeded)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
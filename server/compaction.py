@@ -0,0 +1,156 @@
+"""
+Context-size-aware compaction for DeepFinder
+
+Keeps the prompts sent to the local LLM small as a discovery grows:
+search results are deduplicated across every query of a run (same URL or
+near-identical snippet), and text handed from one phase to the next is
+trimmed to a token budget.
+"""
+
+import hashlib
+import re
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Rough chars-per-token ratio for English text; exact counts need the model tokenizer
+CHARS_PER_TOKEN = 4
+
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src")
+_WORD_RE = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = "...") -> str:
+    """Cut text to roughly max_tokens, preferring a word boundary"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    space = cut.rfind(" ")
+    if space > max_chars * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + marker
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form used to spot the same page behind different URLs"""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip().lower()
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if host.startswith("m."):
+        host = host[2:]
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.lower().startswith(_TRACKING_PARAMS)]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("", host, path, urlencode(sorted(query)), ""))
+
+
+def _shingles(text: str, size: int = 3) -> frozenset:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return frozenset([" ".join(words)]) if words else frozenset()
+    return frozenset(" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ResultCompactor:
+    """
+    Per-run filter for search results.
+
+    Drops results whose URL was already returned by an earlier query of the
+    same run, and results whose snippet is a near-duplicate (word-shingle
+    Jaccard similarity) of one already kept. Thread-safe, since parallel
+    search tracks share one compactor.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.7, max_signatures: int = 500):
+        self.similarity_threshold = similarity_threshold
+        self.max_signatures = max_signatures
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._seen_urls = set()
+            self._signatures: List[frozenset] = []
+            self.kept = 0
+            self.duplicate_urls = 0
+            self.near_duplicates = 0
+
+    def compact(self, results: List[Dict]) -> List[Dict]:
+        kept = []
+        with self._lock:
+            for result in results:
+                url = normalize_url(result.get("url", "") or "")
+                if url and url in self._seen_urls:
+                    self.duplicate_urls += 1
+                    continue
+                signature = _shingles(f"{result.get('title', '')} {result.get('snippet', '')}")
+                if any(_jaccard(signature, seen) >= self.similarity_threshold for seen in self._signatures):
+                    self.near_duplicates += 1
+                    continue
+                if url:
+                    self._seen_urls.add(url)
+                if signature and len(self._signatures) < self.max_signatures:
+                    self._signatures.append(signature)
+                self.kept += 1
+                kept.append(result)
+        return kept
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "kept": self.kept,
+                "duplicate_urls": self.duplicate_urls,
+                "near_duplicates": self.near_duplicates,
+            }
+
+
+def compact_messages(messages: List[str], max_tokens: Optional[int],
+                     exclude: Optional[List[str]] = None) -> str:
+    """
+    Join chat messages into one block that fits max_tokens.
+
+    Exact repeats and excluded texts (e.g. the prompt that started the chat,
+    which already carries the previous phase's output) are dropped. When over
+    budget, the most recent messages are kept, since agent conclusions come at
+    the end of a conversation; the oldest kept message is truncated to fit.
+    """
+    excluded = {hashlib.sha1(text.strip().encode("utf-8")).digest() for text in exclude or []}
+    unique, seen = [], set()
+    for message in messages:
+        text = message.strip()
+        digest = hashlib.sha1(text.encode("utf-8")).digest()
+        if not text or digest in seen or digest in excluded:
+            continue
+        seen.add(digest)
+        unique.append(text)
+
+    if max_tokens is None:
+        return "\n\n".join(unique)
+
+    kept, used = [], 0
+    for text in reversed(unique):
+        tokens = estimate_tokens(text)
+        if used + tokens <= max_tokens:
+            kept.append(text)
+            used += tokens
+            continue
+        remaining = max_tokens - used
+        if remaining > 50:
+            kept.append("..." + truncate_to_tokens(text[::-1], remaining, marker="")[::-1].lstrip())
+        break
+    return "\n\n".join(reversed(kept))
@@ -1,29 +1,65 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
 from fastapi import WebSocket, WebSocketDisconnect
-import logging
+from metrics import send_queue_depth
+from jarvis_logging import get_logger
 
-logger = logging.getLogger(__name__)
+logger = get_logger("connections")
 
 class ConnectionManager:
     """Class defining socket events"""
+    # Bus topic carrying broadcasts between worker processes
+    BROADCAST_TOPIC = "broadcast"
+
     def __init__(self):
         """init method, keeping track of connections"""
         self.active_connections = []
+        # Shared state bus client when running as one of several workers
+        self.bus = None
+        # Other bus topics this worker follows -> handler(topic, payload)
+        self.bus_handlers: Dict[str, Callable[[str, Any], Awaitable[None]]] = {}
+
+    def attach_bus(self, bus, loop, handlers: Optional[Dict[str, Callable[[str, Any], Awaitable[None]]]] = None):
+        """Relay broadcasts (and the topics in handlers) to and from the other workers through the shared state bus"""
+        self.bus = bus
+        self.bus_handlers = dict(handlers or {})
+        bus.start(loop, [self.BROADCAST_TOPIC, *self.bus_handlers], self._on_bus_message)
+
+    async def _on_bus_message(self, topic: str, message: Any):
+        if topic == self.BROADCAST_TOPIC:
+            await self.broadcast(message, local_only=True)
+        elif topic in self.bus_handlers:
+            await self.bus_handlers[topic](topic, message)
+
+    async def broadcast(self, message: str, exclude: WebSocket = None, local_only: bool = False):
+        """Send a message to every connected client, including those of other workers"""
+        for connection in list(self.active_connections):
+            if connection is not exclude:
+                await self.send_personal_message(message, connection)
+        if self.bus is not None and not local_only:
+            self.bus.publish(self.BROADCAST_TOPIC, message)
     
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, subprotocol: Optional[str] = None):
         """connect event"""
-        await websocket.accept()
+        await websocket.accept(subprotocol=subprotocol)
         if websocket not in self.active_connections:
             self.active_connections.append(websocket)
 
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        """Direct Message - handle closed sockets gracefully"""
+    async def send_personal_message(self, message: Union[str, bytes], websocket: WebSocket):
+        """Direct Message (text, or a binary frame for bytes) - handle closed sockets gracefully"""
         try:
             # Check if WebSocket is in active connections before attempting to send
             if websocket not in self.active_connections:
                 logger.debug("Attempted to send message to WebSocket not in active connections")
                 
                 return
-            await websocket.send_text(message)
+            send_queue_depth.inc()
+            try:
+                if isinstance(message, bytes):
+                    await websocket.send_bytes(message)
+                else:
+                    await websocket.send_text(message)
+            finally:
+                send_queue_depth.dec()
         except RuntimeError as e:
             # Raised when a close message has already been sent
             logger.debug("WebSocket send failed (runtime): %s", e)
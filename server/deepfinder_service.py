@@ -0,0 +1,299 @@
+"""
+DeepFinder discovery service
+
+Runs DeepFinder discoveries as background jobs so they can be driven from the
+FastAPI app instead of the interactive CLI in h.py. Jobs are queued on a
+bounded worker pool; each job exposes submit / status / stream / cancel.
+"""
+
+import asyncio
+import os
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel
+
+from jarvis_logging import get_logger
+
+log = get_logger("deepfinder")
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+TERMINAL_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class DiscoveryJob:
+    """A single DeepFinder discovery and its progress log"""
+
+    def __init__(self, name: str, enable_playwright: bool = False, parallel: bool = True):
+        self.id = str(uuid.uuid4())
+        self.name = name
+        self.enable_playwright = enable_playwright
+        self.parallel = parallel
+        self.status = QUEUED
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.report = None
+        self.error = None
+        self.phase = None
+        # Bounded: agent messages are streamed too, and late subscribers only need recent context
+        self.progress = deque(maxlen=500)
+        self.cancel_event = threading.Event()
+        self.future = None
+        self._lock = threading.Lock()
+        # (loop, queue) pairs of websocket streams following this job
+        self._subscribers = []
+
+    def publish(self, entry: Dict[str, Any]):
+        """Record a workflow event and hand it to every live stream (thread-safe)"""
+        with self._lock:
+            if entry.get("type") == "phase_started":
+                self.phase = entry.get("phase")
+            self.progress.append(entry)
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, entry)
+            except RuntimeError:
+                # The subscriber's loop is already closed
+                pass
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop):
+        """Return the progress backlog and a queue receiving every later entry"""
+        queue = asyncio.Queue()
+        with self._lock:
+            backlog = list(self.progress)
+            self._subscribers.append((loop, queue))
+        return backlog, queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s[1] is not queue]
+
+    def set_status(self, status: str, **fields):
+        self.status = status
+        for key, value in fields.items():
+            setattr(self, key, value)
+        self.publish({
+            "type": "status",
+            "status": status,
+            "message": fields.get("error") or status,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    def to_dict(self, include_report: bool = True) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "enable_playwright": self.enable_playwright,
+            "parallel": self.parallel,
+            "status": self.status,
+            "phase": self.phase,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "progress": self.progress[-1] if self.progress else None,
+        }
+        if include_report:
+            data["report"] = self.report
+        return data
+
+
+class DiscoveryJobManager:
+    """Queues DeepFinder jobs on a worker pool with a concurrency cap"""
+
+    def __init__(self, max_workers: int = 2, max_jobs: int = 100):
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="deepfinder")
+        self.jobs: Dict[str, DiscoveryJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, enable_playwright: bool = False, parallel: bool = True) -> DiscoveryJob:
+        """Queue a new discovery and return its job"""
+        job = DiscoveryJob(name, enable_playwright, parallel)
+        with self._lock:
+            self._prune()
+            self.jobs[job.id] = job
+        job.publish({
+            "type": "status",
+            "status": QUEUED,
+            "message": QUEUED,
+            "timestamp": job.created_at
+        })
+        job.future = self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[DiscoveryJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[DiscoveryJob]:
+        return list(self.jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job outright, or ask a running one to stop at the next phase"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status in TERMINAL_STATES:
+            return False
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            # Never started: the worker will not run it, so finish it here
+            job.set_status(CANCELLED, finished_at=datetime.now().isoformat())
+        return True
+
+    async def stream(self, job_id: str):
+        """Async generator yielding the job's progress entries until it finishes"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        backlog, queue = job.subscribe(asyncio.get_running_loop())
+        try:
+            for entry in backlog:
+                yield entry
+            if job.status in TERMINAL_STATES:
+                return
+            while True:
+                entry = await queue.get()
+                yield entry
+                if entry.get("type") == "status" and entry.get("status") in TERMINAL_STATES:
+                    return
+        finally:
+            job.unsubscribe(queue)
+
+    def stats(self) -> Dict[str, int]:
+        """Pool occupancy, for telemetry"""
+        statuses = [job.status for job in self.list()]
+        return {
+            "workers": self.max_workers,
+            "queued": statuses.count(QUEUED),
+            "running": statuses.count(RUNNING),
+            "tracked": len(statuses),
+        }
+
+    def shutdown(self):
+        """Cancel every unfinished job; queued ones get their terminal status event now"""
+        for job in self.list():
+            self.cancel(job.id)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _prune(self):
+        """Forget the oldest finished jobs once the history limit is reached"""
+        if len(self.jobs) < self.max_jobs:
+            return
+        finished = [j for j in self.jobs.values() if j.status in TERMINAL_STATES]
+        finished.sort(key=lambda j: j.finished_at or "")
+        for job in finished[:len(self.jobs) - self.max_jobs + 1]:
+            self.jobs.pop(job.id, None)
+
+    def _run(self, job: DiscoveryJob):
+        """Worker body: runs one discovery synchronously on a pool thread"""
+        if job.cancel_event.is_set():
+            job.set_status(CANCELLED, finished_at=datetime.now().isoformat())
+            return
+        job.set_status(RUNNING, started_at=datetime.now().isoformat())
+        try:
+            # Imported lazily: AutoGen and the search stack are heavy and optional for the server
+            from h import DeepFinder, DiscoveryCancelled
+        except Exception as e:
+            job.set_status(FAILED, error=f"DeepFinder unavailable: {e}",
+                           finished_at=datetime.now().isoformat())
+            return
+
+        try:
+            finder = DeepFinder(
+                interactive=False,
+                progress_callback=job.publish,
+                cancel_event=job.cancel_event,
+                parallel=job.parallel,
+            )
+            report = finder.discover_person(job.name, job.enable_playwright)
+        except DiscoveryCancelled:
+            job.set_status(CANCELLED, finished_at=datetime.now().isoformat())
+            return
+        except Exception as e:
+            log.exception("DeepFinder job %s failed: %s", job.id, e)
+            job.set_status(FAILED, error=str(e), finished_at=datetime.now().isoformat())
+            return
+
+        if job.cancel_event.is_set():
+            job.set_status(CANCELLED, finished_at=datetime.now().isoformat())
+        elif report.get("error"):
+            job.set_status(FAILED, report=report, error=report["error"],
+                           finished_at=datetime.now().isoformat())
+        else:
+            job.set_status(COMPLETED, report=report, finished_at=datetime.now().isoformat())
+
+
+job_manager = DiscoveryJobManager(
+    max_workers=int(os.environ.get("DEEPFINDER_MAX_WORKERS", "2")),
+    max_jobs=int(os.environ.get("DEEPFINDER_MAX_JOBS", "100")),
+)
+
+router = APIRouter(prefix="/deepfinder", tags=["deepfinder"])
+
+
+class DiscoveryRequest(BaseModel):
+    name: str
+    enable_playwright: bool = False
+    # Concurrent web search tracks for Phase 1; False runs the group chat with the
+    # DeepResearch and Wikipedia agents instead (see DeepFinder.run_discovery_workflow)
+    parallel: bool = True
+
+
+@router.post("/jobs", status_code=202)
+async def submit_job(request: DiscoveryRequest):
+    name = request.name.strip()
+    if not name:
+        raise HTTPException(status_code=400, detail="Person name is required")
+    job = job_manager.submit(name, request.enable_playwright, request.parallel)
+    return job.to_dict(include_report=False)
+
+
+@router.get("/jobs")
+async def list_jobs():
+    return {"jobs": [job.to_dict(include_report=False) for job in job_manager.list()]}
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    cancelled = job_manager.cancel(job_id)
+    return {"id": job_id, "cancelled": cancelled, "status": job.status}
+
+
+@router.websocket("/jobs/{job_id}/stream")
+async def stream_job(websocket: WebSocket, job_id: str):
+    await websocket.accept()
+    job = job_manager.get(job_id)
+    if job is None:
+        await websocket.send_json({"type": "error", "error": "Job not found"})
+        await websocket.close()
+        return
+    try:
+        async for entry in job_manager.stream(job_id):
+            await websocket.send_json({"job_id": job_id, **entry})
+        await websocket.send_json({"type": "result", **job.to_dict()})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
@@ -0,0 +1,259 @@
+"""
+Face embedding backends for /face-verification
+
+Recognition compares an embedding of the face in the frame with embeddings
+of the stored face images (FaceIndex), using cosine distance. The embedding
+comes from the backend selected by the "faceEmbeddingBackend" setting:
+
+- "deepface" (default): DeepFace.represent with JARVIS_DEEPFACE_MODEL
+  (VGG-Face), on TensorFlow.
+- "onnx": an ArcFace-style model run by ONNX Runtime on the CPU, from
+  JARVIS_FACE_ONNX_MODEL (models/face_embedding.int8.onnx). quantize_int8()
+  turns an fp32 model into a static int8 (QDQ) one, calibrated on sample
+  faces; benchmarks/face_embedding_bench.py does this and compares accuracy
+  and latency with the default backend.
+
+If the ONNX backend cannot be loaded (onnxruntime missing, no model file) the
+index logs the error and falls back to DeepFace. With several workers a new
+selection is published on the shared state bus and every worker switches.
+"""
+
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from deepface import DeepFace
+
+from jarvis_logging import get_logger
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+log = get_logger("face")
+
+SETTINGS_KEY = "faceEmbeddingBackend"
+DEEPFACE = "deepface"
+ONNX = "onnx"
+BACKENDS = (DEEPFACE, ONNX)
+
+DEEPFACE_MODEL = os.environ.get("JARVIS_DEEPFACE_MODEL", "VGG-Face")
+ONNX_MODEL_PATH = os.environ.get(
+    "JARVIS_FACE_ONNX_MODEL",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "face_embedding.int8.onnx"))
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+Box = Tuple[int, int, int, int]
+
+
+def normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class EmbeddingBackend:
+    name = ""
+    # Cosine distance at or under which two faces are the same person
+    threshold = 0.4
+
+    def represent(self, face: np.ndarray) -> np.ndarray:
+        """L2-normalised embedding of a BGR face crop"""
+        raise NotImplementedError
+
+
+class DeepFaceBackend(EmbeddingBackend):
+    name = DEEPFACE
+    # DeepFace's cosine thresholds for its models
+    THRESHOLDS = {"VGG-Face": 0.68, "Facenet": 0.40, "Facenet512": 0.30, "ArcFace": 0.68, "SFace": 0.593,
+                  "OpenFace": 0.10, "DeepFace": 0.23, "DeepID": 0.015, "GhostFaceNet": 0.65}
+
+    def __init__(self, model_name: str = DEEPFACE_MODEL):
+        self.model_name = model_name
+        self.threshold = self.THRESHOLDS.get(model_name, 0.4)
+
+    def represent(self, face: np.ndarray) -> np.ndarray:
+        result = DeepFace.represent(face, model_name=self.model_name, detector_backend="skip",
+                                    enforce_detection=False)
+        return normalize(result[0]["embedding"])
+
+
+class OnnxBackend(EmbeddingBackend):
+    """ArcFace-style ONNX model: one RGB face in, one embedding out (NCHW or NHWC input)"""
+    name = ONNX
+    threshold = float(os.environ.get("JARVIS_FACE_ONNX_THRESHOLD", "0.68"))
+
+    def __init__(self, model_path: str = ONNX_MODEL_PATH, threads: int = 0):
+        if onnxruntime is None:
+            raise RuntimeError("onnxruntime is not installed")
+        if not os.path.exists(model_path):
+            raise RuntimeError(f"ONNX face model not found: {model_path}")
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads
+        self.model_path = model_path
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        shape = list(model_input.shape)
+        self.channels_first = shape[1] == 3
+        height, width = (shape[2], shape[3]) if self.channels_first else (shape[1], shape[2])
+        # Dynamic dimensions come back as names; ArcFace models take 112x112
+        self.size = (width if isinstance(width, int) else 112, height if isinstance(height, int) else 112)
+
+    def preprocess(self, face: np.ndarray) -> np.ndarray:
+        rgb = cv2.cvtColor(cv2.resize(face, self.size), cv2.COLOR_BGR2RGB).astype(np.float32)
+        batch = ((rgb - 127.5) / 127.5)[np.newaxis]
+        return batch.transpose(0, 3, 1, 2) if self.channels_first else batch
+
+    def represent(self, face: np.ndarray) -> np.ndarray:
+        output = self.session.run(None, {self.input_name: self.preprocess(face)})[0]
+        return normalize(output[0])
+
+
+def create_backend(name: str) -> EmbeddingBackend:
+    if name == ONNX:
+        return OnnxBackend()
+    return DeepFaceBackend()
+
+
+def quantize_int8(model_path: str, output_path: str, faces: List[np.ndarray]):
+    """Write a static int8 (QDQ) copy of an fp32 ONNX face model, calibrated on BGR face crops"""
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    backend = OnnxBackend(model_path)
+
+    class FaceReader(CalibrationDataReader):
+        def __init__(self):
+            self._batches = iter([{backend.input_name: backend.preprocess(face)} for face in faces])
+
+        def get_next(self):
+            return next(self._batches, None)
+
+    quantize_static(model_path, output_path, FaceReader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QInt8, weight_type=QuantType.QInt8, per_channel=True)
+
+
+def largest_face(image: np.ndarray, boxes: List[Box]) -> np.ndarray:
+    """Crop of the largest box, or the whole image if no face was found"""
+    if not boxes:
+        return image
+    x, y, w, h = max(boxes, key=lambda b: b[2] * b[3])
+    return image[y:y + h, x:x + w]
+
+
+class FaceIndex:
+    """Embeddings of the stored face images for the selected backend, kept in sync with the directory"""
+    # Shared state bus topic carrying backend selections
+    BUS_TOPIC = "face_embedding_backend"
+
+    def __init__(self, directory: str, detect: Callable[[np.ndarray], List[Box]]):
+        self.directory = directory
+        self.detect = detect
+        self.backend_name = DEEPFACE
+        self._backend: Optional[EmbeddingBackend] = None
+        self._lock = threading.Lock()
+        # path -> (mtime, embedding)
+        self._embeddings: Dict[str, Tuple[float, np.ndarray]] = {}
+        self._paths: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        self.bus = None
+        # Selections received on the bus before load(); None once loaded
+        self._early_names: Optional[List[str]] = []
+
+    def load(self, settings: Dict[str, Any]):
+        self._select(settings.get(SETTINGS_KEY) or DEEPFACE)
+        early, self._early_names = self._early_names or [], None
+        for name in early:
+            self._select(name)
+
+    def attach_bus(self, bus):
+        """Publish selections to the other workers (pair with on_bus_message)"""
+        self.bus = bus
+
+    async def on_bus_message(self, topic: str, name: str):
+        """Switch to a backend selected through another worker"""
+        if topic != self.BUS_TOPIC:
+            return
+        if self._early_names is not None:
+            self._early_names.append(name)
+        else:
+            self._select(name)
+
+    def select(self, name: Any) -> bool:
+        """Switch backend in every worker; stored images are embedded again on the next match"""
+        changed = self._select(name)
+        name = str(name).lower()
+        if self.bus is not None and name in BACKENDS:
+            self.bus.publish(self.BUS_TOPIC, name)
+        return changed
+
+    def _select(self, name: Any) -> bool:
+        name = str(name).lower()
+        if name not in BACKENDS:
+            log.warning("Unknown face embedding backend %s", name)
+            return False
+        with self._lock:
+            if name == self.backend_name:
+                return False
+            self.backend_name = name
+            self._backend = None
+            self._embeddings, self._paths, self._matrix = {}, [], None
+        log.info("Face embedding backend selected", extra={"backend": name})
+        return True
+
+    def _get_backend(self) -> EmbeddingBackend:
+        if self._backend is None:
+            try:
+                self._backend = create_backend(self.backend_name)
+            except Exception as e:
+                log.error("Could not load %s face embedding backend, using DeepFace: %s", self.backend_name, e)
+                self.backend_name = DEEPFACE
+                self._backend = DeepFaceBackend()
+        return self._backend
+
+    def _refresh(self, backend: EmbeddingBackend):
+        """Embed new or changed images and forget deleted ones"""
+        current = {}
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    current[entry.path] = entry.stat().st_mtime
+        changed = False
+        for path in list(self._embeddings):
+            if path not in current:
+                del self._embeddings[path]
+                changed = True
+        for path, mtime in current.items():
+            known = self._embeddings.get(path)
+            if known is not None and known[0] == mtime:
+                continue
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            try:
+                self._embeddings[path] = (mtime, backend.represent(largest_face(image, self.detect(image))))
+                changed = True
+            except Exception as e:
+                log.warning("Could not embed face image %s: %s", path, e)
+        if changed or self._matrix is None:
+            self._paths = list(self._embeddings)
+            self._matrix = np.stack([self._embeddings[p][1] for p in self._paths]) if self._paths else None
+
+    def match(self, image: np.ndarray, box: Box) -> Tuple[Optional[str], Optional[float]]:
+        """(stored image path, cosine distance) of the closest face under the threshold, else (None, None)"""
+        with self._lock:
+            backend = self._get_backend()
+            self._refresh(backend)
+            paths, matrix = self._paths, self._matrix
+        if matrix is None:
+            return None, None
+        x, y, w, h = box
+        distances = 1.0 - matrix @ backend.represent(image[y:y + h, x:x + w])
+        best = int(np.argmin(distances))
+        if distances[best] > backend.threshold:
+            return None, None
+        return paths[best], float(distances[best])
@@ -0,0 +1,104 @@
+"""
+Ingestion of uploaded face images
+
+Uploads are content-addressed: the SHA-256 of the uploaded bytes names the
+files, so uploading the same photo again reuses what is already stored (and
+the face index, which is keyed by file, does not embed it a second time).
+Each new image is decoded once and stored twice:
+
+- faces/<hash>.jpg: the working copy recognition reads. It is orientation
+  corrected, 8-bit BGR and downscaled so its longer side is at most
+  FACE_WORKING_SIZE pixels.
+- faces/originals/<hash><ext>: the upload as received, kept so working
+  copies can be regenerated.
+
+Files are written to a temporary name and renamed into place, so a reader
+never sees a partial image.
+
+Configuration (environment):
+    JARVIS_FACE_WORKING_SIZE   longest side of working copies in pixels (640)
+"""
+
+import hashlib
+import os
+import re
+import threading
+from typing import Any, Dict
+
+import cv2
+import numpy as np
+
+from jarvis_logging import get_logger
+
+log = get_logger("face")
+
+FACE_WORKING_SIZE = int(os.environ.get("JARVIS_FACE_WORKING_SIZE", "640"))
+WORKING_JPEG_QUALITY = 90
+ORIGINALS_DIR = "originals"
+
+# One ingestion at a time per process, so concurrent uploads of one image write it once
+_lock = threading.Lock()
+
+
+class InvalidImageError(ValueError):
+    """Uploaded bytes that are not a decodable image"""
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_atomic(path: str, data: bytes):
+    temporary = f"{path}.tmp-{threading.get_ident()}"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def working_copy(image: np.ndarray) -> np.ndarray:
+    """Downscale so the longer side is at most FACE_WORKING_SIZE (never upscales)"""
+    height, width = image.shape[:2]
+    scale = FACE_WORKING_SIZE / float(max(height, width))
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def ingest_face_image(data: bytes, directory: str, extension: str = ".jpg") -> Dict[str, Any]:
+    """Store an uploaded image (once per content) and describe it for the face model record"""
+    digest = content_hash(data)
+    if not (isinstance(extension, str) and re.fullmatch(r"\.[A-Za-z0-9]{1,5}", extension)):
+        extension = ".jpg"
+    filename = f"{digest}.jpg"
+    file_path = os.path.join(directory, filename)
+    original_path = os.path.join(directory, ORIGINALS_DIR, f"{digest}{extension.lower()}")
+
+    with _lock:
+        reused = os.path.exists(file_path)
+        if not reused:
+            # IMREAD_COLOR applies EXIF orientation and always yields 8-bit BGR
+            image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise InvalidImageError("Uploaded file is not a decodable image")
+            working = working_copy(image)
+            ok, encoded = cv2.imencode(".jpg", working, [cv2.IMWRITE_JPEG_QUALITY, WORKING_JPEG_QUALITY])
+            if not ok:
+                raise InvalidImageError("Could not encode the working copy")
+            os.makedirs(os.path.dirname(original_path), exist_ok=True)
+            _write_atomic(original_path, data)
+            _write_atomic(file_path, encoded.tobytes())
+            log.info("Stored face image", extra={
+                "content_hash": digest,
+                "original_bytes": len(data),
+                "working_bytes": len(encoded),
+                "size": f"{working.shape[1]}x{working.shape[0]}",
+            })
+
+    return {
+        'content_hash': digest,
+        'filename': filename,
+        'filepath': file_path,
+        'original_filepath': original_path,
+        'reused': reused,
+    }
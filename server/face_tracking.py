@@ -0,0 +1,143 @@
+"""
+Face tracking for /face-verification
+
+Consecutive webcam frames nearly always show the same faces in nearly the
+same place, so FaceTracker only runs detection and recognition when it has
+to. Each recognised face becomes a track: its box, identity and a grayscale
+template cut at recognition time. On the next frames the template is found
+again with normalised cross-correlation in a window around the last box,
+which costs a fraction of a detector pass, and the identity is reused.
+
+A track is verified again (detection, then recognition for that face only)
+when it is
+- lost: the template match falls below TRACK_LOST_SCORE,
+- drifting: the match falls below TRACK_DRIFT_SCORE, or
+- old: it was last recognised more than TRACK_MAX_AGE seconds ago.
+On such a pass, detected faces that overlap a still-healthy track keep its
+identity; only new or failing faces are recognised. New faces entering the
+picture are picked up on the next detection pass (at the latest after
+TRACK_MAX_AGE seconds).
+
+Configuration (environment):
+    JARVIS_FACE_TRACK_MAX_AGE      seconds before a track is recognised again (2)
+    JARVIS_FACE_TRACK_DRIFT_SCORE  match score below which a track is re-verified (0.75)
+"""
+
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from metrics import face_frames
+
+Box = Tuple[int, int, int, int]
+# image -> face boxes (x, y, w, h)
+Detector = Callable[[np.ndarray], List[Box]]
+# image, box -> (identity, distance), (None, None) if nobody matched
+Recognizer = Callable[[np.ndarray, Box], Tuple[Optional[str], Optional[float]]]
+
+TRACK_MAX_AGE = float(os.environ.get("JARVIS_FACE_TRACK_MAX_AGE", "2"))
+TRACK_DRIFT_SCORE = float(os.environ.get("JARVIS_FACE_TRACK_DRIFT_SCORE", "0.75"))
+TRACK_LOST_SCORE = 0.5
+# Search window around the last box, as a fraction of the box size on each side
+SEARCH_MARGIN = 0.5
+# Overlap for a detected face to be the same as a tracked one
+MATCH_IOU = 0.4
+
+
+def iou(a: Box, b: Box) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+class Track:
+    __slots__ = ("box", "identity", "distance", "template", "verified_at", "score")
+
+    def __init__(self, box: Box, identity: Optional[str], distance: Optional[float], gray: np.ndarray, now: float):
+        x, y, w, h = box
+        self.box = box
+        self.identity = identity
+        self.distance = distance
+        self.template = gray[y:y + h, x:x + w].copy()
+        self.verified_at = now
+        self.score = 1.0
+
+    def to_dict(self, tracked: bool) -> Dict[str, Any]:
+        return {
+            "box": list(self.box),
+            "identity": self.identity,
+            "distance": self.distance,
+            "tracked": tracked,
+        }
+
+
+class FaceTracker:
+    """Per-connection face tracks; process() is synchronous (run it off the event loop)"""
+
+    def __init__(self, detect: Detector, recognize: Recognizer, max_age: float = TRACK_MAX_AGE,
+                 drift_score: float = TRACK_DRIFT_SCORE):
+        self.detect = detect
+        self.recognize = recognize
+        self.max_age = max_age
+        self.drift_score = drift_score
+        self.tracks: List[Track] = []
+
+    def _follow(self, track: Track, gray: np.ndarray) -> bool:
+        """Move the track to its best template match; False if it is lost"""
+        x, y, w, h = track.box
+        mx, my = int(w * SEARCH_MARGIN), int(h * SEARCH_MARGIN)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(gray.shape[1], x + w + mx), min(gray.shape[0], y + h + my)
+        window = gray[y0:y1, x0:x1]
+        th, tw = track.template.shape[:2]
+        if window.shape[0] < th or window.shape[1] < tw or tw == 0 or th == 0:
+            track.score = 0.0
+            return False
+        result = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, location = cv2.minMaxLoc(result)
+        track.score = float(score)
+        if score < TRACK_LOST_SCORE:
+            return False
+        track.box = (x0 + location[0], y0 + location[1], tw, th)
+        return True
+
+    def _healthy(self, track: Track, now: float) -> bool:
+        return track.score >= self.drift_score and now - track.verified_at < self.max_age
+
+    def process(self, image: np.ndarray) -> Tuple[List[Dict[str, Any]], bool]:
+        """(faces in this frame, whether detection ran)"""
+        now = time.monotonic()
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        followed = [t for t in self.tracks if self._follow(t, gray)]
+
+        if followed and len(followed) == len(self.tracks) and all(self._healthy(t, now) for t in followed):
+            face_frames.labels("tracked").inc()
+            return [t.to_dict(tracked=True) for t in followed], False
+
+        face_frames.labels("detected").inc()
+        healthy = [t for t in followed if self._healthy(t, now)]
+        tracks, faces = [], []
+        for box in self.detect(image):
+            known = max(healthy, key=lambda t: iou(t.box, box), default=None)
+            if known is not None and iou(known.box, box) >= MATCH_IOU:
+                # Same face as a healthy track: keep its identity, skip recognition
+                healthy.remove(known)
+                known.box = box
+                tracks.append(known)
+                faces.append(known.to_dict(tracked=True))
+                continue
+            face_frames.labels("recognized").inc()
+            identity, distance = self.recognize(image, box)
+            track = Track(box, identity, distance, gray, now)
+            tracks.append(track)
+            faces.append(track.to_dict(tracked=False))
+        self.tracks = tracks
+        return faces, True
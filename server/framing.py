@@ -0,0 +1,108 @@
+"""
+WebSocket message framing: JSON text or MessagePack binary
+
+JSON text frames stay the default. A client opts in to MessagePack at connect,
+either with the "jarvis.msgpack" WebSocket subprotocol or ?format=msgpack.
+The server then answers with a {"type": "protocol", "format": ...} frame, and
+encodes its responses as binary MessagePack frames. Binary fields (bytes)
+travel as-is, so a face upload can carry its image inside the request:
+
+    {"type": "face_recognition", "action": "save_model", "request_id": "...",
+     "payload": {"name": "...", "extension": ".jpg", "image": <bytes>}}
+
+Text frames are always decoded as JSON, so a MessagePack connection can still
+send JSON. If the msgpack package is not installed the server stays on JSON
+and says so in the protocol frame.
+"""
+
+import json
+from typing import Any, Optional, Tuple, Union
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from jarvis_logging import get_logger
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+log = get_logger("framing")
+
+JSON = "json"
+MSGPACK = "msgpack"
+SUBPROTOCOL = "jarvis.msgpack"
+
+
+class FrameDecodeError(ValueError):
+    """A frame that is neither JSON nor, on a MessagePack connection, MessagePack"""
+
+
+class Codec:
+    def __init__(self, format: str = JSON):
+        self.format = format
+
+    def encode(self, message: Any) -> Union[str, bytes]:
+        if self.format == MSGPACK:
+            return msgpack.packb(message, use_bin_type=True, default=str)
+        return json.dumps(message)
+
+    def decode(self, frame: Union[str, bytes]) -> Tuple[Optional[Any], Any]:
+        """(decoded request or None if it is not structured, the value to echo back)"""
+        if isinstance(frame, str):
+            try:
+                return json.loads(frame), frame
+            except json.JSONDecodeError:
+                return None, frame
+        if self.format == MSGPACK:
+            try:
+                request = msgpack.unpackb(frame, raw=False)
+                return request, request
+            except Exception as e:
+                log.debug("Undecodable MessagePack frame: %s", e)
+        return None, f"<{len(frame)} bytes>"
+
+    def decode_request(self, frame: Union[str, bytes]) -> Any:
+        request, _ = self.decode(frame)
+        if request is None:
+            raise FrameDecodeError("Invalid message format")
+        return request
+
+
+JSON_CODEC = Codec(JSON)
+
+
+def negotiate(websocket: WebSocket) -> Tuple[Codec, Optional[str], bool]:
+    """(codec, subprotocol to accept, whether the client asked for MessagePack)"""
+    offered = SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    requested = offered or websocket.query_params.get("format", "").lower() == MSGPACK
+    if requested and msgpack is None:
+        log.warning("Client asked for MessagePack but msgpack is not installed; using JSON")
+        return JSON_CODEC, None, True
+    if requested:
+        return Codec(MSGPACK), SUBPROTOCOL if offered else None, True
+    return JSON_CODEC, None, False
+
+
+def codec_for(websocket: WebSocket) -> Codec:
+    return getattr(websocket.state, "codec", JSON_CODEC)
+
+
+async def accept(manager, websocket: WebSocket) -> Codec:
+    """Connect through the manager with the negotiated framing; the codec is kept on websocket.state"""
+    codec, subprotocol, requested = negotiate(websocket)
+    await manager.connect(websocket, subprotocol=subprotocol)
+    websocket.state.codec = codec
+    if requested:
+        await manager.send_personal_message(codec.encode({"type": "protocol", "format": codec.format}), websocket)
+    return codec
+
+
+async def receive_frame(websocket: WebSocket) -> Union[str, bytes]:
+    """Next text or binary frame"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("text") is not None:
+        return message["text"]
+    return message.get("bytes") or b""
@@ -6,8 +6,11 @@ Scans and compiles publicly available information across the web and social medi
 
 import os
 import json
+import logging
+import time
+import threading
 import warnings
-from typing import Dict, List, Optional, Annotated
+from typing import Callable, Dict, List, Optional, Annotated
 from datetime import datetime
 
 # Suppress warnings
@@ -32,16 +35,33 @@ from ddgs import DDGS
 import requests
 from bs4 import BeautifulSoup
 
+from jarvis_logging import get_logger
+from llm_cache import new_usage, shared_cache
+from phase_scheduler import PhaseScheduler
+from compaction import ResultCompactor, compact_messages, estimate_tokens, truncate_to_tokens
+
+
+log = get_logger("deepfinder")
+
+
+def _console(interactive: bool, message: str, level: int = logging.INFO, **fields):
+    """Print a console line in the CLI; inside the server, log it as a structured record instead"""
+    if interactive:
+        print(message)
+    else:
+        log.log(level, message.strip(), extra=fields)
 
 
 class SearchEngineManager:
     """Manages multiple search engines for comprehensive information gathering"""
     
-    def __init__(self):
+    def __init__(self, interactive: bool = True):
+        self.interactive = interactive
         try:
             self.ddgs = DDGS()
         except:
-            print("⚠️  Warning: DDGS initialization failed, will use fallback methods")
+            _console(self.interactive, "⚠️  Warning: DDGS initialization failed, will use fallback methods",
+                     logging.WARNING)
             self.ddgs = None
     
     def search_web(self, query: str, max_results: int = 8) -> List[Dict]:
@@ -107,7 +127,7 @@ class SearchEngineManager:
         """Search using Playwright browser automation (when enabled)"""
         results = []
         try:
-            print(f"   🌐 Using Playwright to search: {query[:60]}...")
+            _console(self.interactive, f"   🌐 Using Playwright to search: {query[:60]}...", query=query)
             with sync_playwright() as p:
                 browser = p.chromium.launch(headless=True)
                 context = browser.new_context(
@@ -144,27 +164,154 @@ class SearchEngineManager:
         return results
 
 
+class DiscoveryCancelled(Exception):
+    """Raised inside the workflow when a running discovery has been cancelled"""
+
+
 class DeepFinder:
     """
     DeepFinder - Your Smart AI Search Assistant
     Discover and understand people better with instant insights
     """
     
-    def __init__(self):
-        self.search_manager = SearchEngineManager()
+    # Independent Phase 1 search tracks run concurrently in parallel mode
+    INTELLIGENCE_TRACKS = {
+        "professional": [
+            "LinkedIn profile career",
+            "company job position",
+            "awards achievements recognition",
+            "publications projects",
+        ],
+        "social": [
+            "Twitter social media",
+            "Instagram Facebook profile",
+            "news article interview",
+            "press release announcement",
+        ],
+        "background": [
+            "education university background",
+            "biography about",
+        ],
+    }
+    
+    # Token budget for each phase's output when it is handed to the next phase
+    # (None = unbounded). Parallel intelligence tracks split the intelligence budget.
+    PHASE_TOKEN_BUDGETS = {
+        "intelligence": 3000,
+        "analysis": 1500,
+        "verification": 1500,
+        "insights": None,
+    }
+    # Token budget for one web_search tool reply
+    SEARCH_TOKEN_BUDGET = 600
+    
+    def __init__(self, interactive: bool = True,
+                 progress_callback: Optional[Callable[[Dict], None]] = None,
+                 cancel_event: Optional[threading.Event] = None,
+                 llm_cache=None,
+                 parallel: bool = True):
+        # One search client per thread: parallel tracks search at the same time
+        self._search_managers = threading.local()
         self.person_name = ""
         self.use_playwright = False
+        # When not interactive (e.g. running as a server job) agents never block on input()
+        self.interactive = interactive
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+        # Content-addressed LLM response cache shared by all agents (None disables caching)
+        self.llm_cache = llm_cache if llm_cache is not None else shared_cache()
+        # This run's share of the (process-wide) cache's hits and savings
+        self.cache_usage = new_usage()
+        # Run Phase 1 as concurrent search tracks instead of the group chat (see run_discovery_workflow)
+        self.parallel = parallel
+        # Deduplicates search results across all queries of a run
+        self.compactor = ResultCompactor()
         self.setup_agents()
     
+    @property
+    def search_manager(self) -> SearchEngineManager:
+        """The calling thread's search client (a DDGS session must not be shared between threads)"""
+        manager = getattr(self._search_managers, "manager", None)
+        if manager is None:
+            manager = SearchEngineManager(self.interactive)
+            self._search_managers.manager = manager
+        return manager
+    
+    def _emit(self, event_type: str, message: Optional[str] = None, **fields):
+        """
+        Emit a structured workflow event to the progress callback.
+        
+        Event types: phase_started, phase_finished, search_issued, search_returned,
+        agent_message, partial_insight, human_input, complete, error.
+        The optional message is the human-readable console line for the event;
+        it is printed in the CLI and logged when running as a server job.
+        """
+        if message is not None:
+            scalars = {k: v for k, v in fields.items() if isinstance(v, (str, int, float, bool))}
+            _console(self.interactive, message, logging.ERROR if event_type == "error" else logging.INFO,
+                     event=event_type, **scalars)
+        if self.progress_callback:
+            event = {"type": event_type, "timestamp": datetime.now().isoformat()}
+            if message is not None:
+                event["message"] = message.strip()
+            event.update(fields)
+            try:
+                self.progress_callback(event)
+            except Exception:
+                # Progress reporting must never break the discovery itself
+                pass
+    
+    def _start_phase(self, phase: str, message: str) -> float:
+        """Check for cancellation, announce a phase and return its start time"""
+        self._check_cancelled()
+        self._emit("phase_started", message, phase=phase)
+        return time.perf_counter()
+    
+    def _finish_phase(self, phase: str, started: float, content: str):
+        self._emit("phase_finished", phase=phase,
+                   duration=round(time.perf_counter() - started, 3),
+                   tokens=estimate_tokens(content),
+                   preview=content[:500])
+    
+    def _message_hook(self, sender, message, recipient, silent):
+        """AutoGen process_message_before_send hook: stream agent output as it is produced"""
+        content = message.get("content") if isinstance(message, dict) else message
+        if isinstance(content, str) and content.strip():
+            event_type = "partial_insight" if sender is self.insight_generator else "agent_message"
+            self._emit(event_type, agent=sender.name,
+                       recipient=getattr(recipient, "name", None), content=content)
+        return message
+    
+    def _check_cancelled(self):
+        """Abort the workflow between phases if the job was cancelled"""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise DiscoveryCancelled(f"Discovery of {self.person_name} was cancelled")
+    
+    def _chat(self, sender, recipient, **kwargs):
+        """sender.initiate_chat(recipient) through the LLM cache, releasing requests a failed call left unanswered"""
+        # Server jobs stream agent messages through _message_hook; keep AutoGen's console echo for the CLI
+        kwargs.setdefault("silent", not self.interactive)
+        if self.llm_cache is None:
+            return sender.initiate_chat(recipient, **kwargs)
+        with self.llm_cache.guard(self.cache_usage):
+            return sender.initiate_chat(recipient, cache=self.llm_cache, **kwargs)
+    
     def setup_agents(self):
         """Setup AutoGen AI agents for intelligent analysis"""
         
+        model_config = {
+            "model": os.environ.get("DEEPFINDER_MODEL", "olmo2:latest"),
+            "api_type": "ollama",
+        }
+        if os.environ.get("DEEPFINDER_LLM_HOST"):
+            # e.g. a local stub model server for reproducible runs
+            model_config["client_host"] = os.environ["DEEPFINDER_LLM_HOST"]
         llm_config = {
-            "config_list": [{
-                "model": "olmo2:latest",
-                "api_type": "ollama",
-            }],
+            "config_list": [model_config],
+            # Caching is handled by self.llm_cache, not AutoGen's legacy seed cache
+            "cache_seed": None,
         }
+        self.llm_config = llm_config
         
         # WebIntelligence Agent - Gathers comprehensive web intelligence
         self.web_intelligence_agent = DeepResearchAgent(
@@ -299,11 +446,64 @@ class DeepFinder:
                                     select_speaker_auto_verbose=True
                                     )
         self.group_chat_manager = GroupChatManager(groupchat=self.group_chat)
+        
+        # Forward every agent message to the progress stream while chats are still running
+        for agent in self.group_chat.agents:
+            if hasattr(agent, "register_hook"):
+                agent.register_hook("process_message_before_send", self._message_hook)
+        
+        # Group chat speakers reply outside initiate_chat, so give them the cache directly
+        if self.llm_cache is not None:
+            for agent in self.group_chat.agents + [self.group_chat_manager]:
+                agent.client_cache = self.llm_cache
+    
+    def _make_track_agents(self, track: str):
+        """
+        Fresh researcher/executor pair for one parallel intelligence track.
+        
+        AutoGen agents keep per-conversation state, so tracks running at the
+        same time must not share agents.
+        """
+        researcher = ConversableAgent(
+            name=f"WebIntelligence_{track}",
+            system_message=f"""You are a Web Intelligence Specialist in DeepFinder focused on {track} information.
+            
+            Use the web_search tool for each suggested query, then summarize every concrete,
+            public fact you found with its source URL. Be comprehensive but concise.""",
+            llm_config=self.llm_config,
+            human_input_mode="NEVER",
+        )
+        executor = ConversableAgent(
+            name=f"Coordinator_{track}",
+            system_message="You execute tools for DeepFinder.",
+            llm_config=False,
+            human_input_mode="NEVER",
+        )
+        self._register_web_search(researcher, executor)
+        for agent in (researcher, executor):
+            agent.register_hook("process_message_before_send", self._message_hook)
+        return researcher, executor
+    
+    def _register_web_search(self, caller, executor):
+        def web_search(query: Annotated[str, "Search query to find information"]) -> str:
+            return self.web_search_tool(query)
+        
+        register_function(
+            web_search,
+            caller=caller,
+            executor=executor,
+            name="web_search",
+            description="Search the web for information about people."
+        )
     
     def web_search_tool(self, query: Annotated[str, "Search query to find information"]) -> str:
         """Tool for agents to search the web"""
         
-        print(f"   🔍 Searching: {query[:60]}...")
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            # Tools can't abort the chat directly, so steer the agents to wrap up
+            return "⚠️ Discovery cancelled. Stop searching and end the conversation."
+        
+        self._emit("search_issued", f"   🔍 Searching: {query[:60]}...", query=query)
         
         if self.use_playwright:
             results = self.search_manager.search_with_playwright(query, max_results=8)
@@ -311,17 +511,28 @@ class DeepFinder:
             results = self.search_manager.search_web(query, max_results=8)
         
         if not results:
+            self._emit("search_returned", query=query, count=0, results=[])
             return "⚠️ No results found for this query. Try a different search."
         
-        print(f"   ✓ Found {len(results)} results")
+        found = len(results)
+        # Drop pages and snippets already reported by earlier queries of this run
+        results = self.compactor.compact(results[:8])
+        self._emit("search_returned", f"   ✓ Found {found} results ({len(results)} new)", query=query,
+                   count=found, new=len(results),
+                   results=[{"title": r.get("title", ""), "url": r.get("url", "")} for r in results])
+        
+        if not results:
+            return "⚠️ All results for this query were already reported earlier. Try a different search."
         
-        # Format results
+        # Format results, shrinking snippets so the whole reply stays within budget
+        # (never longer than the former 250-character snippets)
         formatted = []
-        for i, r in enumerate(results[:8], 1):
+        snippet_tokens = max(20, min(62, self.SEARCH_TOKEN_BUDGET // len(results) - 25))
+        for i, r in enumerate(results, 1):
             formatted.append(
                 f"{i}. {r.get('title', 'N/A')}\n"
                 f"   URL: {r.get('url', 'N/A')}\n"
-                f"   Info: {r.get('snippet', 'N/A')[:250]}...\n"
+                f"   Info: {truncate_to_tokens(r.get('snippet') or 'N/A', snippet_tokens)}\n"
             )
         
         return "\n".join(formatted)
@@ -329,6 +540,12 @@ class DeepFinder:
     def human_input_tool(self, question: Annotated[str, "Question for the user"]) -> str:
         """Tool for agents to ask user questions"""
         
+        if not self.interactive:
+            # No human available: let the agents continue with public sources only
+            self._emit("human_input", f"   💬 Skipped question (non-interactive): {question[:60]}...",
+                       question=question, answered=False)
+            return "No answer provided. The user is unavailable; rely on publicly verifiable sources only."
+        
         print(f"\n{'='*70}")
         print("💬 DEEPFINDER NEEDS YOUR INPUT")
         print(f"{'='*70}")
@@ -347,20 +564,11 @@ class DeepFinder:
     def register_tools(self):
         """Register tools with agents"""
         
-        def web_search(query: Annotated[str, "Search query to find information"]) -> str:
-            return self.web_search_tool(query)
-        
         def human_input(question: Annotated[str, "Question for the user"]) -> str:
             return self.human_input_tool(question)
         # Register web_search for all intelligence agents
         for agent in [self.web_intelligence_agent, self.verification_specialist]:
-            register_function(
-                web_search,
-                caller=agent,
-                executor=self.user_proxy,
-                name="web_search",
-                description="Search the web for information about people."
-            )
+            self._register_web_search(agent, self.user_proxy)
         
         # Register human_input for verification
         register_function(
@@ -386,30 +594,119 @@ class DeepFinder:
         self.person_name = name
         self.use_playwright = enable_playwright
         
-        print(f"\n{'='*70}")
-        print(f"🔍 DEEPFINDER - Smart AI Search Assistant")
-        print(f"{'='*70}")
-        print(f"📝 Researching: {name}")
-        print(f"🌐 Method: {'Browser Automation' if enable_playwright else 'Web Search'}")
-        print(f"🤖 AI Agents: Intelligence → Analysis → Verification → Insights")
-        print(f"{'='*70}\n")
+        if self.interactive:
+            print(f"\n{'='*70}")
+            print(f"🔍 DEEPFINDER - Smart AI Search Assistant")
+            print(f"{'='*70}")
+            print(f"📝 Researching: {name}")
+            print(f"🌐 Method: {'Browser Automation' if enable_playwright else 'Web Search'}")
+            print(f"🤖 AI Agents: Intelligence{' (parallel tracks)' if self.parallel else ''} → Analysis → Verification → Insights")
+            print(f"{'='*70}\n")
+        else:
+            log.info("Discovery started", extra={"person": name, "playwright": enable_playwright,
+                                                 "parallel": self.parallel})
+        
+        # Deduplicate search results and count cache savings per run, not across runs
+        self.compactor.reset()
+        self.cache_usage = new_usage()
         
         # Register tools
         self.register_tools()
         
         # Run intelligent discovery workflow
-        print("🚀 Starting AI-Powered Discovery...\n")
+        _console(self.interactive, "🚀 Starting AI-Powered Discovery...\n")
         report = self.run_discovery_workflow(name)
         
         return report
     
     def run_discovery_workflow(self, name: str) -> Dict:
-        """Run the complete AI discovery workflow"""
+        """
+        Run the complete AI discovery workflow
+        
+        Phase 1 (intelligence) depends on self.parallel:
+        - parallel (default): one researcher/executor pair per INTELLIGENCE_TRACKS
+          entry, searching concurrently with web_search only. The
+          DeepResearchAgent and WikipediaAgent of the group chat are not used.
+        - sequential (parallel=False): the original group chat, in which the
+          manager also picks DeepResearchAgent and WikipediaAgent as speakers.
+        Analysis, verification and insights are the same in both modes.
+        """
         
         try:
-            # Phase 1: Web Intelligence Gathering
-            print("🌐 Phase 1: Scanning web and social media...")
-            intelligence_prompt = f"""
+            # Phases form a dependency graph; independent ones run concurrently
+            scheduler = PhaseScheduler(max_workers=len(self.INTELLIGENCE_TRACKS) + 1)
+            if self.parallel:
+                # Phase 1 split into independent search tracks, joined before analysis
+                track_phases = []
+                for track in self.INTELLIGENCE_TRACKS:
+                    phase = f"intelligence_{track}"
+                    scheduler.add(phase, lambda inputs, track=track: self._intelligence_track_phase(name, track))
+                    track_phases.append(phase)
+                scheduler.add("intelligence", self._join_intelligence, deps=track_phases)
+            else:
+                scheduler.add("intelligence", lambda inputs: self._intelligence_phase(name))
+            scheduler.add("analysis",
+                          lambda inputs: self._analysis_phase(name, inputs["intelligence"]),
+                          deps=["intelligence"])
+            scheduler.add("verification",
+                          lambda inputs: self._verification_phase(name, inputs["analysis"]),
+                          deps=["analysis"])
+            scheduler.add("insights",
+                          lambda inputs: self._insights_phase(name, inputs["verification"]),
+                          deps=["verification"])
+            
+            outputs, trace = scheduler.run()
+            intelligence_data = outputs["intelligence"]
+            analyzed_profile = outputs["analysis"]
+            verified_profile = outputs["verification"]
+            final_insights = outputs["insights"]
+            self._emit("workflow_trace",
+                       f"⏱️  Workflow: {trace['wall_time']}s wall, {trace['serial_time']}s of phase work "
+                       f"({trace['speedup']}x), critical path: {' → '.join(trace['critical_path'])}",
+                       trace=trace)
+            
+            # Create structured report
+            report = {
+                "person": name,
+                "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "deepfinder_version": "4.0",
+                "status": "✅ Profile Discovered & Verified",
+                "ai_agents_used": [
+                    "WebIntelligenceAgent",
+                    "ProfileAnalyzer", 
+                    "VerificationSpecialist",
+                    "InsightGenerator"
+                ],
+                "intelligence_data": intelligence_data[:1000] + "...",
+                "analyzed_profile": analyzed_profile[:1000] + "...",
+                "verified_profile": verified_profile[:1000] + "...",
+                "comprehensive_insights": final_insights,
+                "llm_cache": self.llm_cache.stats(self.cache_usage) if self.llm_cache is not None else None,
+                "phase_trace": trace,
+                "compaction": self.compactor.stats(),
+                "tagline": "DeepFinder: Discover and understand people better, anytime, anywhere."
+            }
+            
+            self._emit("complete", "\n✅ Discovery Complete! Profile Ready.\n")
+            
+        except DiscoveryCancelled:
+            raise
+        except Exception as e:
+            self._emit("error", f"\n❌ Error during discovery: {e}", error=str(e))
+            report = {
+                "person": name,
+                "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "status": "❌ Error",
+                "error": str(e),
+                "note": "Please check your Ollama setup and try again."
+            }
+        
+        return report
+    
+    def _intelligence_phase(self, name: str) -> str:
+        """Phase 1 (sequential mode): one group chat covering every search angle"""
+        started = self._start_phase("intelligence", "🌐 Phase 1: Scanning web and social media...")
+        intelligence_prompt = f"""
 DeepFinder Mission: Create a complete picture of {name}
 
 Use web_search tool to discover:
@@ -436,18 +733,62 @@ Use web_search tool to discover:
 
 Gather comprehensive intelligence from all angles.
 """
-            
-            intelligence_chat = self.group_chat_manager.initiate_chat(
-                self.web_intelligence_agent,
-                message=intelligence_prompt,
-                max_turns=10,
-                )
-            
-            intelligence_data = self._extract_chat_content(intelligence_chat)
-            
-            # Phase 2: Profile Analysis
-            print("\n📊 Phase 2: Analyzing and organizing profile...")
-            analysis_prompt = f"""
+        
+        intelligence_chat = self._chat(
+            self.group_chat_manager,
+            self.web_intelligence_agent,
+            message=intelligence_prompt,
+            max_turns=10,
+            )
+        
+        intelligence_data = self._extract_chat_content(
+            intelligence_chat, intelligence_prompt, self.PHASE_TOKEN_BUDGETS["intelligence"])
+        self._finish_phase("intelligence", started, intelligence_data)
+        return intelligence_data
+    
+    def _intelligence_track_phase(self, name: str, track: str) -> str:
+        """Phase 1 (parallel mode): one independent search track with its own agents"""
+        phase = f"intelligence_{track}"
+        started = self._start_phase(phase, f"🌐 Phase 1 [{track}]: Scanning web and social media...")
+        researcher, executor = self._make_track_agents(track)
+        searches = "\n".join(f'   - Search: "{name} {query}"' for query in self.INTELLIGENCE_TRACKS[track])
+        track_prompt = f"""
+DeepFinder Mission: Research the {track} side of {name}
+
+Use web_search tool to discover:
+
+{searches}
+
+Report every concrete fact you find together with its source URL.
+"""
+        
+        track_chat = self._chat(
+            executor,
+            researcher,
+            message=track_prompt,
+            max_turns=6,
+        )
+        
+        budget = self.PHASE_TOKEN_BUDGETS["intelligence"]
+        track_data = self._extract_chat_content(
+            track_chat, track_prompt, budget // len(self.INTELLIGENCE_TRACKS) if budget else None)
+        self._finish_phase(phase, started, track_data)
+        return track_data
+    
+    def _join_intelligence(self, inputs: Dict[str, str]) -> str:
+        """Merge the parallel intelligence tracks into the Phase 1 output"""
+        started = self._start_phase("intelligence", "🌐 Phase 1: Merging intelligence tracks...")
+        sections = []
+        for track in self.INTELLIGENCE_TRACKS:
+            sections.append(f"## {track.title()}\n\n{inputs[f'intelligence_{track}']}")
+        intelligence_data = "\n\n".join(sections)
+        self._finish_phase("intelligence", started, intelligence_data)
+        return intelligence_data
+    
+    def _analysis_phase(self, name: str, intelligence_data: str) -> str:
+        """Phase 2: structure the gathered intelligence into a profile"""
+        started = self._start_phase("analysis", "\n📊 Phase 2: Analyzing and organizing profile...")
+        analysis_prompt = f"""
 Analyze all discovered information about {name}:
 
 {intelligence_data}
@@ -462,18 +803,23 @@ Create a structured profile with:
 
 Organize everything clearly and comprehensively.
 """
-            
-            analysis_chat = self.user_proxy.initiate_chat(
-                self.profile_analyzer,
-                message=analysis_prompt,
-                max_turns=3,
-            )
-            
-            analyzed_profile = self._extract_chat_content(analysis_chat)
-            
-            # Phase 3: Verification
-            print("\n✅ Phase 3: Verifying accuracy and reliability...")
-            verification_prompt = f"""
+        
+        analysis_chat = self._chat(
+            self.user_proxy,
+            self.profile_analyzer,
+            message=analysis_prompt,
+            max_turns=3,
+        )
+        
+        analyzed_profile = self._extract_chat_content(
+            analysis_chat, analysis_prompt, self.PHASE_TOKEN_BUDGETS["analysis"])
+        self._finish_phase("analysis", started, analyzed_profile)
+        return analyzed_profile
+    
+    def _verification_phase(self, name: str, analyzed_profile: str) -> str:
+        """Phase 3: cross-check the analyzed profile"""
+        started = self._start_phase("verification", "\n✅ Phase 3: Verifying accuracy and reliability...")
+        verification_prompt = f"""
 Verify the profile of {name}:
 
 {analyzed_profile}
@@ -488,18 +834,23 @@ Tasks:
 
 Maintain high accuracy standards.
 """
-            
-            verification_chat = self.user_proxy.initiate_chat(
-                self.verification_specialist,
-                message=verification_prompt,
-                max_turns=8,
-            )
-            
-            verified_profile = self._extract_chat_content(verification_chat)
-            
-            # Phase 4: Generate Insights
-            print("\n💡 Phase 4: Generating comprehensive insights...")
-            insights_prompt = f"""
+        
+        verification_chat = self._chat(
+            self.user_proxy,
+            self.verification_specialist,
+            message=verification_prompt,
+            max_turns=8,
+        )
+        
+        verified_profile = self._extract_chat_content(
+            verification_chat, verification_prompt, self.PHASE_TOKEN_BUDGETS["verification"])
+        self._finish_phase("verification", started, verified_profile)
+        return verified_profile
+    
+    def _insights_phase(self, name: str, verified_profile: str) -> str:
+        """Phase 4: write the final report"""
+        started = self._start_phase("insights", "\n💡 Phase 4: Generating comprehensive insights...")
+        insights_prompt = f"""
 Create DeepFinder's comprehensive profile report for {name}:
 
 Verified Profile:
@@ -520,61 +871,39 @@ Generate a report with:
 Make it comprehensive, professional, and easy to understand.
 This helps users "discover and understand people better."
 """
-            
-            insights_chat = self.user_proxy.initiate_chat(
-                self.insight_generator,
-                message=insights_prompt,
-                max_turns=3,
-            )
-            
-            final_insights = self._extract_chat_content(insights_chat)
-            
-            # Create structured report
-            report = {
-                "person": name,
-                "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "deepfinder_version": "4.0",
-                "status": "✅ Profile Discovered & Verified",
-                "ai_agents_used": [
-                    "WebIntelligenceAgent",
-                    "ProfileAnalyzer", 
-                    "VerificationSpecialist",
-                    "InsightGenerator"
-                ],
-                "intelligence_data": intelligence_data[:1000] + "...",
-                "analyzed_profile": analyzed_profile[:1000] + "...",
-                "verified_profile": verified_profile[:1000] + "...",
-                "comprehensive_insights": final_insights,
-                "tagline": "DeepFinder: Discover and understand people better, anytime, anywhere."
-            }
-            
-            print("\n✅ Discovery Complete! Profile Ready.\n")
-            
-        except Exception as e:
-            print(f"\n❌ Error during discovery: {e}")
-            report = {
-                "person": name,
-                "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "status": "❌ Error",
-                "error": str(e),
-                "note": "Please check your Ollama setup and try again."
-            }
         
-        return report
+        insights_chat = self._chat(
+            self.user_proxy,
+            self.insight_generator,
+            message=insights_prompt,
+            max_turns=3,
+        )
+        
+        final_insights = self._extract_chat_content(
+            insights_chat, insights_prompt, self.PHASE_TOKEN_BUDGETS["insights"])
+        self._finish_phase("insights", started, final_insights)
+        return final_insights
     
-    def _extract_chat_content(self, chat_result) -> str:
-        """Extract content from agent chat"""
+    def _extract_chat_content(self, chat_result, prompt: Optional[str] = None,
+                              max_tokens: Optional[int] = None) -> str:
+        """
+        Extract content from agent chat
+        
+        The prompt that started the chat is left out (it only repeats the previous
+        phase's output) and the rest is compacted to max_tokens.
+        """
         content = []
         
         try:
             if hasattr(chat_result, 'chat_history'):
                 for msg in chat_result.chat_history:
-                    if isinstance(msg, dict) and msg.get('content'):
+                    if isinstance(msg, dict) and isinstance(msg.get('content'), str) and msg['content']:
                         content.append(msg['content'])
         except:
             pass
         
-        return "\n\n".join(content) if content else "No content"
+        compacted = compact_messages(content, max_tokens, exclude=[prompt] if prompt else None)
+        return compacted if compacted else "No content"
     
     def print_report(self, report: Dict):
         """Print beautiful formatted report"""
@@ -590,6 +919,11 @@ This helps users "discover and understand people better."
         if 'ai_agents_used' in report:
             print(f"🤖 AI Agents: {', '.join(report['ai_agents_used'])}\n")
         
+        cache_stats = report.get('llm_cache')
+        if cache_stats:
+            print(f"♻️  LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                  f"{cache_stats['tokens_saved']} tokens / {cache_stats['seconds_saved']}s saved\n")
+        
         print(f"{'─'*70}\n")
         
         if 'comprehensive_insights' in report:
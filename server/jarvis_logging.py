@@ -0,0 +1,175 @@
+"""
+Structured, non-blocking logging for the Jarvis server
+
+Handlers never write from the calling thread: records are put on a bounded
+queue (dropped and counted if it is full) and a background QueueListener
+formats and writes them. This keeps console I/O off the event loop.
+
+Configuration (environment):
+    JARVIS_LOG_LEVEL    default level for every subsystem (INFO)
+    JARVIS_LOG_LEVELS   per-subsystem levels, e.g. "hotword=WARNING,settings=DEBUG"
+    JARVIS_LOG_SAMPLE   keep 1 in N records per sample key, e.g. "hotword.chunk=100"
+    JARVIS_LOG_FORMAT   "json" (default) or "text"
+
+High-frequency call sites tag records with a sample key:
+    logger.debug("received chunk", extra={"sample": "hotword.chunk", "bytes": n})
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+from metrics import registry
+
+ROOT_LOGGER = "jarvis"
+
+# Default 1-in-N sampling for known high-frequency events
+DEFAULT_SAMPLE_RATES = {
+    "hotword.chunk": 100,
+    "hotword.hypothesis": 20,
+    "communicate.message": 10,
+    "face.frame": 50,
+}
+
+log_dropped = registry.counter("jarvis_log_dropped_total", "Log records dropped because the log queue was full")
+log_sampled_out = registry.counter("jarvis_log_sampled_out_total", "Log records skipped by sampling", ("sample",))
+
+# Attributes every LogRecord has; anything else came from extra= and is a structured field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sample"}
+
+
+def get_logger(subsystem: str) -> logging.Logger:
+    """Logger for one server subsystem (hotword, communicate, settings, face, ...)"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{subsystem}")
+
+
+def _parse_pairs(value: str):
+    pairs = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            key, _, val = item.partition("=")
+            pairs[key.strip()] = val.strip()
+    return pairs
+
+
+class SamplingFilter(logging.Filter):
+    """Passes 1 in N records carrying a given `sample` key; untagged records always pass"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample", None)
+        if key is None:
+            return True
+        rate = self.rates.get(key, 1)
+        if rate <= 1:
+            return True
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % rate == 0:
+            record.sample_rate = rate
+            return True
+        log_sampled_out.labels(key).inc()
+        return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_dropped.inc()
+
+    def prepare(self, record):
+        # Keep structured fields; format the message once here, off the listener's critical path
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = " ".join(f"{k}={v}" for k, v in vars(record).items() if k not in _RECORD_ATTRS)
+        return f"{line} {fields}" if fields else line
+
+
+_listener = None
+
+
+def setup_logging():
+    """Install the queue-backed pipeline on the "jarvis" logger (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(os.environ.get("JARVIS_LOG_LEVEL", "INFO").upper())
+    root.propagate = False
+    for subsystem, level in _parse_pairs(os.environ.get("JARVIS_LOG_LEVELS", "")).items():
+        get_logger(subsystem).setLevel(level.upper())
+
+    rates = dict(DEFAULT_SAMPLE_RATES)
+    rates.update({k: int(v) for k, v in _parse_pairs(os.environ.get("JARVIS_LOG_SAMPLE", "")).items()})
+
+    log_queue = queue.Queue(maxsize=10000)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(rates))
+    root.addHandler(queue_handler)
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if os.environ.get("JARVIS_LOG_FORMAT", "json").lower() == "text":
+        stream_handler.setFormatter(TextFormatter())
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def log_queue_depth() -> int:
+    """Records waiting for the writer thread"""
+    return _listener.queue.qsize() if _listener is not None else 0
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,354 @@
+"""
+Content-addressed LLM response cache for DeepFinder agents
+
+Implements the AutoGen cache protocol (get / set / close / context manager) on
+top of a sharded on-disk store, so it can be passed straight to
+ConversableAgent.initiate_chat(cache=...). Entries are addressed by the SHA-256
+of the request key (model, messages and call parameters), evicted least
+recently used once the size limits are reached, and concurrent identical
+requests are collapsed into a single model call.
+
+A miss makes the calling thread the owner of that request until it stores
+the response with set(). AutoGen only calls set() when the model call
+succeeds, so callers run their chats inside guard(), which releases the
+thread's unanswered requests when the chat ends; duplicates that were waiting
+then make the call themselves instead of blocking until dedup_timeout.
+guard(usage) also counts the lookups made inside it into usage (see
+new_usage()), so a caller sharing the process-wide cache can report its own
+savings rather than the cache's lifetime totals.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from jarvis_logging import get_logger
+
+log = get_logger("llm_cache")
+
+# Cache modes
+READ_WRITE = "readwrite"  # serve hits, store misses
+REPLAY = "replay"         # serve hits, fail on misses (deterministic reruns, no live calls)
+REFRESH = "refresh"       # ignore stored entries, store fresh responses
+MODES = (READ_WRITE, REPLAY, REFRESH)
+
+# How often a waiting duplicate checks that the owning thread is still alive
+OWNER_CHECK_INTERVAL = 1.0
+
+
+class CacheMissError(RuntimeError):
+    """Raised in replay mode when a request has no recorded response"""
+
+
+# Counters kept for the whole cache and for each new_usage() passed to guard()
+COUNTERS = ("hits", "misses", "deduplicated", "tokens_saved", "seconds_saved")
+
+
+def new_usage() -> Dict[str, float]:
+    """Counters for one caller's lookups; pass to guard() and report with stats(usage)"""
+    return {"hits": 0, "misses": 0, "deduplicated": 0, "tokens_saved": 0, "seconds_saved": 0.0}
+
+
+def _usage_tokens(value: Any) -> int:
+    """Best-effort total token count of a cached completion"""
+    usage = getattr(value, "usage", None)
+    if usage is None and isinstance(value, dict):
+        usage = value.get("usage")
+    if usage is None:
+        return 0
+    if isinstance(usage, dict):
+        return int(usage.get("total_tokens") or 0)
+    return int(getattr(usage, "total_tokens", 0) or 0)
+
+
+class LLMCallCache:
+    """Disk-backed LLM response cache with LRU eviction, replay mode and savings stats"""
+
+    def __init__(self, cache_dir: str = "./llm_cache", mode: str = READ_WRITE,
+                 max_entries: int = 10000, max_bytes: int = 512 * 1024 * 1024,
+                 dedup_timeout: float = 30.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.dedup_timeout = dedup_timeout
+
+        self._lock = threading.Lock()
+        # usage counters of the guard() block running on each thread
+        self._local = threading.local()
+        # digest -> (Event set once the owning call stores its response, owner thread id)
+        self._in_flight: Dict[str, tuple] = {}
+        # digest -> perf_counter at the miss, used to measure what a hit saves later
+        self._miss_started: Dict[str, float] = {}
+        self._entries, self._bytes = self._scan()
+
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self.tokens_saved = 0
+        self.seconds_saved = 0.0
+
+    # AutoGen cache protocol
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        # Entries are written synchronously; nothing to flush
+        pass
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached response for key, or default on a miss"""
+        digest = self._digest(key)
+        if self.mode != REFRESH:
+            entry = self._read(digest)
+            if entry is None:
+                entry = self._wait_for_in_flight(digest)
+            if entry is not None:
+                self._count(hits=1, tokens_saved=entry.get("tokens", 0), seconds_saved=entry.get("latency", 0.0))
+                return entry["value"]
+
+        if self.mode == REPLAY:
+            raise CacheMissError(f"No recorded LLM response for request {digest[:12]}")
+
+        self._count(misses=1)
+        with self._lock:
+            self._miss_started[digest] = time.perf_counter()
+            self._in_flight.setdefault(digest, (threading.Event(), threading.get_ident()))
+        return default
+
+    @contextmanager
+    def guard(self, usage: Optional[Dict[str, float]] = None):
+        """
+        Release this thread's unanswered requests when the block exits (e.g. a failed model call).
+
+        Lookups made on this thread inside the block are also counted into usage, if given.
+        """
+        previous = getattr(self._local, "usage", None)
+        self._local.usage = usage
+        try:
+            yield self
+        finally:
+            self._local.usage = previous
+            owner = threading.get_ident()
+            with self._lock:
+                digests = [d for d, (_, o) in self._in_flight.items() if o == owner]
+            for digest in digests:
+                self._release(digest)
+
+    def set(self, key: str, value: Any) -> None:
+        """Store the response for key and wake any duplicate requests waiting on it"""
+        digest = self._digest(key)
+        with self._lock:
+            started = self._miss_started.pop(digest, None)
+        entry = {
+            "value": value,
+            "tokens": _usage_tokens(value),
+            "latency": time.perf_counter() - started if started is not None else 0.0,
+            "created_at": time.time(),
+        }
+        try:
+            self._write(digest, entry)
+        finally:
+            with self._lock:
+                in_flight = self._in_flight.pop(digest, None)
+            if in_flight is not None:
+                in_flight[0].set()
+
+    # Reporting
+
+    def stats(self, usage: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """Lifetime counters, or those of usage (see guard()); entries and bytes are always the whole cache"""
+        with self._lock:
+            counters = dict(usage) if usage is not None else {name: getattr(self, name) for name in COUNTERS}
+            lookups = counters["hits"] + counters["misses"]
+            return {
+                "mode": self.mode,
+                "hits": counters["hits"],
+                "misses": counters["misses"],
+                "deduplicated": counters["deduplicated"],
+                "hit_rate": round(counters["hits"] / lookups, 3) if lookups else 0.0,
+                "tokens_saved": counters["tokens_saved"],
+                "seconds_saved": round(counters["seconds_saved"], 3),
+                "entries": self._entries,
+                "bytes": self._bytes,
+            }
+
+    def _count(self, **amounts):
+        usage = getattr(self._local, "usage", None)
+        with self._lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+                if usage is not None:
+                    usage[name] += amount
+
+    def clear(self):
+        for path in self._files():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._entries, self._bytes = 0, 0
+
+    # Storage
+
+    def _digest(self, key: Any) -> str:
+        if not isinstance(key, str):
+            key = json.dumps(key, sort_keys=True, default=str)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _path(self, digest: str) -> str:
+        # Two-level sharding keeps directory listings small
+        return os.path.join(self.cache_dir, digest[:2], digest + ".pkl")
+
+    def _files(self):
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if os.path.isdir(shard_dir):
+                for name in os.listdir(shard_dir):
+                    if name.endswith(".pkl"):
+                        yield os.path.join(shard_dir, name)
+
+    def _scan(self):
+        entries, size = 0, 0
+        for path in self._files():
+            try:
+                size += os.path.getsize(path)
+                entries += 1
+            except OSError:
+                pass
+        return entries, size
+
+    def _read(self, digest: str) -> Optional[Dict[str, Any]]:
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            log.warning("Discarding unreadable LLM cache entry %s: %s", digest[:12], e)
+            self._remove(path)
+            return None
+        try:
+            # Touch for LRU ordering
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry
+
+    def _write(self, digest: str, entry: Dict[str, Any]):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        existed = os.path.exists(path)
+        old_size = os.path.getsize(path) if existed else 0
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._entries += 0 if existed else 1
+            self._bytes += os.path.getsize(path) - old_size
+            over_limit = self._entries > self.max_entries or self._bytes > self.max_bytes
+        if over_limit:
+            self._evict()
+
+    def _remove(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._entries -= 1
+            self._bytes -= size
+
+    def _evict(self):
+        """Drop least recently used entries until 90% of both limits"""
+        files = []
+        for path in self._files():
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        files.sort()
+        target_entries = int(self.max_entries * 0.9)
+        target_bytes = int(self.max_bytes * 0.9)
+        for _, path in files:
+            if self._entries <= target_entries and self._bytes <= target_bytes:
+                break
+            self._remove(path)
+
+    def _release(self, digest: str, in_flight: Optional[tuple] = None):
+        """Drop the in-flight slot (only if it is still in_flight, when given) and wake its waiters"""
+        with self._lock:
+            current = self._in_flight.get(digest)
+            if current is None or (in_flight is not None and current is not in_flight):
+                return
+            del self._in_flight[digest]
+            self._miss_started.pop(digest, None)
+        current[0].set()
+
+    def _wait_for_in_flight(self, digest: str) -> Optional[Dict[str, Any]]:
+        """If an identical request is already running, wait for its response"""
+        deadline = time.monotonic() + self.dedup_timeout
+        while True:
+            with self._lock:
+                in_flight = self._in_flight.get(digest)
+            if in_flight is None:
+                return None
+            event, owner = in_flight
+            if owner == threading.get_ident():
+                # Our own earlier attempt failed before storing a response; retry it
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not any(t.ident == owner for t in threading.enumerate()):
+                # The owner never stored or released its response; take over the request
+                self._release(digest, in_flight)
+                return None
+            if event.wait(min(remaining, OWNER_CHECK_INTERVAL)):
+                break
+        entry = self._read(digest)
+        if entry is not None:
+            self._count(deduplicated=1)
+        # None: the owner's call failed, so this caller makes it
+        return entry
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def shared_cache() -> Optional[LLMCallCache]:
+    """
+    Process-wide DeepFinder cache configured from DEEPFINDER_LLM_CACHE_* variables.
+    
+    Shared so concurrent discovery jobs deduplicate identical prompts against each
+    other. Returns None when DEEPFINDER_LLM_CACHE_MODE is "off".
+    """
+    global _shared_cache
+    mode = os.environ.get("DEEPFINDER_LLM_CACHE_MODE", READ_WRITE).lower()
+    if mode in ("off", "none", "disabled"):
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = LLMCallCache(
+                cache_dir=os.environ.get("DEEPFINDER_LLM_CACHE_DIR", "./llm_cache"),
+                mode=mode,
+                max_entries=int(os.environ.get("DEEPFINDER_LLM_CACHE_MAX_ENTRIES", "10000")),
+                max_bytes=int(os.environ.get("DEEPFINDER_LLM_CACHE_MAX_MB", "512")) * 1024 * 1024,
+                dedup_timeout=float(os.environ.get("DEEPFINDER_LLM_CACHE_DEDUP_TIMEOUT", "30")),
+            )
+        return _shared_cache
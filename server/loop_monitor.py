@@ -0,0 +1,119 @@
+"""
+Event-loop lag monitor
+
+A heartbeat task sleeps for a fixed interval and records how late it wakes up
+(jarvis_event_loop_lag_seconds). A watchdog thread watches the heartbeat: when
+it is overdue past its sleep interval by more than the threshold (the same lag
+the heartbeat records), something is blocking the loop, and the watchdog reads
+which task is running and which handler and message type that task last
+marked. The stall is then counted in
+jarvis_event_loop_stalls_total{handler,type} and its length observed in
+jarvis_event_loop_stall_seconds, so a handler that starts doing blocking work
+on the loop shows up in /metrics.
+
+Handlers mark the message they are about to process:
+    loop_monitor.mark("hotword", "audio")
+
+Configuration (environment):
+    JARVIS_LOOP_LAG_THRESHOLD_MS   stall threshold (100)
+    JARVIS_LOOP_HEARTBEAT_MS       heartbeat interval (50)
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import weakref
+from typing import Optional, Tuple
+
+from metrics import event_loop_lag_seconds, event_loop_stall_seconds, event_loop_stalls
+from jarvis_logging import get_logger
+
+log = get_logger("loop_monitor")
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+UNKNOWN = ("unknown", "unknown")
+
+
+def _server_frame(frame) -> Optional[str]:
+    """Innermost frame of server code in a stack, as "function (file:line)" """
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename.startswith(SERVER_DIR) and code.co_filename != __file__:
+            return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+        frame = frame.f_back
+    return None
+
+
+class LoopMonitor:
+    def __init__(self, threshold: float = 0.1, interval: float = 0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self._loop = None
+        self._loop_thread_id = None
+        self._task = None
+        self._stop = threading.Event()
+        self._last_beat = time.monotonic()
+        # Task -> (handler, message type) of the message it is processing
+        self._activity = weakref.WeakKeyDictionary()
+        # Attribution captured by the watchdog while the loop was blocked
+        self._stall: Optional[Tuple[str, str]] = None
+
+    def mark(self, handler: str, message_type: str):
+        """Record what the current task is handling (call from a coroutine)"""
+        task = asyncio.current_task()
+        if task is not None:
+            self._activity[task] = (handler, message_type or "unknown")
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Start the heartbeat on loop (call from the loop thread) and the watchdog thread"""
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._last_beat = time.monotonic()
+        self._task = loop.create_task(self._heartbeat())
+        threading.Thread(target=self._watchdog, name="jarvis-loop-watchdog", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self._last_beat = time.monotonic()
+            event_loop_lag_seconds.observe(lag)
+            stall, self._stall = self._stall, None
+            if lag > self.threshold:
+                handler, message_type = stall or UNKNOWN
+                event_loop_stalls.labels(handler, message_type).inc()
+                event_loop_stall_seconds.labels(handler, message_type).observe(lag)
+
+    def _watchdog(self):
+        flagged_beat = None
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._last_beat
+            # Same measure as the heartbeat's lag: time overdue beyond the sleep interval
+            if time.monotonic() - beat - self.interval <= self.threshold or beat == flagged_beat:
+                continue
+            # The loop is blocked right now: whatever task is current is the culprit
+            flagged_beat = beat
+            task = asyncio.current_task(self._loop)
+            self._stall = self._activity.get(task, UNKNOWN) if task is not None else UNKNOWN
+            frame = sys._current_frames().get(self._loop_thread_id)
+            log.warning("Event loop blocked for over %.0f ms", self.threshold * 1000, extra={
+                "handler": self._stall[0],
+                "message_type": self._stall[1],
+                "location": _server_frame(frame),
+            })
+
+
+loop_monitor = LoopMonitor(
+    threshold=float(os.environ.get("JARVIS_LOOP_LAG_THRESHOLD_MS", "100")) / 1000.0,
+    interval=float(os.environ.get("JARVIS_LOOP_HEARTBEAT_MS", "50")) / 1000.0,
+)
@@ -1,324 +1,512 @@
 from fastapi import FastAPI,WebSocket,WebSocketDisconnect, APIRouter
 from connection_manager import ConnectionManager
-import psutil
 import asyncio
-import pynvml
+import os
+import uuid
 import time
 import pocketsphinx
 from os.path import join as pathjoin
-from settings import settings_manager
+from settings import settings_manager, async_settings_manager
 import json
-from datetime import datetime
+from datetime import datetime, timezone
 from deepface import DeepFace as df  
+import cv2
+import numpy as np
 from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import Optional
+from deepfinder_service import router as deepfinder_router, job_manager
+from profiler import router as profiler_router
+from loop_monitor import loop_monitor
+from pipeline import OTHER, READ, WRITE, RequestPipeline
+from reminders import scheduler as event_scheduler
+from wakeword import DecoderPool, KeywordDecoder, SETTINGS_KEY as WAKE_WORDS_KEY, wake_words
+from transcription import Transcription
+from face_tracking import FaceTracker
+from face_embeddings import FaceIndex, SETTINGS_KEY as EMBEDDING_BACKEND_KEY
+from face_ingest import InvalidImageError, ingest_face_image
+import framing
+from telemetry import Subscription, clamp_interval, sampler as telemetry
+from shared_state import BusClient, SharedStateBroker, shared_state_from_env
+from fastapi.responses import PlainTextResponse
+import metrics
+from jarvis_logging import get_logger, log_queue_depth, setup_logging, shutdown_logging
+
+setup_logging()
+log = get_logger("server")
+communicate_log = get_logger("communicate")
+hotword_log = get_logger("hotword")
+face_log = get_logger("face")
 
 JARVIS_DIR = Path(__file__).resolve().parent
 
 # Create faces directory if it doesn't exist
 faces_dir = JARVIS_DIR / "faces"
 
-print("Creating faces directory if it doesn't exist...", faces_dir)
+log.info("Creating faces directory if it doesn't exist", extra={"path": str(faces_dir)})
 faces_dir.mkdir(parents=True, exist_ok=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_monitor.start(asyncio.get_running_loop())
+    telemetry.start()
+    # In multi-worker mode, relay broadcasts, reminder schedule changes, wake word lists and
+    # face embedding backend selections through the supervisor's shared state bus; attached
+    # before loading so no change is missed
+    shared_state = shared_state_from_env()
+    if shared_state:
+        bus = BusClient(*shared_state)
+        manager.attach_bus(bus, asyncio.get_running_loop(), {
+            event_scheduler.BUS_TOPIC: event_scheduler.on_bus_message,
+            wake_words.BUS_TOPIC: wake_words.on_bus_message,
+            face_index.BUS_TOPIC: face_index.on_bus_message,
+        })
+        event_scheduler.attach_bus(bus)
+        wake_words.attach_bus(bus)
+        face_index.attach_bus(bus)
+    settings = await async_settings_manager.get_settings()
+    event_scheduler.load(settings.get('events', []))
+    wake_words.load(settings)
+    face_index.load(settings)
+    event_scheduler.start(send_response)
+    yield
+    if manager.bus is not None:
+        manager.bus.close()
+    # Stop queued DeepFinder jobs and signal running ones to wind down
+    job_manager.shutdown()
+    loop_monitor.stop()
+    telemetry.stop()
+    event_scheduler.stop()
+    async_settings_manager.shutdown()
+    shutdown_logging()
+
+
 app = FastAPI(
     title="Jarvis websocket server",
-    lifespan=None,
+    lifespan=lifespan,
     docs_url="/docs",
 )
+app.include_router(deepfinder_router)
+app.include_router(profiler_router)
 
 
 manager = ConnectionManager()
+metrics.ws_connections.set_function(lambda: len(manager.active_connections))
 
-pynvml.nvmlInit()
+# Server-side queues and pools reported in extended /info telemetry
+telemetry.register_stats('ws_connections', lambda: len(manager.active_connections))
+telemetry.register_stats('send_queue_depth', lambda: metrics.send_queue_depth.labels().get())
+telemetry.register_stats('asyncio_tasks', lambda: len(asyncio.all_tasks()))
+telemetry.register_stats('info_subscribers', lambda: len(telemetry.subscriptions))
+telemetry.register_stats('log_queue_depth', log_queue_depth)
+telemetry.register_stats('deepfinder_jobs', job_manager.stats)
+telemetry.register_stats('scheduled_events', lambda: len(event_scheduler))
+telemetry.register_stats('hotword_decoders_idle', lambda: decoder_pool.idle())
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition of the server metrics"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
 MODEL_PATH = pocketsphinx.get_model_path()
 
+COMMUNICATE_MAX_IN_FLIGHT = int(os.environ.get("JARVIS_COMMUNICATE_MAX_IN_FLIGHT", "8"))
+
+
+async def send_response(websocket: WebSocket, response: dict):
+    """Send in the connection's negotiated framing (JSON text or MessagePack)"""
+    await manager.send_personal_message(framing.codec_for(websocket).encode(response), websocket)
+
+
+async def communicate_get_settings(websocket: WebSocket, request: dict, _data=None):
+    settings = await async_settings_manager.get_settings()
+    await send_response(websocket, {
+        'type': 'settings_response',
+        'request_id': request.get('request_id'),
+        'payload': settings
+    })
+
+
+async def communicate_save_settings(websocket: WebSocket, request: dict, _data=None):
+    new_settings = request.get('payload', {})
+    success = await async_settings_manager.update_settings(new_settings)
+    if success and WAKE_WORDS_KEY in new_settings:
+        # Open /hotword connections (on every worker) switch to the new phrases before their next chunk
+        wake_words.update(new_settings[WAKE_WORDS_KEY])
+    if success and EMBEDDING_BACKEND_KEY in new_settings:
+        # Every worker switches, so stored models are matched with the same backend everywhere
+        face_index.select(new_settings[EMBEDDING_BACKEND_KEY])
+    await send_response(websocket, {
+        'type': 'save_settings_response',
+        'request_id': request.get('request_id'),
+        'success': success,
+        'error': None if success else 'Failed to save settings'
+    })
+
+
+async def communicate_get_events(websocket: WebSocket, request: dict, _data=None):
+    events = await async_settings_manager.get_events()
+    await send_response(websocket, {
+        'type': 'events_response',
+        'request_id': request.get('request_id'),
+        'payload': {'events': events}
+    })
+
+
+async def communicate_save_event(websocket: WebSocket, request: dict, _data=None):
+    event_data = request.get('payload', {})
+    success = await async_settings_manager.save_event(event_data)
+    response = {'type': 'save_event_response', 'request_id': request.get('request_id'), 'success': success}
+    if success:
+        event_scheduler.schedule(event_data)
+        response['payload'] = event_data
+    else:
+        response['error'] = 'Failed to save event'
+    await send_response(websocket, response)
+
+
+async def communicate_update_event(websocket: WebSocket, request: dict, _data=None):
+    event_data = request.get('payload', {})
+    success = await async_settings_manager.update_event(event_data)
+    response = {'type': 'update_event_response', 'request_id': request.get('request_id'), 'success': success}
+    if success:
+        event_scheduler.schedule(event_data)
+        response['payload'] = event_data
+    else:
+        response['error'] = 'Failed to update event'
+    await send_response(websocket, response)
+
+
+async def communicate_delete_event(websocket: WebSocket, request: dict, _data=None):
+    event_id = request.get('payload', {}).get('id')
+    if event_id:
+        success = await async_settings_manager.delete_event(event_id)
+        if success:
+            event_scheduler.cancel(event_id)
+        error = None if success else 'Failed to delete event'
+    else:
+        success, error = False, 'Event ID is required'
+    await send_response(websocket, {
+        'type': 'delete_event_response',
+        'request_id': request.get('request_id'),
+        'success': success,
+        'error': error
+    })
+
+
+async def communicate_subscribe_events(websocket: WebSocket, request: dict, _data=None):
+    event_scheduler.subscribe(websocket)
+    next_due = event_scheduler.next_due()
+    await send_response(websocket, {
+        'type': 'subscribe_events_response',
+        'request_id': request.get('request_id'),
+        'success': True,
+        'payload': {
+            'scheduled': len(event_scheduler),
+            'next_due': datetime.fromtimestamp(next_due, timezone.utc).isoformat() if next_due else None
+        }
+    })
+
+
+async def communicate_unsubscribe_events(websocket: WebSocket, request: dict, _data=None):
+    event_scheduler.unsubscribe(websocket)
+    await send_response(websocket, {
+        'type': 'unsubscribe_events_response',
+        'request_id': request.get('request_id'),
+        'success': True
+    })
+
+
+async def communicate_get_models(websocket: WebSocket, request: dict, _data=None):
+    models = await async_settings_manager.get_face_recognition_models()
+    await send_response(websocket, {
+        'type': 'face_recognition_models_response',
+        'request_id': request.get('request_id'),
+        'payload': {'models': models}
+    })
+
+
+async def save_face_upload(model_data: dict, image_data: bytes) -> dict:
+    """Ingest an uploaded face image and save its model; the face_recognition_save_response fields"""
+    try:
+        image = await asyncio.to_thread(ingest_face_image, image_data, str(faces_dir),
+                                        model_data.get('extension', '.jpg'))
+    except InvalidImageError as e:
+        return {'success': False, 'error': str(e)}
+    model_data.update({
+        'id': str(uuid.uuid4()),
+        'filename': image['filename'],
+        'filepath': image['filepath'],
+        'original_filepath': image['original_filepath'],
+        'content_hash': image['content_hash'],
+        'uploaded_at': datetime.now().isoformat(),
+        'isActive': True
+    })
+    # The settings writer checks for the same photo and saves in one step (across workers too);
+    # a duplicate keeps the model (and embedding) already stored
+    return await async_settings_manager.save_face_upload_model(model_data)
+
+
+async def communicate_save_model(websocket: WebSocket, request: dict, image_data: bytes):
+    result = await save_face_upload(request.get('payload', {}), image_data)
+    await send_response(websocket, {
+        'type': 'face_recognition_save_response',
+        'request_id': request.get('request_id'),
+        **result
+    })
+
+
+async def communicate_delete_model(websocket: WebSocket, request: dict, _data=None):
+    model_id = request.get('payload', {}).get('id')
+    if model_id:
+        success = await async_settings_manager.delete_face_recognition_model(model_id)
+        error = None if success else 'Failed to delete face recognition model'
+    else:
+        success, error = False, 'Model ID is required'
+    await send_response(websocket, {
+        'type': 'face_recognition_delete_response',
+        'request_id': request.get('request_id'),
+        'success': success,
+        'error': error
+    })
+
+
+# Request kind -> (handler, pipeline kind, echo). Writes run one at a time in arrival order
+# on the connection's lane; reads run concurrently once the connection's earlier writes are
+# done (see pipeline.py). Kinds that were echoed back before pipelining still are.
+COMMUNICATE_HANDLERS = {
+    'get_settings': (communicate_get_settings, READ, False),
+    'save_settings': (communicate_save_settings, WRITE, False),
+    'get_events': (communicate_get_events, READ, False),
+    'save_event': (communicate_save_event, WRITE, False),
+    'update_event': (communicate_update_event, WRITE, False),
+    'delete_event': (communicate_delete_event, WRITE, True),
+    'subscribe_events': (communicate_subscribe_events, READ, False),
+    'unsubscribe_events': (communicate_unsubscribe_events, OTHER, False),
+    'face_recognition.get_models': (communicate_get_models, READ, True),
+    'face_recognition.save_model': (communicate_save_model, WRITE, True),
+    'face_recognition.delete_model': (communicate_delete_model, WRITE, True),
+}
+# Metric and loop monitor labels: known kinds only, anything else is "unknown"
+COMMUNICATE_LABELS = frozenset(COMMUNICATE_HANDLERS) | {'text'}
+
+
+def take_inline_image(request: dict) -> Optional[bytes]:
+    """Remove and return the image bytes of a single-frame (MessagePack) model upload"""
+    model_data = request.get('payload')
+    if isinstance(model_data, dict) and isinstance(model_data.get('image'), bytes):
+        return model_data.pop('image')
+    return None
+
+
+def communicate_kind(request) -> str:
+    if not isinstance(request, dict):
+        return 'text'
+    message_type = request.get('type')
+    if message_type == 'face_recognition':
+        return f"face_recognition.{request.get('action')}"
+    return message_type or 'unknown'
+
+
 @app.websocket("/communicate")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    codec = await framing.accept(manager, websocket)
+    pipeline = RequestPipeline(COMMUNICATE_MAX_IN_FLIGHT)
     try:
         while True:
-            data = await websocket.receive_text()
-            
-            # Check if the message is a settings-related request
-            try:
-                parsed_data = json.loads(data)
-                if isinstance(parsed_data, dict):
-                    message_type = parsed_data.get('type')
-                    print(f"Received message type: {message_type}")
-                    if message_type == 'get_settings':
-                        # Return current settings
-                        settings = settings_manager.get_settings()
-                        response = {
-                            'type': 'settings_response',
-                            'request_id': parsed_data.get('request_id'),
-                            'payload': settings
-                        }
-                        await manager.send_personal_message(json.dumps(response), websocket)
-                        continue
-                    elif message_type == 'save_settings':
-                        # Save the new settings
-                        new_settings = parsed_data.get('payload', {})
-                        success = settings_manager.update_settings(new_settings)
-                        response = {
-                            'type': 'save_settings_response',
-                            'request_id': parsed_data.get('request_id'),
-                            'success': success,
-                            'error': None if success else 'Failed to save settings'
-                        }
-                        await manager.send_personal_message(json.dumps(response), websocket)
-                        continue
-                    elif message_type == 'get_events':
-                        # Return stored events
-                        events = settings_manager.get_events()
-                        response = {
-                            'type': 'events_response',
-                            'request_id': parsed_data.get('request_id'),
-                            'payload': {'events': events}
-                        }
-                        await manager.send_personal_message(json.dumps(response), websocket)
-                        continue
-                    elif message_type == 'save_event':
-                        # Save a new event
-                        event_data = parsed_data.get('payload', {})
-                        success = settings_manager.save_event(event_data)
-                        if success:
-                            response = {
-                                'type': 'save_event_response',
-                                'request_id': parsed_data.get('request_id'),
-                                'success': True,
-                                'payload': event_data
-                            }
-                        else:
-                            response = {
-                                'type': 'save_event_response',
-                                'request_id': parsed_data.get('request_id'),
-                                'success': False,
-                                'error': 'Failed to save event'
-                            }
-                        await manager.send_personal_message(json.dumps(response), websocket)
-                        continue
-                    elif message_type == 'update_event':
-                        # Update an existing event
-                        event_data = parsed_data.get('payload', {})
-                        success = settings_manager.update_event(event_data)
-                        if success:
-                            response = {
-                                'type': 'update_event_response',
-                                'request_id': parsed_data.get('request_id'),
-                                'success': True,
-                                'payload': event_data
-                            }
-                        else:
-                            response = {
-                                'type': 'update_event_response',
-                                'request_id': parsed_data.get('request_id'),
-                                'success': False,
-                                'error': 'Failed to update event'
-                            }
-                        await manager.send_personal_message(json.dumps(response), websocket)
-                        continue
-                    elif message_type == 'delete_event':
-                        # Delete an existing event
-                        event_id = parsed_data.get('payload', {}).get('id')
-                        if event_id:
-                            success = settings_manager.delete_event(event_id)
-                            response = {
-                                'type': 'delete_event_response',
-                                'request_id': parsed_data.get('request_id'),
-                                'success': success,
-                                'error': None if success else 'Failed to delete event'
-                            }
-                        else:
-                            response = {
-                                'type': 'delete_event_response',
-                                'request_id': parsed_data.get('request_id'),
-                                'success': False,
-                                'error': 'Event ID is required'
-                            }
-                        await manager.send_personal_message(json.dumps(response), websocket)
-                    elif message_type == 'face_recognition':
-                        # Handle face recognition requests
-                        action = parsed_data.get('action')
-                        if action == 'get_models':
-                            # Return all face recognition models
-                            models = settings_manager.get_face_recognition_models()
-                            response = {
-                                'type': 'face_recognition_models_response',
-                                'request_id': parsed_data.get('request_id'),
-                                'payload': {'models': models}
-                            }
-                            await manager.send_personal_message(json.dumps(response), websocket)
-                        elif action == 'save_model':
-                            # Save a new face recognition model
-                            model_data = parsed_data.get('payload', {})
-                            
-                            # Receive image data
-                            image_data = await websocket.receive_bytes()
-                            
-                            # Save the image file
-                            import uuid
-                            import os
-                            
-                            
-                            # Create faces directory if it doesn't exist
-                            faces_dir = "./faces"
-                            os.makedirs(faces_dir, exist_ok=True)
-                            
-                            # Generate unique filename
-                            file_extension = model_data.get('extension', '.jpg')
-                            filename = f"{uuid.uuid4()}{file_extension}"
-                            file_path = os.path.join(faces_dir, filename)
-                            
-                            # Save the image file
-                            with open(file_path, 'wb') as f:
-                                f.write(image_data)
-                            
-                            # Update model data with file information
-                            model_data.update({
-                                'id': str(uuid.uuid4()),
-                                'filename': filename,
-                                'filepath': file_path,
-                                'uploaded_at': datetime.now().isoformat(),
-                                'isActive': True
-                            })
-                            
-                            success = settings_manager.save_face_recognition_model(model_data)
-                            response = {
-                                'type': 'face_recognition_save_response',
-                                'request_id': parsed_data.get('request_id'),
-                                'success': success,
-                                'error': None if success else 'Failed to save face recognition model'
-                            }
-                            await manager.send_personal_message(json.dumps(response), websocket)
-                        elif action == 'delete_model':
-                            # Delete a face recognition model
-                            model_id = parsed_data.get('payload', {}).get('id')
-                            if model_id:
-                                success = settings_manager.delete_face_recognition_model(model_id)
-                                response = {
-                                    'type': 'face_recognition_delete_response',
-                                    'request_id': parsed_data.get('request_id'),
-                                    'success': success,
-                                    'error': None if success else 'Failed to delete face recognition model'
-                                }
-                            else:
-                                response = {
-                                    'type': 'face_recognition_delete_response',
-                                    'request_id': parsed_data.get('request_id'),
-                                    'success': False,
-                                    'error': 'Model ID is required'
-                                }
-                            await manager.send_personal_message(json.dumps(response), websocket)
-            except json.JSONDecodeError:
-                # Not a JSON message, continue with normal processing
-                pass
-            
-            # Handle normal message - echo back as JSON for structured response
-            try:
-                from datetime import datetime as dt
-                response = {
-                    "type": "echo",
-                    "message": data,
-                    "timestamp": str(dt.now())
-                }
-                await manager.send_personal_message(json.dumps(response), websocket)
-            except Exception as e:
-                print(f"Error sending echo response: {e}")
+            frame = await framing.receive_frame(websocket)
+            started = time.perf_counter()
+            # Non-structured messages are echoed back
+            request, data = codec.decode(frame)
+            kind = communicate_kind(request)
+            communicate_log.debug("Received message", extra={"sample": "communicate.message", "message_type": kind})
+            handler, pipeline_kind, echo = COMMUNICATE_HANDLERS.get(kind, (None, OTHER, True))
+            label = metrics.bounded_label(kind, COMMUNICATE_LABELS)
+
+            payload = None
+            if kind == 'face_recognition.save_model':
+                # MessagePack uploads carry the image inline; JSON ones send it as the next frame,
+                # which must be taken before reading anything else
+                payload = take_inline_image(request)
+                if payload is None:
+                    payload = await websocket.receive_bytes()
+
+            async def job(data=data, request=request, kind=kind, label=label, handler=handler, echo=echo,
+                          payload=payload, started=started):
+                loop_monitor.mark('communicate', label)
+                try:
+                    if handler is not None:
+                        await handler(websocket, request, payload)
+                    if echo:
+                        # Handle normal message - echo back as JSON for structured response
+                        await send_response(websocket, {
+                            "type": "echo",
+                            "message": data,
+                            "timestamp": str(datetime.now())
+                        })
+                except Exception as e:
+                    metrics.ws_errors.labels('communicate').inc()
+                    communicate_log.warning("Error handling %s: %s", kind, e)
+                finally:
+                    metrics.observe_message('communicate', label, started)
+
+            await pipeline.submit(job, pipeline_kind)
     except WebSocketDisconnect:
         # Remove disconnected socket from active list if present
         manager.disconnect(websocket)
-        # Safely notify remaining connected clients that one has disconnected
-        for conn in list(manager.active_connections):
+        # Safely notify remaining connected clients (on every worker) that one has disconnected
+        try:
+            await manager.broadcast(json.dumps({
+                "type": "notification",
+                "message": "Client disconnected",
+                "timestamp": str(datetime.now())
+            }))
+        except Exception:
+            # ignore errors when sending to other clients
+            pass
+    finally:
+        event_scheduler.unsubscribe(websocket)
+        pipeline.close()
+
+
+# In-band /info request types (metric and loop monitor labels; others are "unknown")
+INFO_REQUEST_TYPES = ('subscribe', 'history')
+
+
+async def handle_info_request(websocket: WebSocket, subscription: Subscription, data: str) -> bool:
+    """Handle an in-band /info request; returns True if the stream must restart at the new rate"""
+    try:
+        request = json.loads(data)
+    except json.JSONDecodeError:
+        return False
+    if not isinstance(request, dict):
+        return False
+    request_type = request.get('type')
+    label = metrics.bounded_label(request_type, INFO_REQUEST_TYPES)
+    loop_monitor.mark('info', label)
+    started = time.perf_counter()
+    try:
+        if request_type == 'subscribe':
+            subscription.interval = clamp_interval(request.get('interval'), subscription.interval)
+            if 'delta' in request:
+                subscription.delta = bool(request['delta'])
+            if 'extended' in request:
+                subscription.extended = bool(request['extended'])
+            if isinstance(request.get('precision'), int):
+                subscription.precision = max(0, min(6, request['precision']))
+            subscription.reset()
+            telemetry.changed()
+            await manager.send_personal_message(json.dumps({
+                'type': 'subscribed',
+                'request_id': request.get('request_id'),
+                'interval': subscription.interval,
+                'delta': subscription.delta,
+                'extended': subscription.extended,
+            }), websocket)
+            return True
+        if request_type == 'history':
             try:
-                await manager.send_personal_message(json.dumps({
-                    "type": "notification",
-                    "message": "Client disconnected",
-                    "timestamp": str(dt.now())
-                }), conn)
-            except Exception:
-                # ignore errors when sending to other clients
-                pass
+                response = {
+                    'type': 'history',
+                    'request_id': request.get('request_id'),
+                    **await telemetry.query(
+                        since=request.get('since'),
+                        until=request.get('until'),
+                        fields=request.get('fields'),
+                        max_points=request.get('max_points'),
+                        resolution=request.get('resolution', 'auto'),
+                    ),
+                }
+            except (TypeError, ValueError) as e:
+                response = {'type': 'history', 'request_id': request.get('request_id'), 'error': str(e)}
+            await manager.send_personal_message(json.dumps(response), websocket)
+        return False
+    finally:
+        metrics.observe_message('info', label, started)
+
 
 @app.websocket("/info")
 async def send_info(websocket: WebSocket):
+    # Connections that do not negotiate keep the original full frame every 5 seconds
+    params = websocket.query_params
+    subscription = Subscription(
+        interval=clamp_interval(params.get('interval')),
+        delta=params.get('delta', '').lower() in ('1', 'true', 'yes'),
+        extended=params.get('extended', '').lower() in ('1', 'true', 'yes'),
+    )
     await manager.connect(websocket)
+    telemetry.subscribe(subscription)
     try:
+        await telemetry.wait_ready()
+        next_due = time.monotonic()
         while True:
-            cpu = psutil.cpu_percent()
-            memory = psutil.virtual_memory().percent
-            # Network percent over the interval between iterations
-            net_io = psutil.net_io_counters()
-            up_time = time.time() - psutil.boot_time()
-            curr_bytes = net_io.bytes_sent + net_io.bytes_recv
-            now = time.time()
-            prev_bytes = getattr(send_info, "_prev_net_bytes", None)
-            prev_time = getattr(send_info, "_prev_net_time", None)
-            if prev_bytes is None or prev_time is None:
-                net = 0.0
-            else:
-                delta_bytes = curr_bytes - prev_bytes
-                delta_t = max(now - prev_time, 1e-6)
-                bps = (delta_bytes * 8) / delta_t  # bits per second
-                total_mbps = sum(s.speed for s in psutil.net_if_stats().values() if s.isup and s.speed)
-                if total_mbps:
-                    total_bps = total_mbps * 1_000_000
-                    net = min(100.0, (bps / total_bps) * 100)
+            # Serve requests while waiting for the next frame
+            timeout = next_due - time.monotonic()
+            if timeout > 0:
+                try:
+                    data = await asyncio.wait_for(websocket.receive_text(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
                 else:
-                    net = 0.0
-            send_info._prev_net_bytes = curr_bytes
-            send_info._prev_net_time = now
-
-            # GPU utilization percent (use first device if available)
-            deviceCount = pynvml.nvmlDeviceGetCount()
-            if deviceCount > 0:
-                handle = pynvml.nvmlDeviceGetHandleByIndex(0)
-                util = pynvml.nvmlDeviceGetUtilizationRates(handle)
-                gpu = float(util.gpu)
-            else:
-                gpu = 0.0
-            import json 
-            await manager.send_personal_message(json.dumps({"CPU": cpu, "Memory": memory, "Network": net, "GPU": gpu,"UP_TIME":up_time}), websocket)
-            await asyncio.sleep(5)
+                    if await handle_info_request(websocket, subscription, data):
+                        next_due = time.monotonic()
+                    continue
+
+            loop_monitor.mark('info', 'snapshot')
+            frame = subscription.frame(telemetry.latest)
+            if frame is not None:
+                await manager.send_personal_message(json.dumps(frame), websocket)
+                metrics.ws_messages.labels('info', 'snapshot').inc()
+            next_due = max(next_due + subscription.interval, time.monotonic())
     except WebSocketDisconnect:
         manager.disconnect(websocket)
+    finally:
+        telemetry.unsubscribe(subscription)
 
 
 def create_decoder():
     config = pocketsphinx.Decoder.default_config()
     config.set_string("-hmm", pathjoin(MODEL_PATH, "en-us", "en-us"))
     config.set_string("-dict", pathjoin(MODEL_PATH, "en-us", "cmudict-en-us.dict"))
-    config.set_float("-kws_threshold", 1e-40)
     config.set_boolean("-logfn", False)
     
-    decoder = pocketsphinx.Decoder(config)
-    # Configure keyphrase search after decoder creation
-    try:
-        decoder.set_keyphrase('wakeup', 'jarvis')
-        decoder.set_search('wakeup')
-        print("Decoder configured with keyphrase search for 'jarvis'")
-    except Exception as e:
-        print(f"Failed to set keyphrase: {e}")
-    
+    # Keyword-list search over the configured wake words (thresholds are per phrase);
+    # the language model for post-wake transcription is loaded on first use
+    decoder = KeywordDecoder(pocketsphinx.Decoder(config), lm_path=pathjoin(MODEL_PATH, "en-us", "en-us.lm.bin"))
+    hotword_log.info("Decoder configured with keyword search", extra={"phrases": [e["phrase"] for e in wake_words.entries]})
     return decoder
 
+
+# Decoders (with any language model they loaded) are reused by later /hotword connections
+decoder_pool = DecoderPool(create_decoder, size=int(os.environ.get("JARVIS_HOTWORD_DECODER_POOL", "4")))
+
+# /face_recognition actions (metric and loop monitor labels; others are "unknown")
+FACE_RECOGNITION_ACTIONS = ('get_models', 'save_model', 'delete_model', 'invalid')
+
+
 @app.websocket("/face_recognition")
 async def face_recognition_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
-    print("Face Recognition WebSocket connected")
+    codec = await framing.accept(manager, websocket)
+    face_log.info("Face Recognition WebSocket connected")
     
     try:
         while True:
-            data = await websocket.receive_text()
+            frame = await framing.receive_frame(websocket)
+            started = time.perf_counter()
+            action = 'invalid'
             
             try:
-                parsed_data = json.loads(data)
+                parsed_data = codec.decode_request(frame)
                 if isinstance(parsed_data, dict):
                     action = parsed_data.get('action')
-                    print(f"Face recognition action: {action}")
+                    loop_monitor.mark('face_recognition', metrics.bounded_label(action, FACE_RECOGNITION_ACTIONS))
+                    face_log.debug("Face recognition action", extra={"action": action})
                     
                     if action == 'get_models':
                         # Get all face recognition models
-                        models = settings_manager.get_face_recognition_models()
+                        models = await async_settings_manager.get_face_recognition_models()
                         response = {
                             'type': 'face_recognition_models_response',
                             'request_id': parsed_data.get('request_id'),
@@ -326,53 +514,31 @@ async def face_recognition_endpoint(websocket: WebSocket):
                                 'models': models
                             }
                         }
-                        await manager.send_personal_message(json.dumps(response), websocket)
+                        await send_response(websocket, response)
                         
                     elif action == 'save_model':
                         # Save a new face recognition model
                         model_data = parsed_data.get('payload', {})
                         
-                        # Receive image data
-                        image_data = await websocket.receive_bytes()
-                        
-                        # Save the image file
-                        import uuid
-                        import os
-                        from datetime import datetime
-                        
-                        
-                        # Generate unique filename
-                        file_extension = model_data.get('extension', '.jpg')
-                        filename = f"{uuid.uuid4()}{file_extension}"
-                        file_path = os.path.join(faces_dir, filename)
-                        
-                        # Save the image file
-                        with open(file_path, 'wb') as f:
-                            f.write(image_data)
-                        
-                        # Update model data with file information
-                        model_data.update({
-                            'id': str(uuid.uuid4()),
-                            'filename': filename,
-                            'filepath': file_path,
-                            'uploaded_at': datetime.now().isoformat(),
-                            'isActive': True
-                        })
+                        # Image data arrives inline (MessagePack) or as the next frame (JSON)
+                        image_data = take_inline_image(parsed_data)
+                        if image_data is None:
+                            image_data = await websocket.receive_bytes()
                         
-                        success = settings_manager.save_face_recognition_model(model_data)
+                        # Content-hashed, deduplicated and stored with a downscaled working copy
+                        result = await save_face_upload(model_data, image_data)
                         response = {
                             'type': 'face_recognition_save_response',
                             'request_id': parsed_data.get('request_id'),
-                            'success': success,
-                            'error': None if success else 'Failed to save face recognition model'
+                            **result
                         }
-                        await manager.send_personal_message(json.dumps(response), websocket)
+                        await send_response(websocket, response)
                         
                     elif action == 'delete_model':
                         # Delete a face recognition model
                         model_id = parsed_data.get('payload', {}).get('id')
                         if model_id:
-                            success = settings_manager.delete_face_recognition_model(model_id)
+                            success = await async_settings_manager.delete_face_recognition_model(model_id)
                             response = {
                                 'type': 'face_recognition_delete_response',
                                 'request_id': parsed_data.get('request_id'),
@@ -386,7 +552,7 @@ async def face_recognition_endpoint(websocket: WebSocket):
                                 'success': False,
                                 'error': 'Model ID is required'
                             }
-                        await manager.send_personal_message(json.dumps(response), websocket)
+                        await send_response(websocket, response)
                         
                     else:
                         # Unknown action
@@ -395,20 +561,22 @@ async def face_recognition_endpoint(websocket: WebSocket):
                             'request_id': parsed_data.get('request_id'),
                             'error': f'Unknown action: {action}'
                         }
-                        await manager.send_personal_message(json.dumps(response), websocket)
+                        await send_response(websocket, response)
                         
-            except json.JSONDecodeError as e:
-                print(f"JSON decode error: {e}")
+            except framing.FrameDecodeError as e:
+                face_log.warning("Message decode error: %s", e)
                 response = {
                     'type': 'face_recognition_error',
                     'error': 'Invalid JSON format'
                 }
-                await manager.send_personal_message(json.dumps(response), websocket)
+                await send_response(websocket, response)
+            metrics.observe_message('face_recognition', metrics.bounded_label(action, FACE_RECOGNITION_ACTIONS),
+                                    started)
                 
     except WebSocketDisconnect:
-        print("Face Recognition WebSocket disconnected")
+        face_log.info("Face Recognition WebSocket disconnected")
     except Exception as e:
-        print(f"Face Recognition WebSocket error: {e}")
+        face_log.exception("Face Recognition WebSocket error: %s", e)
     finally:
         manager.disconnect(websocket)
 
@@ -416,10 +584,12 @@ async def face_recognition_endpoint(websocket: WebSocket):
 @app.websocket("/hotword")
 async def hotword(websocket: WebSocket):
     await manager.connect(websocket)
-    print("Hotword WebSocket connected")
+    hotword_log.info("Hotword WebSocket connected")
     
-    decoder = create_decoder()
-    decoder.start_utt()
+    decoder = decoder_pool.acquire()
+    # Transcribe the speech after each wake word (opt-in); None while listening for wake words
+    transcribe = websocket.query_params.get("transcribe", "").lower() in ("1", "true", "yes")
+    transcription = None
     import json
     import wave
     from io import BytesIO
@@ -427,63 +597,146 @@ async def hotword(websocket: WebSocket):
     try:
         while True:
             data = await websocket.receive_bytes()
-            print(f"Received {len(data)} bytes")
+            hotword_log.debug("Received audio chunk", extra={"sample": "hotword.chunk", "bytes": len(data)})
+            started = time.perf_counter()
+            loop_monitor.mark('hotword', 'audio')
             
             try:
                 # Parse WAV file from received bytes
                 wav_file = BytesIO(data)
                 with wave.open(wav_file, 'rb') as wf:
                     frames = wf.readframes(wf.getnframes())
+                    sample_rate = wf.getframerate()
                 
-                # Process audio
-                decoder.process_raw(frames, False, False)
+                if transcription is not None:
+                    loop_monitor.mark('hotword', 'transcribe')
+                    with metrics.hotword_decode_seconds.time():
+                        events = transcription.process(frames)
+                    for event in events:
+                        await manager.send_personal_message(json.dumps(event), websocket)
+                    if transcription.done:
+                        transcription = None
+                    metrics.observe_message('hotword', 'transcribe', started)
+                    continue
                 
-                hyp = decoder.hyp()
-                if hyp and hyp.hypstr:
-                    best_score = hyp.best_score 
-                    hyp_str = hyp.hypstr.lower()
-                    print(f"Decoder hypothesis score: {best_score}")
-                    print(f"Decoder hypothesis: {hyp_str}")
-                    if 'jarvis' in hyp_str and best_score > 1e-40:
-                        print("Wake word 'jarvis' detected!")
+                # Process audio; a keyword-list hypothesis means a phrase passed its threshold
+                with metrics.hotword_decode_seconds.time():
+                    detection = decoder.process(frames)
+                
+                if detection:
+                    hotword_log.info("Wake word detected", extra=detection)
+                    try:
+                        await manager.send_personal_message(
+                            json.dumps({"event": "wakeword_detected", "word": detection["hypothesis"], **detection}),
+                            websocket
+                        )
+                    except WebSocketDisconnect:
+                        break
+                    
+                    if transcribe:
+                        # Same decoder, language-model search until the speech ends
                         try:
-                            await manager.send_personal_message(
-                                json.dumps({"event": "wakeword_detected", "word": hyp_str}), 
-                                websocket
-                            )
-                        except WebSocketDisconnect:
-                            break
-                        
+                            transcription = Transcription(decoder, sample_rate)
+                        except Exception as e:
+                            hotword_log.error("Could not start transcription: %s", e)
+                            decoder.restart()
+                    else:
                         # Reset decoder for next detection
-                        decoder.end_utt()
-                        decoder.start_utt()
+                        decoder.restart()
                 
             except Exception as e:
-                print(f"Error processing audio: {e}")
-                import traceback
-                traceback.print_exc()
+                metrics.ws_errors.labels('hotword').inc()
+                hotword_log.exception("Error processing audio: %s", e)
+                if transcription is not None:
+                    # Abandon the transcription and go back to wake word detection
+                    transcription = None
+                    decoder.restart()
+            metrics.observe_message('hotword', 'audio', started)
     
     except WebSocketDisconnect:
-        print("Hotword WebSocket disconnected")
+        hotword_log.info("Hotword WebSocket disconnected")
         manager.disconnect(websocket)
     finally:
-        try:
-            decoder.end_utt()
-        except:
-            pass
+        decoder_pool.release(decoder)
+def detect_faces(image):
+    """Face boxes (x, y, w, h) in a BGR frame"""
+    faces = df.extract_faces(image, detector_backend="opencv", enforce_detection=False, align=False)
+    # Without a face, extract_faces returns the whole frame with confidence 0
+    return [tuple(int(face['facial_area'][k]) for k in ('x', 'y', 'w', 'h'))
+            for face in faces if face.get('confidence', 0) > 0]
+
+
+# Stored face images embedded with the faceEmbeddingBackend setting's backend
+face_index = FaceIndex(str(faces_dir), detect_faces)
+
+
+def recognize_face(image, box):
+    """(identity file, distance) of the closest stored face model for one face box"""
+    return face_index.match(image, box)
+
+
+def run_face_tracker(tracker: FaceTracker, data: bytes):
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Frame is not a decodable image")
+    with metrics.face_inference_seconds.time():
+        return tracker.process(image)
+
+
 @app.websocket("/face-verification")
 async def face_verification(websocket: WebSocket):
     await manager.connect(websocket)
+    # Faces are detected and recognised only when their tracks are lost, drift or age out
+    tracker = FaceTracker(detect_faces, recognize_face)
+    names = {}
     try:
         while True:
             data = await websocket.receive_bytes()
-            from io import BytesIO
-            dfs = df.find(BytesIO(data), db_path="")
-            print(dfs)
+            started = time.perf_counter()
+            loop_monitor.mark('face_verification', 'frame')
+            try:
+                faces, detected = await asyncio.to_thread(run_face_tracker, tracker, data)
+                if detected and any(face['identity'] for face in faces):
+                    # Stored image file -> model name, refreshed whenever faces were recognised
+                    models = await async_settings_manager.get_face_recognition_models()
+                    names = {os.path.basename(m.get('filepath', '')): m.get('name') for m in models}
+                for face in faces:
+                    face['name'] = names.get(os.path.basename(face['identity'])) if face['identity'] else None
+                face_log.debug("Face verification result", extra={"sample": "face.frame", "faces": len(faces), "detected": detected})
+                await manager.send_personal_message(json.dumps({
+                    'type': 'face_verification_result',
+                    'faces': faces,
+                    'timestamp': str(datetime.now())
+                }), websocket)
+            except Exception as e:
+                metrics.ws_errors.labels('face_verification').inc()
+                face_log.warning("Error verifying frame: %s", e)
+            metrics.observe_message('face_verification', 'frame', started)
             
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=False)
\ No newline at end of file
+
+    parser = argparse.ArgumentParser(description="Jarvis websocket server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("JARVIS_WORKERS", "1")),
+                        help="number of worker processes (default: JARVIS_WORKERS or 1)")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # This process only supervises: it owns the settings store and the broadcast bus,
+        # and every worker reaches them through the broker (see shared_state.py)
+        broker = SharedStateBroker(settings_manager)
+        broker.start()
+        broker.export_env()
+        log.info("Shared state broker listening", extra={"address": broker.address, "workers": args.workers})
+        try:
+            uvicorn.run("main:app", host=args.host, port=args.port, reload=False, workers=args.workers)
+        finally:
+            broker.close()
+    else:
+        uvicorn.run("main:app", host=args.host, port=args.port, reload=False)
\ No newline at end of file
@@ -0,0 +1,288 @@
+"""
+Prometheus-style metrics for the Jarvis server
+
+A small, dependency-free subset of the Prometheus client: counters, gauges
+and histograms with labels, rendered in the text exposition format by the
+/metrics endpoint. Labelled children are created once and cached, so the
+hot-path cost of a recording is a dict lookup, a bisect and a short locked
+update.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Sequence, Tuple
+
+# Seconds; covers sub-millisecond settings reads up to multi-second face inference
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def labels(self, *values):
+        """Child metric for one label combination (cached; keep the result on hot paths)"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {child.get()}"]
+
+
+class _Value:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float):
+        self._value = value
+
+    def get(self) -> float:
+        return self._value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+
+class _FunctionValue:
+    __slots__ = ("_fn",)
+
+    def __init__(self, fn):
+        self._fn = fn
+
+    def get(self) -> float:
+        return self._fn()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set_function(self, fn):
+        """Compute the (unlabelled) value at scrape time instead of tracking it"""
+        self._default = self._children[()] = _FunctionValue(fn)
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _render_child(self, key, child) -> List[str]:
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            bucket_labels = _format_labels(self.labelnames, key, 'le="%s"' % le)
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {total}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Server metrics
+ws_connections = registry.gauge(
+    "jarvis_ws_connections", "Open WebSocket connections")
+ws_messages = registry.counter(
+    "jarvis_ws_messages_total", "WebSocket messages handled", ("endpoint", "type"))
+ws_message_seconds = registry.histogram(
+    "jarvis_ws_message_seconds", "Time to handle one WebSocket message", ("endpoint", "type"))
+ws_errors = registry.counter(
+    "jarvis_ws_errors_total", "Errors while handling WebSocket messages", ("endpoint",))
+send_queue_depth = registry.gauge(
+    "jarvis_send_queue_depth", "WebSocket sends started but not yet completed")
+communicate_in_flight = registry.gauge(
+    "jarvis_communicate_in_flight", "/communicate requests being handled or queued on an ordered lane")
+hotword_decode_seconds = registry.histogram(
+    "jarvis_hotword_decode_seconds", "PocketSphinx decode time per audio chunk")
+wakeword_detections = registry.counter(
+    "jarvis_wakeword_detections_total", "Wake word detections", ("phrase",))
+transcriptions = registry.counter(
+    "jarvis_transcriptions_total", "Post-wake-word transcriptions by how they ended", ("reason",))
+face_inference_seconds = registry.histogram(
+    "jarvis_face_inference_seconds", "DeepFace inference time per frame")
+scheduled_events = registry.gauge(
+    "jarvis_scheduled_events", "Stored events waiting for their reminder")
+event_reminders = registry.counter(
+    "jarvis_event_reminders_total", "event_due reminders fired")
+face_frames = registry.counter(
+    "jarvis_face_frames_total", "/face-verification work per frame: tracked, detected or recognized faces", ("path",))
+settings_op_seconds = registry.histogram(
+    "jarvis_settings_op_seconds", "Settings store operation time", ("op",))
+settings_errors = registry.counter(
+    "jarvis_settings_errors_total", "Settings store operations that raised", ("op",))
+event_loop_lag_seconds = registry.histogram(
+    "jarvis_event_loop_lag_seconds", "How late the event loop heartbeat woke up")
+event_loop_stalls = registry.counter(
+    "jarvis_event_loop_stalls_total", "Event loop stalls over the lag threshold", ("handler", "type"))
+event_loop_stall_seconds = registry.histogram(
+    "jarvis_event_loop_stall_seconds", "Length of event loop stalls over the lag threshold", ("handler", "type"))
+
+
+def timed_settings_op(func):
+    """Decorator recording a settings store method in settings_op_seconds"""
+    histogram = settings_op_seconds.labels(func.__name__)
+    errors = settings_errors.labels(func.__name__)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - started)
+    return wrapper
+
+
+def bounded_label(value, known) -> str:
+    """value if it is one of the known label values, else "unknown"
+
+    Label values that come from clients or decoders must go through this (or
+    another fixed set), so arbitrary input cannot create new series.
+    """
+    return value if isinstance(value, str) and value in known else "unknown"
+
+
+def observe_message(endpoint: str, message_type: str, started: float):
+    """Count one WebSocket message and record its handling time since started"""
+    ws_messages.labels(endpoint, message_type).inc()
+    ws_message_seconds.labels(endpoint, message_type).observe(time.perf_counter() - started)
+
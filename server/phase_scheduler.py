@@ -0,0 +1,145 @@
+"""
+Dependency-graph scheduler for DeepFinder workflow phases
+
+Phases declare the phases they depend on; every phase whose dependencies have
+finished is started immediately on a thread pool, so independent phases run
+concurrently and a phase only waits for the outputs it actually consumes.
+Each run records a timing trace with the critical path and the speedup over
+running the same phases one after another.
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class PhaseGraphError(ValueError):
+    """Raised for unknown dependencies or dependency cycles"""
+
+
+class Phase:
+    """A unit of work: func receives a {dependency name: output} dict"""
+
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any], deps: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+class PhaseScheduler:
+    """Runs a DAG of phases with as much parallelism as the dependencies allow"""
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.phases: Dict[str, Phase] = {}
+
+    def add(self, name: str, func: Callable[[Dict[str, Any]], Any], deps: Iterable[str] = ()) -> "PhaseScheduler":
+        if name in self.phases:
+            raise PhaseGraphError(f"Duplicate phase: {name}")
+        self.phases[name] = Phase(name, func, deps)
+        return self
+
+    def order(self) -> List[str]:
+        """Topological order of the phases (validates the graph)"""
+        for phase in self.phases.values():
+            for dep in phase.deps:
+                if dep not in self.phases:
+                    raise PhaseGraphError(f"Phase {phase.name} depends on unknown phase {dep}")
+        ordered, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise PhaseGraphError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            for dep in self.phases[name].deps:
+                visit(dep, path + [name])
+            state[name] = "done"
+            ordered.append(name)
+
+        for name in self.phases:
+            visit(name, [])
+        return ordered
+
+    def run(self):
+        """
+        Execute every phase and return (outputs, trace).
+
+        The first phase to raise stops new phases from starting; phases already
+        running are allowed to finish and the exception is re-raised.
+        """
+        order = self.order()
+        outputs: Dict[str, Any] = {}
+        timings: Dict[str, Dict[str, Any]] = {}
+        remaining = {name: set(self.phases[name].deps) for name in order}
+        run_start = time.perf_counter()
+
+        def execute(phase: Phase):
+            inputs = {dep: outputs[dep] for dep in phase.deps}
+            started = time.perf_counter()
+            try:
+                return phase.func(inputs)
+            finally:
+                finished = time.perf_counter()
+                timings[phase.name] = {
+                    "phase": phase.name,
+                    "deps": list(phase.deps),
+                    "start": round(started - run_start, 3),
+                    "end": round(finished - run_start, 3),
+                    "duration": round(finished - started, 3),
+                    "thread": threading.current_thread().name,
+                }
+
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="phase") as executor:
+            running = {}
+
+            def submit_ready():
+                for name in [n for n, deps in remaining.items() if not deps]:
+                    del remaining[name]
+                    running[executor.submit(execute, self.phases[name])] = name
+
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        outputs[name] = future.result()
+                    except BaseException as e:
+                        error = error or e
+                        continue
+                    for deps in remaining.values():
+                        deps.discard(name)
+                if error is None:
+                    submit_ready()
+
+        if error is not None:
+            raise error
+        wall_time = time.perf_counter() - run_start
+        return outputs, self._trace(order, timings, wall_time)
+
+    def _trace(self, order: List[str], timings: Dict[str, Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+        # Longest duration-weighted path through the DAG
+        best: Dict[str, float] = {}
+        via: Dict[str, Optional[str]] = {}
+        for name in order:
+            deps = self.phases[name].deps
+            prev = max(deps, key=lambda d: best[d]) if deps else None
+            best[name] = timings[name]["duration"] + (best[prev] if prev else 0.0)
+            via[name] = prev
+        path, node = [], max(best, key=best.get) if best else None
+        while node is not None:
+            path.append(node)
+            node = via[node]
+        serial_time = sum(t["duration"] for t in timings.values())
+        return {
+            "phases": [timings[name] for name in order],
+            "wall_time": round(wall_time, 3),
+            "serial_time": round(serial_time, 3),
+            "critical_path": list(reversed(path)),
+            "critical_path_time": round(best[path[0]], 3) if path else 0.0,
+            "speedup": round(serial_time / wall_time, 2) if wall_time > 0 else 1.0,
+        }
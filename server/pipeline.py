@@ -0,0 +1,95 @@
+"""
+Pipelined request handling for one WebSocket connection
+
+The receive loop hands each request to a RequestPipeline instead of awaiting
+it, so a slow request no longer holds up the ones behind it. Each request is
+submitted as one of:
+
+- WRITE: settings and event writes, model uploads. They go through a single
+  per-connection lane and run one after another in arrival order.
+- READ: settings, event and model reads. They run concurrently with each
+  other, but only once every WRITE the connection submitted before them has
+  finished, so a read always sees the connection's earlier writes.
+- OTHER: runs concurrently without any ordering.
+
+Responses may still arrive in a different order than the requests (a read
+submitted before a write can finish after it); clients match responses to
+requests by request_id.
+
+A per-connection semaphore caps the requests in flight; when it is exhausted
+submit() waits, which stops the receive loop and pushes back on the client.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from metrics import communicate_in_flight
+from jarvis_logging import get_logger
+
+log = get_logger("pipeline")
+
+Job = Callable[[], Awaitable[None]]
+
+WRITE = "write"
+READ = "read"
+OTHER = "other"
+
+
+class RequestPipeline:
+    def __init__(self, max_in_flight: int = 8):
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._tasks = set()
+        self._lane: Optional[asyncio.Queue] = None
+        self._lane_task: Optional[asyncio.Task] = None
+        # Resolved when the most recently submitted WRITE has run (the lane is FIFO)
+        self._last_write: Optional[asyncio.Future] = None
+
+    async def submit(self, job: Job, kind: str = OTHER):
+        """Queue a WRITE on the lane or start a READ/OTHER job; waits while the connection is at its limit"""
+        await self._slots.acquire()
+        communicate_in_flight.inc()
+        if kind == WRITE:
+            if self._lane is None:
+                self._lane = asyncio.Queue()
+                self._lane_task = self._spawn(self._run_lane())
+            self._last_write = asyncio.get_running_loop().create_future()
+            self._lane.put_nowait((job, self._last_write))
+        elif kind == READ and self._last_write is not None and not self._last_write.done():
+            self._spawn(self._run(job, after=self._last_write))
+        else:
+            self._spawn(self._run(job))
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        # Keep a reference so running requests are not garbage collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, job: Job, after: Optional[asyncio.Future] = None):
+        try:
+            if after is not None:
+                # Shielded: other reads may be waiting on the same write
+                await asyncio.shield(after)
+            await job()
+        except Exception as e:
+            log.exception("Request failed: %s", e)
+        finally:
+            communicate_in_flight.dec()
+            self._slots.release()
+
+    async def _run_lane(self):
+        while True:
+            item = await self._lane.get()
+            if item is None:
+                return
+            job, done = item
+            try:
+                await self._run(job)
+            finally:
+                done.set_result(None)
+
+    def close(self):
+        """Stop the write lane once its queued requests have run; running requests finish on their own"""
+        if self._lane is not None:
+            self._lane.put_nowait(None)
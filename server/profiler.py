@@ -0,0 +1,250 @@
+"""
+Runtime sampling profiler
+
+A wall-clock sampler that can be switched on in a running server for a fixed
+window. A background thread walks sys._current_frames() every few
+milliseconds and counts collapsed stacks (the input format of flamegraph.pl
+and speedscope), while a task on the event loop records loop lag and
+periodic asyncio task snapshots. Nothing runs while the profiler is idle.
+
+Control endpoints (under /debug/profiler):
+    POST /start?duration=30&interval_ms=5   start a profiling window
+    POST /stop                              end the window early
+    GET  /status                            running state and sample count
+    GET  /result                            collapsed stacks (text)
+    GET  /result?format=json                loop lag and task snapshots
+
+If JARVIS_CONTROL_TOKEN is set, requests must carry it in the
+X-Jarvis-Control-Token header; otherwise only loopback clients are allowed.
+In multi-worker mode each worker profiles itself.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+from jarvis_logging import get_logger
+
+log = get_logger("profiler")
+
+CONTROL_TOKEN_ENV = "JARVIS_CONTROL_TOKEN"
+MAX_DURATION = 300.0
+LAG_INTERVAL = 0.05
+SNAPSHOT_INTERVAL = 1.0
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)})"
+
+
+def _collapse(thread_name: str, frame) -> str:
+    """Root-first, semicolon-separated stack as used by collapsed-stack flamegraph tools"""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+def _task_location(task: asyncio.Task) -> str:
+    """Coroutine name and where it is suspended, preferring the innermost server frame
+
+    A WebSocket task's coroutine is uvicorn's; the server frame names the
+    handler (hotword, face_verification, ...) and the await it is parked on.
+    """
+    coro = task.get_coro()
+    name = getattr(coro, "__qualname__", type(coro).__name__)
+    stack = task.get_stack()
+    if not stack:
+        return name
+    server_frames = [f for f in stack if f.f_code.co_filename.startswith(SERVER_DIR)]
+    frame = server_frames[-1] if server_frames else stack[-1]
+    return f"{name} @ {_frame_name(frame)}:{frame.f_lineno}"
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+class SamplingProfiler:
+    """One profiling window at a time; results stay available until the next start"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Guards stacks: the sampler thread writes while endpoints may read
+        self._data_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._loop = None
+        self._lag_task = None
+        self._reset(0.0, 0.0)
+
+    def _reset(self, duration: float, interval: float):
+        self.stacks = Counter()
+        self.samples = 0
+        self.duration = duration
+        self.interval = interval
+        self.started_at = None
+        self.finished_at = None
+        self.loop_lag: List[float] = []
+        self.task_snapshots = deque(maxlen=int(MAX_DURATION / SNAPSHOT_INTERVAL))
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float, interval: float = 0.005):
+        """Start a window on the running event loop (call from the loop thread)"""
+        with self._lock:
+            if self.running:
+                raise ProfilerBusy("Profiler is already running")
+            self._reset(duration, interval)
+            self._stop.clear()
+            self._loop = asyncio.get_running_loop()
+            self.started_at = datetime.now().isoformat()
+            deadline = time.monotonic() + duration
+            self._thread = threading.Thread(target=self._sample, args=(deadline,),
+                                            name="jarvis-profiler", daemon=True)
+            self._thread.start()
+            self._lag_task = self._loop.create_task(self._watch_loop(deadline))
+        log.info("Profiler started", extra={"duration": duration, "interval": interval})
+
+    def stop(self):
+        self._stop.set()
+
+    def _sample(self, deadline: float):
+        own = threading.get_ident()
+        names, names_refreshed = {}, 0.0
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            now = time.monotonic()
+            if now - names_refreshed > 1.0:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                names_refreshed = now
+            collapsed = [_collapse(names.get(ident, f"thread-{ident}"), frame)
+                         for ident, frame in sys._current_frames().items() if ident != own]
+            with self._data_lock:
+                self.stacks.update(collapsed)
+                self.samples += 1
+        self._stop.set()
+        self.finished_at = datetime.now().isoformat()
+        log.info("Profiler finished", extra={"samples": self.samples, "stacks": len(self.stacks)})
+
+    async def _watch_loop(self, deadline: float):
+        """Loop lag (sleep overshoot) and asyncio task snapshots for the window"""
+        last_snapshot = 0.0
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            now = time.monotonic()
+            if now - last_snapshot >= SNAPSHOT_INTERVAL:
+                self._snapshot_tasks()
+                last_snapshot = now
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.loop_lag.append(max(0.0, time.perf_counter() - started - LAG_INTERVAL))
+        self._snapshot_tasks()
+
+    def _snapshot_tasks(self):
+        tasks = asyncio.all_tasks()
+        locations = Counter(_task_location(task) for task in tasks)
+        self.task_snapshots.append({
+            "time": datetime.now().isoformat(),
+            "tasks": len(tasks),
+            "by_location": dict(locations.most_common()),
+        })
+
+    def collapsed(self) -> str:
+        with self._data_lock:
+            stacks = self.stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": self.duration,
+            "interval_ms": round(self.interval * 1000, 3),
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+        }
+
+    def report(self) -> Dict[str, Any]:
+        lag = sorted(self.loop_lag)
+        return {
+            **self.status(),
+            "loop_lag_ms": {
+                "count": len(lag),
+                "p50": round(_percentile(lag, 50) * 1000, 3),
+                "p95": round(_percentile(lag, 95) * 1000, 3),
+                "p99": round(_percentile(lag, 99) * 1000, 3),
+                "max": round(lag[-1] * 1000, 3) if lag else 0.0,
+            },
+            "task_snapshots": list(self.task_snapshots),
+        }
+
+
+profiler = SamplingProfiler()
+
+
+def require_control_access(request: Request):
+    token = os.environ.get(CONTROL_TOKEN_ENV)
+    if token:
+        if request.headers.get("x-jarvis-control-token") != token:
+            raise HTTPException(status_code=403, detail="Invalid control token")
+    elif request.client is None or request.client.host not in ("127.0.0.1", "::1"):
+        raise HTTPException(status_code=403, detail=f"Set {CONTROL_TOKEN_ENV} to allow remote control")
+
+
+router = APIRouter(prefix="/debug/profiler", tags=["debug"], dependencies=[Depends(require_control_access)])
+
+
+@router.post("/start", status_code=202)
+async def start_profiler(duration: float = 30.0, interval_ms: float = 5.0):
+    if not 0 < duration <= MAX_DURATION:
+        raise HTTPException(status_code=400, detail=f"duration must be in (0, {MAX_DURATION:g}] seconds")
+    if not 1.0 <= interval_ms <= 1000.0:
+        raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 1000")
+    try:
+        profiler.start(duration, interval_ms / 1000.0)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profiler.status()
+
+
+@router.post("/stop")
+async def stop_profiler():
+    profiler.stop()
+    return profiler.status()
+
+
+@router.get("/status")
+async def profiler_status():
+    return profiler.status()
+
+
+@router.get("/result")
+async def profiler_result(format: Optional[str] = "collapsed"):
+    if profiler.started_at is None:
+        raise HTTPException(status_code=404, detail="No profile has been recorded")
+    if format == "json":
+        return profiler.report()
+    return PlainTextResponse(profiler.collapsed(), headers={
+        "Content-Disposition": "attachment; filename=jarvis-profile.collapsed",
+    })
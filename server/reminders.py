@@ -0,0 +1,234 @@
+"""
+Reminders for stored calendar events
+
+EventScheduler keeps the upcoming events in a min-heap keyed by due time and
+pushes an "event_due" message to subscribed sockets when one comes up:
+
+    {"type": "event_due", "payload": <event>, "timestamp": "..."}
+
+A /communicate client subscribes with {"type": "subscribe_events"}. The heap
+is built once from the store at startup and then maintained incrementally by
+the save/update/delete handlers: an update or delete does not search the
+heap, it replaces the event's entry in an index and leaves the old heap entry
+to be discarded when it reaches the top (lazy deletion). Every change is
+O(log n); the heap is compacted when stale entries outnumber live ones.
+
+With several workers every worker keeps its own heap (each reminds its own
+subscribers). schedule() and cancel() publish the change on the shared state
+bus and the other workers apply it, so all heaps stay the same. Changes that
+arrive before load() has read the store are replayed after it.
+
+Event times are the ISO "time" field ("dateTime" on the wire), read as UTC
+when they carry no offset. Events already more than GRACE seconds in the past
+when scheduled, completed events and events without a parsable time are not
+scheduled. Each event fires once.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from metrics import event_reminders, scheduled_events
+from jarvis_logging import get_logger
+
+log = get_logger("reminders")
+
+# Seconds an event may already be overdue when it is scheduled and still fire
+GRACE = 60.0
+# Longest single wait, so wall-clock changes are picked up
+MAX_SLEEP = 60.0
+
+Notify = Callable[[Any, dict], Awaitable[None]]
+
+
+def due_time(event: Dict[str, Any]) -> Optional[float]:
+    """Epoch seconds the event is due, or None if it has no usable time"""
+    value = event.get('time') or event.get('dateTime')
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        when = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when.timestamp()
+
+
+class EventScheduler:
+    # Shared state bus topic carrying ("schedule", event) / ("cancel", event_id) changes
+    BUS_TOPIC = "event_schedule"
+
+    def __init__(self):
+        # (due, seq, key); an entry is live only while _entries[key] still has its seq
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._entries: Dict[Any, Tuple[float, int, dict]] = {}
+        self._seq = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._notify: Optional[Notify] = None
+        self.subscribers = set()
+        self.bus = None
+        # Bus changes received before load(); None once loaded
+        self._early_changes: Optional[List[Tuple[str, Any]]] = []
+        scheduled_events.set_function(lambda: len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, events: List[Dict[str, Any]]):
+        """Replace the schedule with the given stored events (one heapify, O(n))"""
+        self._heap, self._entries = [], {}
+        now = time.time()
+        for event in events:
+            entry = self._entry(event, now)
+            if entry is not None:
+                key, due, seq = entry
+                self._entries[key] = (due, seq, event)
+                self._heap.append((due, seq, key))
+        heapq.heapify(self._heap)
+        early, self._early_changes = self._early_changes or [], None
+        for change in early:
+            self._apply(change)
+        self._wake()
+        log.info("Scheduled event reminders", extra={"events": len(self._entries)})
+
+    def attach_bus(self, bus):
+        """Publish schedule changes to the other workers (pair with on_bus_message)"""
+        self.bus = bus
+
+    async def on_bus_message(self, topic: str, change: Tuple[str, Any]):
+        """Apply a schedule change made by another worker"""
+        if topic != self.BUS_TOPIC:
+            return
+        if self._early_changes is not None:
+            self._early_changes.append(change)
+        else:
+            self._apply(change)
+
+    def _apply(self, change: Tuple[str, Any]):
+        action, value = change
+        if action == "schedule":
+            self._schedule(value)
+        elif action == "cancel":
+            self._cancel(value)
+
+    def _publish(self, change: Tuple[str, Any]):
+        if self.bus is not None:
+            self.bus.publish(self.BUS_TOPIC, change)
+
+    def _entry(self, event: Dict[str, Any], now: float) -> Optional[Tuple[Any, float, int]]:
+        if not isinstance(event, dict) or event.get('completed'):
+            return None
+        due = due_time(event)
+        if due is None or due < now - GRACE:
+            return None
+        # Events without an id cannot be updated or deleted later; give them a key of their own
+        key = event.get('id')
+        if key is None:
+            key = object()
+        return key, due, next(self._seq)
+
+    def schedule(self, event: Dict[str, Any]):
+        """Add or reschedule a saved/updated event, in every worker"""
+        self._schedule(event)
+        self._publish(("schedule", event))
+
+    def cancel(self, event_id: Any):
+        """Forget a deleted event, in every worker"""
+        self._cancel(event_id)
+        self._publish(("cancel", event_id))
+
+    def _schedule(self, event: Dict[str, Any]):
+        self._cancel(event.get('id'))
+        if 'dateTime' in event:
+            # Stored events carry the wire dateTime as time
+            event = {**{k: v for k, v in event.items() if k != 'dateTime'}, 'time': event['dateTime']}
+        entry = self._entry(event, time.time())
+        if entry is None:
+            return
+        key, due, seq = entry
+        self._entries[key] = (due, seq, event)
+        heapq.heappush(self._heap, (due, seq, key))
+        self._wake()
+
+    def _cancel(self, event_id: Any):
+        # The heap entry is dropped when it surfaces
+        if event_id is not None and self._entries.pop(event_id, None) is not None:
+            self._compact()
+
+    def _compact(self):
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(due, seq, key) for key, (due, seq, _) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_stale(self):
+        while self._heap:
+            due, seq, key = self._heap[0]
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == seq:
+                return
+            heapq.heappop(self._heap)
+
+    def _wake(self):
+        if self._changed is not None:
+            self._changed.set()
+
+    def start(self, notify: Notify):
+        """Run the timer on the current loop; notify(websocket, message) delivers reminders"""
+        self._notify = notify
+        self._changed = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._pop_stale()
+            if self._heap:
+                delay = min(self._heap[0][0] - time.time(), MAX_SLEEP)
+            else:
+                delay = None
+            if delay is None or delay > 0:
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, key = heapq.heappop(self._heap)
+            _, _, event = self._entries.pop(key)
+            await self._fire(event)
+
+    async def _fire(self, event: Dict[str, Any]):
+        event_reminders.inc()
+        log.info("Event due", extra={"event_id": event.get('id'), "subscribers": len(self.subscribers)})
+        message = {
+            'type': 'event_due',
+            'payload': event,
+            'timestamp': str(datetime.now())
+        }
+        for websocket in list(self.subscribers):
+            try:
+                await self._notify(websocket, message)
+            except Exception as e:
+                log.warning("Could not deliver event reminder: %s", e)
+
+    def subscribe(self, websocket):
+        self.subscribers.add(websocket)
+
+    def unsubscribe(self, websocket):
+        self.subscribers.discard(websocket)
+
+    def next_due(self) -> Optional[float]:
+        self._pop_stale()
+        return self._heap[0][0] if self._heap else None
+
+
+scheduler = EventScheduler()
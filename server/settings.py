@@ -1,265 +1,233 @@
 from dotenv import load_dotenv
 
 
-from mongita import MongitaClientDisk
+import asyncio
 import json
 import os
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+from storage import open_store, default_settings
+from shared_state import RemoteSettingsManager, shared_state_from_env
+from metrics import timed_settings_op
+from jarvis_logging import get_logger
+
+log = get_logger("settings")
 
 class SettingsManager:
-    def __init__(self, db_path: str = "./db"):
-        # Create the database directory if it doesn't exist
-        os.makedirs(db_path, exist_ok=True)
-        self.client = MongitaClientDisk(db_path)
-        self.db = self.client.settings_db
-        self.settings_collection = self.db.settings
-        
-        # Initialize default settings if collection is empty
-        if self.settings_collection.count_documents({}) == 0:
-            self.initialize_default_settings()
-    
-    def initialize_default_settings(self):
-        """Initialize default settings in the database"""
-        default_settings = {
-            "useVideo": True,
-            "theme": "dark",
-            "notifications": True,
-            "auto_update": False,
-            "city": "New York",
-            "use24hrFormat": False,
-            "useFaceRecognition": False,
-            "faceRecognitionModels": [],
-            "events": []
-        }
-        self.settings_collection.insert_one(default_settings)
-    
+    def __init__(self, db_path: Optional[str] = None, backend: Optional[str] = None):
+        # Persistence goes to the JARVIS_STORAGE backend (Mongita ./db unless configured otherwise)
+        self.store = open_store(backend, db_path)
+
+    @property
+    def concurrent_reads(self) -> bool:
+        return self.store.concurrent_reads
+
+    def close_thread(self):
+        """Release the calling thread's store connection (a broker connection thread is done)"""
+        self.store.close_thread()
+
+    @staticmethod
+    def _process_event(event_data: Dict[str, Any]) -> Dict[str, Any]:
+        # If the event has a dateTime field, use it; otherwise use the old time field
+        processed_event_data = event_data.copy()
+        if 'dateTime' in event_data:
+            processed_event_data['time'] = event_data['dateTime']
+            del processed_event_data['dateTime']
+        return processed_event_data
+
+    @timed_settings_op
     def get_settings(self) -> Dict[str, Any]:
         """Retrieve all settings from the database"""
-        settings_doc = self.settings_collection.find_one({})
+        settings_doc = self.store.get_settings()
         if settings_doc:
-            # Remove the _id field from the result
-            settings_doc.pop('_id', None)
             return settings_doc
         else:
             # Return default settings if none exist
-            return {
-                "useVideo": True,
-                "theme": "dark",
-                "notifications": True,
-                "auto_update": False,
-                "city": "New York",
-                "use24hrFormat": False,
-                "useFaceRecognition": False,
-                "faceRecognitionModels": [],
-                "events": []
-            }
-    
+            return default_settings()
+
+    @timed_settings_op
     def update_settings(self, new_settings: Dict[str, Any]) -> bool:
         """Update settings in the database"""
         try:
-            # Get the first document (there should only be one settings doc)
-            existing_doc = self.settings_collection.find_one({})
-            
-            if existing_doc:
-                # Update the existing document
-                result = self.settings_collection.update_one(
-                    {"_id": existing_doc["_id"]},
-                    {"$set": new_settings}
-                )
-                return result.modified_count > 0
-            else:
-                # Insert new settings document
-                self.settings_collection.insert_one(new_settings)
-                return True
+            return self.store.update_settings(new_settings)
         except Exception as e:
-            print(f"Error updating settings: {e}")
+            log.error("Error updating settings: %s", e)
             return False
-    
+
+    @timed_settings_op
     def get_events(self) -> list:
         """Retrieve all events from the database"""
-        settings_doc = self.settings_collection.find_one({})
-        if settings_doc and 'events' in settings_doc:
-            return settings_doc['events']
-        else:
-            return []
-    
+        return self.store.get_events()
+
+    @timed_settings_op
     def save_event(self, event_data: Dict[str, Any]) -> bool:
         """Save a new event to the database"""
         try:
-            # Get the existing document
-            existing_doc = self.settings_collection.find_one({})
-            
-            if existing_doc:
-                # Get current events and append the new one
-                current_events = existing_doc.get('events', [])
-                
-                # If the event has a dateTime field, use it; otherwise use the old time field
-                processed_event_data = event_data.copy()
-                if 'dateTime' in event_data:
-                    processed_event_data['time'] = event_data['dateTime']
-                    del processed_event_data['dateTime']
-                
-                current_events.append(processed_event_data)
-                
-                # Update the events array in the document
-                result = self.settings_collection.update_one(
-                    {"_id": existing_doc["_id"]},
-                    {"$set": {"events": current_events}}
-                )
-                return result.modified_count >= 0  # Success if no error occurred
-            
-            else:
-                # Create new settings document with the event
-                self.settings_collection.insert_one({"events": [event_data]})
-                return True
+            return self.store.add_event(self._process_event(event_data))
         except Exception as e:
-            print(f"Error saving event: {e}")
+            log.error("Error saving event: %s", e)
             return False
-    
+
+    @timed_settings_op
     def update_event(self, event_data: Dict[str, Any]) -> bool:
         """Update an existing event in the database"""
         try:
-            # Get the existing document
-            existing_doc = self.settings_collection.find_one({})
-            
-            if existing_doc and 'events' in existing_doc:
-                # Find and update the event with matching id
-                current_events = existing_doc.get('events', [])
-                updated_events = []
-                found = False
-                
-                for event in current_events:
-                    if event.get('id') == event_data.get('id'):
-                        # Update this event with new data
-                        # If the event has a dateTime field, use it; otherwise use the old time field
-                        processed_event_data = event_data.copy()
-                        if 'dateTime' in event_data:
-                            processed_event_data['time'] = event_data['dateTime']
-                            del processed_event_data['dateTime']
-                        updated_events.append(processed_event_data)
-                        found = True
-                    else:
-                        updated_events.append(event)
-                
-                # If event was not found, return False
-                if not found:
-                    return False
-                
-                # Update the events array in the document
-                result = self.settings_collection.update_one(
-                    {"_id": existing_doc["_id"]},
-                    {"$set": {"events": updated_events}}
-                )
-                return result.modified_count > 0
-            else:
-                return False
+            return self.store.replace_event(self._process_event(event_data))
         except Exception as e:
-            print(f"Error updating event: {e}")
+            log.error("Error updating event: %s", e)
             return False
-    
+
+    @timed_settings_op
     def delete_event(self, event_id: str) -> bool:
         """Delete an existing event from the database"""
         try:
-            # Get the existing document
-            existing_doc = self.settings_collection.find_one({})
-            
-            if existing_doc and 'events' in existing_doc:
-                # Filter out the event with matching id
-                current_events = existing_doc.get('events', [])
-                updated_events = [event for event in current_events if event.get('id') != event_id]
-                
-                # Update the events array in the document
-                result = self.settings_collection.update_one(
-                    {"_id": existing_doc["_id"]},
-                    {"$set": {"events": updated_events}}
-                )
-                return result.modified_count >= 0
-            else:
-                return False
+            return self.store.delete_event(event_id)
         except Exception as e:
-            print(f"Error deleting event: {e}")
+            log.error("Error deleting event: %s", e)
             return False
 
+    @timed_settings_op
     def get_face_recognition_models(self) -> list:
         """Retrieve all face recognition models from the database"""
-        settings_doc = self.settings_collection.find_one({})
-        if settings_doc and 'faceRecognitionModels' in settings_doc:
-            return settings_doc['faceRecognitionModels']
-        else:
-            return []
-    
+        return self.store.get_models()
+
+    @timed_settings_op
     def save_face_recognition_model(self, model_data: Dict[str, Any]) -> bool:
         """Save a new face recognition model to the database"""
         try:
-            # Get the existing document
-            existing_doc = self.settings_collection.find_one({})
-            
-            if existing_doc:
-                # Get current face recognition models and append the new one
-                current_models = existing_doc.get('faceRecognitionModels', [])
-                current_models.append(model_data)
-                
-                # Update the faceRecognitionModels array in the document
-                result = self.settings_collection.update_one(
-                    {"_id": existing_doc["_id"]},
-                    {"$set": {"faceRecognitionModels": current_models}}
-                )
-                return result.modified_count >= 0  # Success if no error occurred
-            
-            else:
-                # Create new settings document with the face recognition model
-                self.settings_collection.insert_one({"faceRecognitionModels": [model_data]})
-                return True
+            return self.store.add_model(model_data)
         except Exception as e:
-            print(f"Error saving face recognition model: {e}")
+            log.error("Error saving face recognition model: %s", e)
             return False
-    
+
+    @timed_settings_op
+    def save_face_upload_model(self, model_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Save the model of an ingested upload unless one with the same content_hash exists.
+
+        Settings calls have a single writer (the writer thread, or the broker in
+        multi-worker mode), so the duplicate check and the insert are atomic.
+        Returns {"success", "duplicate", "payload", "error"}; if the model is not
+        saved, its image files are deleted (no other model uses them: their
+        names are the content hash).
+        """
+        try:
+            existing = next((m for m in self.store.get_models()
+                             if m.get('content_hash') == model_data.get('content_hash')), None)
+            if existing is not None:
+                return {'success': True, 'duplicate': True, 'payload': existing, 'error': None}
+            if not os.path.exists(model_data.get('filepath') or ''):
+                # Another upload of this image failed and removed the files in the meantime
+                return {'success': False, 'duplicate': False, 'payload': None,
+                        'error': 'Uploaded image was removed; please upload it again'}
+            if self.store.add_model(model_data):
+                return {'success': True, 'duplicate': False, 'payload': model_data, 'error': None}
+        except Exception as e:
+            log.error("Error saving face recognition model: %s", e)
+        self._delete_model_files(model_data)
+        return {'success': False, 'duplicate': False, 'payload': None,
+                'error': 'Failed to save face recognition model'}
+
+    @staticmethod
+    def _delete_model_files(model: Dict[str, Any]):
+        try:
+            # Delete the image file from filesystem
+            file_path = model.get('filepath')
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
+                log.info("Deleted face recognition image file", extra={"path": file_path})
+            else:
+                log.warning("Image file not found or no filepath specified", extra={"path": file_path})
+            # Uploads ingested with a working copy also keep the original
+            original_path = model.get('original_filepath')
+            if original_path and os.path.exists(original_path):
+                os.remove(original_path)
+        except Exception as file_error:
+            log.warning("Could not delete image file %s: %s", model.get('filepath', 'unknown'), file_error)
+
+    @timed_settings_op
     def delete_face_recognition_model(self, model_id: str) -> bool:
         """Delete a face recognition model from the database and filesystem"""
         try:
-            # Get the existing document
-            existing_doc = self.settings_collection.find_one({})
-            
-            if existing_doc and 'faceRecognitionModels' in existing_doc:
-                # Find the model to delete (to get the file path)
-                current_models = existing_doc.get('faceRecognitionModels', [])
-                model_to_delete = None
-                
-                # Find the model with matching id
-                for model in current_models:
-                    if model.get('id') == model_id:
-                        model_to_delete = model
-                        break
-                
-                # Filter out the model with matching id
-                updated_models = [model for model in current_models if model.get('id') != model_id]
-                
-                # Update the faceRecognitionModels array in the document
-                result = self.settings_collection.update_one(
-                    {"_id": existing_doc["_id"]},
-                    {"$set": {"faceRecognitionModels": updated_models}}
-                )
-                
-                # If database update was successful and we found the model, delete the image file
-                if result.modified_count >= 0 and model_to_delete:
-                    try:
-                        # Delete the image file from filesystem
-                        file_path = model_to_delete.get('filepath')
-                        if file_path and os.path.exists(file_path):
-                            os.remove(file_path)
-                            print(f"Deleted face recognition image file: {file_path}")
-                        else:
-                            print(f"Image file not found or no filepath specified: {file_path}")
-                    except Exception as file_error:
-                        print(f"Warning: Could not delete image file {model_to_delete.get('filepath', 'unknown')}: {file_error}")
-                        # Don't return False here - database deletion was successful
-                
-                return result.modified_count >= 0
-            else:
-                return False
+            deleted, model_to_delete = self.store.delete_model(model_id)
+
+            # If database update was successful and we found the model, delete the image file
+            # (a failure there does not fail the call - the database deletion was successful)
+            if deleted and model_to_delete:
+                self._delete_model_files(model_to_delete)
+
+            return deleted
         except Exception as e:
-            print(f"Error deleting face recognition model: {e}")
+            log.error("Error deleting face recognition model: %s", e)
             return False
 
+class AsyncSettingsManager:
+    """SettingsManager methods as coroutines, so handlers never block the event loop on storage
+
+    Writes run one at a time, in submission order, on a dedicated writer thread.
+    Reads go to a small reader pool when the store allows reads alongside a
+    write (SQLite WAL); otherwise they queue on the writer thread as well.
+    """
+
+    def __init__(self, manager, readers: int = 4):
+        self.manager = manager
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="settings-writer")
+        if getattr(manager, "concurrent_reads", False):
+            self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="settings-reader")
+        else:
+            self._readers = self._writer
+
+    async def _read(self, method, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._readers, method, *args)
+
+    async def _write(self, method, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._writer, method, *args)
+
+    async def get_settings(self) -> Dict[str, Any]:
+        return await self._read(self.manager.get_settings)
+
+    async def update_settings(self, new_settings: Dict[str, Any]) -> bool:
+        return await self._write(self.manager.update_settings, new_settings)
+
+    async def get_events(self) -> list:
+        return await self._read(self.manager.get_events)
+
+    async def save_event(self, event_data: Dict[str, Any]) -> bool:
+        return await self._write(self.manager.save_event, event_data)
+
+    async def update_event(self, event_data: Dict[str, Any]) -> bool:
+        return await self._write(self.manager.update_event, event_data)
+
+    async def delete_event(self, event_id: str) -> bool:
+        return await self._write(self.manager.delete_event, event_id)
+
+    async def get_face_recognition_models(self) -> list:
+        return await self._read(self.manager.get_face_recognition_models)
+
+    async def save_face_recognition_model(self, model_data: Dict[str, Any]) -> bool:
+        return await self._write(self.manager.save_face_recognition_model, model_data)
+
+    async def save_face_upload_model(self, model_data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._write(self.manager.save_face_upload_model, model_data)
+
+    async def delete_face_recognition_model(self, model_id: str) -> bool:
+        return await self._write(self.manager.delete_face_recognition_model, model_id)
+
+    def shutdown(self):
+        """Wait for queued operations to finish and stop the I/O threads"""
+        self._writer.shutdown(wait=True)
+        if self._readers is not self._writer:
+            self._readers.shutdown(wait=True)
+
+
 # Create a global instance of SettingsManager
-settings_manager = SettingsManager()
+# Workers of a multi-worker deployment share the supervisor's single writer instead
+_shared_state = shared_state_from_env()
+if _shared_state:
+    settings_manager = RemoteSettingsManager(*_shared_state)
+else:
+    settings_manager = SettingsManager()
+
+# Coroutine facade used by the WebSocket handlers
+async_settings_manager = AsyncSettingsManager(
+    settings_manager, readers=int(os.environ.get("JARVIS_SETTINGS_READERS", "4")))
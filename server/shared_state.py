@@ -0,0 +1,253 @@
+"""
+Shared state for multi-worker deployments
+
+When the server runs with several uvicorn workers, the supervisor process
+hosts a SharedStateBroker on a local socket (a Unix domain socket, or a named
+pipe on Windows):
+
+- a pub/sub bus, so a broadcast made in one worker reaches WebSocket clients
+  connected to every other worker;
+- a single-writer settings service: the broker owns the only SettingsManager
+  (and therefore the only handle on the Mongita store) and executes settings
+  calls one at a time, so save_settings / save_event stay consistent.
+
+Workers find the broker through the JARVIS_SHARED_STATE_ADDRESS and
+JARVIS_SHARED_STATE_AUTHKEY environment variables set by the supervisor.
+"""
+
+import asyncio
+import os
+import threading
+from multiprocessing.connection import Client, Listener
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from metrics import settings_op_seconds
+from jarvis_logging import get_logger
+
+log = get_logger("shared_state")
+
+ADDRESS_ENV = "JARVIS_SHARED_STATE_ADDRESS"
+AUTHKEY_ENV = "JARVIS_SHARED_STATE_AUTHKEY"
+
+# SettingsManager methods workers may call through the broker
+RPC_METHODS = (
+    "get_settings",
+    "update_settings",
+    "get_events",
+    "save_event",
+    "update_event",
+    "delete_event",
+    "get_face_recognition_models",
+    "save_face_recognition_model",
+    "save_face_upload_model",
+    "delete_face_recognition_model",
+)
+
+
+def shared_state_from_env() -> Optional[Tuple[str, bytes]]:
+    """(address, authkey) of the broker if this process is a worker, else None"""
+    address = os.environ.get(ADDRESS_ENV)
+    authkey = os.environ.get(AUTHKEY_ENV)
+    if not address or not authkey:
+        return None
+    return address, bytes.fromhex(authkey)
+
+
+class SharedStateBroker:
+    """Pub/sub bus and single-writer settings service, run by the supervisor process"""
+
+    def __init__(self, settings_manager, authkey: Optional[bytes] = None):
+        self.settings_manager = settings_manager
+        self.authkey = authkey or os.urandom(32)
+        self.listener = None
+        self.address = None
+        # Every settings call runs under this lock: one writer, calls applied in order
+        self._settings_lock = threading.Lock()
+        self._bus_lock = threading.Lock()
+        # bus connection -> (send lock, subscribed topics)
+        self._bus_clients: Dict[Any, Tuple[threading.Lock, set]] = {}
+        self._closed = False
+
+    def start(self) -> str:
+        # Default family: AF_UNIX on POSIX, AF_PIPE (named pipe) on Windows
+        self.listener = Listener(authkey=self.authkey)
+        self.address = self.listener.address
+        threading.Thread(target=self._accept_loop, name="shared-state-accept", daemon=True).start()
+        return self.address
+
+    def export_env(self):
+        """Publish the broker location to worker processes started after this call"""
+        os.environ[ADDRESS_ENV] = self.address
+        os.environ[AUTHKEY_ENV] = self.authkey.hex()
+
+    def close(self):
+        self._closed = True
+        if self.listener is not None:
+            self.listener.close()
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                conn = self.listener.accept()
+            except Exception as e:
+                if not self._closed:
+                    log.warning("Shared state broker rejected a connection: %s", e)
+                continue
+            threading.Thread(target=self._serve, args=(conn,), name="shared-state-conn", daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            kind, role = conn.recv()
+            if kind != "hello":
+                return
+            if role == "rpc":
+                self._serve_rpc(conn)
+            elif role == "bus":
+                self._serve_bus(conn)
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._bus_lock:
+                self._bus_clients.pop(conn, None)
+            conn.close()
+
+    def _serve_rpc(self, conn):
+        try:
+            while True:
+                kind, method, args, kwargs = conn.recv()
+                if kind != "call" or method not in RPC_METHODS:
+                    conn.send(("error", f"Unknown settings method: {method}"))
+                    continue
+                try:
+                    with self._settings_lock:
+                        result = getattr(self.settings_manager, method)(*args, **kwargs)
+                    conn.send(("ok", result))
+                except Exception as e:
+                    conn.send(("error", str(e)))
+        finally:
+            # Each worker connection is served on its own thread; close that thread's store connection
+            with self._settings_lock:
+                self.settings_manager.close_thread()
+
+    def _serve_bus(self, conn):
+        send_lock, topics = threading.Lock(), set()
+        with self._bus_lock:
+            self._bus_clients[conn] = (send_lock, topics)
+        while True:
+            message = conn.recv()
+            if message[0] == "subscribe":
+                topics.add(message[1])
+            elif message[0] == "publish":
+                self._fan_out(conn, message[1], message[2])
+
+    def _fan_out(self, sender, topic: str, payload: Any):
+        with self._bus_lock:
+            targets = [(c, lock) for c, (lock, topics) in self._bus_clients.items()
+                       if c is not sender and topic in topics]
+        for conn, send_lock in targets:
+            try:
+                with send_lock:
+                    conn.send(("message", topic, payload))
+            except (OSError, ValueError):
+                # The worker went away; its serving thread cleans up
+                pass
+
+
+class RemoteSettingsManager:
+    """SettingsManager stand-in used by workers: forwards every call to the broker"""
+
+    def __init__(self, address: str, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _call(self, method: str, *args, **kwargs):
+        with settings_op_seconds.labels(method).time(), self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._conn is None:
+                        self._conn = Client(self.address, authkey=self.authkey)
+                        self._conn.send(("hello", "rpc"))
+                    self._conn.send(("call", method, args, kwargs))
+                    status, result = self._conn.recv()
+                    break
+                except (EOFError, OSError):
+                    # Broker connection dropped; reconnect once before giving up
+                    self._conn = None
+                    if attempt == 2:
+                        raise
+        if status == "error":
+            raise RuntimeError(f"Settings service error in {method}: {result}")
+        return result
+
+    def get_settings(self) -> Dict[str, Any]:
+        return self._call("get_settings")
+
+    def update_settings(self, new_settings: Dict[str, Any]) -> bool:
+        return self._call("update_settings", new_settings)
+
+    def get_events(self) -> list:
+        return self._call("get_events")
+
+    def save_event(self, event_data: Dict[str, Any]) -> bool:
+        return self._call("save_event", event_data)
+
+    def update_event(self, event_data: Dict[str, Any]) -> bool:
+        return self._call("update_event", event_data)
+
+    def delete_event(self, event_id: str) -> bool:
+        return self._call("delete_event", event_id)
+
+    def get_face_recognition_models(self) -> list:
+        return self._call("get_face_recognition_models")
+
+    def save_face_recognition_model(self, model_data: Dict[str, Any]) -> bool:
+        return self._call("save_face_recognition_model", model_data)
+
+    def save_face_upload_model(self, model_data: Dict[str, Any]) -> Dict[str, Any]:
+        return self._call("save_face_upload_model", model_data)
+
+    def delete_face_recognition_model(self, model_id: str) -> bool:
+        return self._call("delete_face_recognition_model", model_id)
+
+
+class BusClient:
+    """Worker-side pub/sub connection delivering messages onto the asyncio loop"""
+
+    def __init__(self, address: str, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self._conn = None
+        self._send_lock = threading.Lock()
+
+    def start(self, loop: asyncio.AbstractEventLoop, topics,
+              handler: Callable[[str, Any], Awaitable[None]]):
+        self._conn = Client(self.address, authkey=self.authkey)
+        self._conn.send(("hello", "bus"))
+        for topic in topics:
+            self._conn.send(("subscribe", topic))
+
+        def reader():
+            while True:
+                try:
+                    _, topic, payload = self._conn.recv()
+                except (EOFError, OSError):
+                    return
+                asyncio.run_coroutine_threadsafe(handler(topic, payload), loop)
+
+        threading.Thread(target=reader, name="shared-state-bus", daemon=True).start()
+
+    def publish(self, topic: str, payload: Any):
+        if self._conn is None:
+            return
+        try:
+            with self._send_lock:
+                self._conn.send(("publish", topic, payload))
+        except (OSError, ValueError) as e:
+            log.warning("Failed to publish to shared state bus: %s", e)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
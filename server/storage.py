@@ -0,0 +1,387 @@
+"""
+Storage backends for SettingsManager
+
+SettingsManager keeps the request-level logic (field normalisation, image
+file cleanup, error handling) and delegates persistence to a SettingsStore:
+
+- MongitaSettingsStore: the original single settings document in a
+  MongitaClientDisk directory (./db). Every event or model write rewrites the
+  whole array.
+- SQLiteSettingsStore: one SQLite database in WAL mode with tables for
+  settings, events and face models, so single-item writes touch one row and
+  readers never wait for the writer. Each thread gets its own connection,
+  closed by close_thread() when a thread that serves settings calls exits;
+  statements are fixed strings, prepared once per connection by sqlite3's
+  statement cache. On first open it imports an existing Mongita ./db,
+  reading it without writing anything.
+
+Select with JARVIS_STORAGE=mongita (default) or JARVIS_STORAGE=sqlite.
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from jarvis_logging import get_logger
+
+log = get_logger("storage")
+
+MONGITA = "mongita"
+SQLITE = "sqlite"
+
+DEFAULT_SETTINGS = {
+    "useVideo": True,
+    "theme": "dark",
+    "notifications": True,
+    "auto_update": False,
+    "city": "New York",
+    "use24hrFormat": False,
+    "useFaceRecognition": False,
+    "faceRecognitionModels": [],
+    "events": []
+}
+
+
+def default_settings() -> Dict[str, Any]:
+    return copy.deepcopy(DEFAULT_SETTINGS)
+
+
+class SettingsStore:
+    """Persistence primitives behind SettingsManager"""
+    # Whether reads may run on other threads while a write is in progress
+    concurrent_reads = False
+
+    def get_settings(self) -> Optional[Dict[str, Any]]:
+        """The whole settings document, including events and faceRecognitionModels"""
+        raise NotImplementedError
+
+    def update_settings(self, values: Dict[str, Any]) -> bool:
+        raise NotImplementedError
+
+    def get_events(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def add_event(self, event: Dict[str, Any]) -> bool:
+        raise NotImplementedError
+
+    def replace_event(self, event: Dict[str, Any]) -> bool:
+        """Replace the stored event(s) with event's id; False if there is none"""
+        raise NotImplementedError
+
+    def delete_event(self, event_id: str) -> bool:
+        raise NotImplementedError
+
+    def get_models(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def add_model(self, model: Dict[str, Any]) -> bool:
+        raise NotImplementedError
+
+    def delete_model(self, model_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """(success, the removed model if there was one)"""
+        raise NotImplementedError
+
+    def close_thread(self):
+        """Release resources the calling thread holds (call before a worker thread exits)"""
+        pass
+
+    def close(self):
+        pass
+
+
+def read_mongita_settings(db_path: str) -> Optional[Dict[str, Any]]:
+    """Settings document of an existing Mongita store, read without creating or seeding anything"""
+    from mongita import MongitaClientDisk
+
+    client = MongitaClientDisk(db_path)
+    if "settings_db" not in client.list_database_names():
+        return None
+    db = client.settings_db
+    if "settings" not in db.list_collection_names():
+        return None
+    settings_doc = db.settings.find_one({})
+    if settings_doc:
+        settings_doc.pop('_id', None)
+    return settings_doc or None
+
+
+class MongitaSettingsStore(SettingsStore):
+    def __init__(self, db_path: str = "./db"):
+        from mongita import MongitaClientDisk
+
+        # Create the database directory if it doesn't exist
+        os.makedirs(db_path, exist_ok=True)
+        self.client = MongitaClientDisk(db_path)
+        self.db = self.client.settings_db
+        self.settings_collection = self.db.settings
+
+        # Initialize default settings if collection is empty
+        if self.settings_collection.count_documents({}) == 0:
+            self.settings_collection.insert_one(default_settings())
+
+    def get_settings(self) -> Optional[Dict[str, Any]]:
+        settings_doc = self.settings_collection.find_one({})
+        if settings_doc:
+            # Remove the _id field from the result
+            settings_doc.pop('_id', None)
+        return settings_doc
+
+    def update_settings(self, values: Dict[str, Any]) -> bool:
+        # Get the first document (there should only be one settings doc)
+        existing_doc = self.settings_collection.find_one({})
+        if existing_doc:
+            result = self.settings_collection.update_one({"_id": existing_doc["_id"]}, {"$set": values})
+            return result.modified_count > 0
+        self.settings_collection.insert_one(values)
+        return True
+
+    def get_events(self) -> List[Dict[str, Any]]:
+        settings_doc = self.settings_collection.find_one({})
+        return settings_doc.get('events', []) if settings_doc else []
+
+    def add_event(self, event: Dict[str, Any]) -> bool:
+        existing_doc = self.settings_collection.find_one({})
+        if existing_doc:
+            current_events = existing_doc.get('events', [])
+            current_events.append(event)
+            result = self.settings_collection.update_one(
+                {"_id": existing_doc["_id"]},
+                {"$set": {"events": current_events}}
+            )
+            return result.modified_count >= 0  # Success if no error occurred
+        self.settings_collection.insert_one({"events": [event]})
+        return True
+
+    def replace_event(self, event: Dict[str, Any]) -> bool:
+        existing_doc = self.settings_collection.find_one({})
+        if not existing_doc or 'events' not in existing_doc:
+            return False
+        found = False
+        updated_events = []
+        for stored in existing_doc.get('events', []):
+            if stored.get('id') == event.get('id'):
+                updated_events.append(event)
+                found = True
+            else:
+                updated_events.append(stored)
+        if not found:
+            return False
+        result = self.settings_collection.update_one(
+            {"_id": existing_doc["_id"]},
+            {"$set": {"events": updated_events}}
+        )
+        return result.modified_count > 0
+
+    def delete_event(self, event_id: str) -> bool:
+        existing_doc = self.settings_collection.find_one({})
+        if not existing_doc or 'events' not in existing_doc:
+            return False
+        updated_events = [e for e in existing_doc.get('events', []) if e.get('id') != event_id]
+        result = self.settings_collection.update_one(
+            {"_id": existing_doc["_id"]},
+            {"$set": {"events": updated_events}}
+        )
+        return result.modified_count >= 0
+
+    def get_models(self) -> List[Dict[str, Any]]:
+        settings_doc = self.settings_collection.find_one({})
+        return settings_doc.get('faceRecognitionModels', []) if settings_doc else []
+
+    def add_model(self, model: Dict[str, Any]) -> bool:
+        existing_doc = self.settings_collection.find_one({})
+        if existing_doc:
+            current_models = existing_doc.get('faceRecognitionModels', [])
+            current_models.append(model)
+            result = self.settings_collection.update_one(
+                {"_id": existing_doc["_id"]},
+                {"$set": {"faceRecognitionModels": current_models}}
+            )
+            return result.modified_count >= 0  # Success if no error occurred
+        self.settings_collection.insert_one({"faceRecognitionModels": [model]})
+        return True
+
+    def delete_model(self, model_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        existing_doc = self.settings_collection.find_one({})
+        if not existing_doc or 'faceRecognitionModels' not in existing_doc:
+            return False, None
+        current_models = existing_doc.get('faceRecognitionModels', [])
+        removed = next((m for m in current_models if m.get('id') == model_id), None)
+        updated_models = [m for m in current_models if m.get('id') != model_id]
+        result = self.settings_collection.update_one(
+            {"_id": existing_doc["_id"]},
+            {"$set": {"faceRecognitionModels": updated_models}}
+        )
+        return result.modified_count >= 0, removed
+
+
+class SQLiteSettingsStore(SettingsStore):
+    # WAL readers see the last committed state and never wait for the writer
+    concurrent_reads = True
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS events (seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT, data TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS events_id ON events (id);
+        CREATE TABLE IF NOT EXISTS face_models (seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT, data TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS face_models_id ON face_models (id);
+    """
+    # Keys of the settings document that live in their own tables
+    EVENTS_KEY = "events"
+    MODELS_KEY = "faceRecognitionModels"
+
+    def __init__(self, path: str = "./settings.sqlite3", migrate_from: Optional[str] = None):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+        if conn.execute("SELECT value FROM meta WHERE key = 'initialized'").fetchone() is None:
+            self._initialize(migrate_from)
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection (SQLite connections must not be shared between threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Each connection is only used by the thread that opened it; close() may run elsewhere
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _initialize(self, migrate_from: Optional[str]):
+        document, source = None, "defaults"
+        if migrate_from and os.path.isdir(migrate_from):
+            try:
+                # Read only: an empty or partial ./db is left exactly as it is
+                document = read_mongita_settings(migrate_from)
+                source = f"mongita:{os.path.abspath(migrate_from)}"
+            except Exception as e:
+                log.warning("Could not migrate settings from %s: %s", migrate_from, e)
+        if not document:
+            document, source = default_settings(), "defaults"
+
+        conn = self._conn()
+        with conn:
+            self._write_settings(conn, document)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('initialized', ?)", (source,))
+        log.info("Initialized SQLite settings store", extra={
+            "path": self.path,
+            "source": source,
+            "events": len(document.get(self.EVENTS_KEY, [])),
+            "models": len(document.get(self.MODELS_KEY, [])),
+        })
+
+    def _write_settings(self, conn: sqlite3.Connection, values: Dict[str, Any]):
+        for key, value in values.items():
+            if key == "_id":
+                continue
+            if key == self.EVENTS_KEY:
+                conn.execute("DELETE FROM events")
+                conn.executemany("INSERT INTO events (id, data) VALUES (?, ?)",
+                                 [(e.get("id"), json.dumps(e)) for e in value or []])
+            elif key == self.MODELS_KEY:
+                conn.execute("DELETE FROM face_models")
+                conn.executemany("INSERT INTO face_models (id, data) VALUES (?, ?)",
+                                 [(m.get("id"), json.dumps(m)) for m in value or []])
+            else:
+                conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def get_settings(self) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        # One read transaction: the three tables come from the same committed state
+        conn.execute("BEGIN")
+        try:
+            settings = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM settings")}
+            settings[self.MODELS_KEY] = self._models(conn)
+            settings[self.EVENTS_KEY] = self._events(conn)
+        finally:
+            conn.execute("COMMIT")
+        return settings
+
+    def update_settings(self, values: Dict[str, Any]) -> bool:
+        conn = self._conn()
+        with conn:
+            self._write_settings(conn, values)
+        return True
+
+    def get_events(self) -> List[Dict[str, Any]]:
+        return self._events(self._conn())
+
+    def _events(self, conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+        return [json.loads(data) for (data,) in conn.execute("SELECT data FROM events ORDER BY seq")]
+
+    def add_event(self, event: Dict[str, Any]) -> bool:
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT INTO events (id, data) VALUES (?, ?)", (event.get("id"), json.dumps(event)))
+        return True
+
+    def replace_event(self, event: Dict[str, Any]) -> bool:
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute("UPDATE events SET data = ? WHERE id = ?", (json.dumps(event), event.get("id")))
+        return cursor.rowcount > 0
+
+    def delete_event(self, event_id: str) -> bool:
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM events WHERE id = ?", (event_id,))
+        return True
+
+    def get_models(self) -> List[Dict[str, Any]]:
+        return self._models(self._conn())
+
+    def _models(self, conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+        return [json.loads(data) for (data,) in conn.execute("SELECT data FROM face_models ORDER BY seq")]
+
+    def add_model(self, model: Dict[str, Any]) -> bool:
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT INTO face_models (id, data) VALUES (?, ?)", (model.get("id"), json.dumps(model)))
+        return True
+
+    def delete_model(self, model_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        conn = self._conn()
+        with conn:
+            row = conn.execute("SELECT data FROM face_models WHERE id = ? ORDER BY seq LIMIT 1", (model_id,)).fetchone()
+            conn.execute("DELETE FROM face_models WHERE id = ?", (model_id,))
+        return True, json.loads(row[0]) if row else None
+
+    def close_thread(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        del self._local.conn
+        with self._connections_lock:
+            self._connections.remove(conn)
+        conn.close()
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def open_store(backend: Optional[str] = None, path: Optional[str] = None) -> SettingsStore:
+    """Store for JARVIS_STORAGE (or backend); path overrides the backend's default location"""
+    backend = (backend or os.environ.get("JARVIS_STORAGE", MONGITA)).lower()
+    if backend == MONGITA:
+        return MongitaSettingsStore(path or "./db")
+    if backend == SQLITE:
+        return SQLiteSettingsStore(
+            path or os.environ.get("JARVIS_SQLITE_PATH", "./settings.sqlite3"),
+            migrate_from=os.environ.get("JARVIS_STORAGE_MIGRATE_FROM", "./db"),
+        )
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,305 @@
+"""
+System telemetry for the /info stream
+
+One TelemetrySampler per process collects CPU, memory, network, GPU and
+uptime on a background task and keeps a fixed-size in-memory history, so the
+cost of sampling no longer grows with the number of /info connections.
+
+Every sample also carries the extended fields: per-core CPU ("cores"), every
+NVML device ("gpus": utilization, memory, temperature), the server process
+("process": RSS, threads, CPU) and the server's own queues and pools
+("queues", from providers registered with register_stats). Without NVML
+(no pynvml, no driver) "gpus" is empty and GPU reads 0.
+
+Each /info connection negotiates its own interval, either at connect
+(/info?interval=0.5&delta=1&extended=1) or later in-band:
+    {"type": "subscribe", "interval": 60, "delta": true, "extended": true}
+    {"type": "history", "request_id": "...", "since": <unix ts>, "until": <unix ts>, "max_points": 300}
+
+History requests are answered from the ring-file store in tsdb.py (raw,
+1-minute and 1-hour tiers, picked from "since" unless "resolution" is given),
+or from the in-memory history for "resolution": "memory" or when persistence
+is disabled (JARVIS_TSDB_DIR=off).
+
+Without negotiation a connection gets the original full frame every 5 s.
+Delta subscribers get a keyframe {"t", "full"} followed by {"t", "d"} frames
+holding only the fields that changed at the negotiated precision; a keyframe is
+repeated every KEYFRAME_EVERY frames so clients can resync.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+import psutil
+
+from jarvis_logging import get_logger
+from tsdb import open_store
+
+try:
+    import pynvml
+except ImportError:
+    pynvml = None
+
+log = get_logger("telemetry")
+
+DEFAULT_INTERVAL = 5.0
+MIN_INTERVAL = 0.25
+MAX_INTERVAL = 600.0
+# Sampling period when no subscriber asks for anything faster; also the history resolution
+BASE_PERIOD = 1.0
+# One hour of history at BASE_PERIOD
+HISTORY_SIZE = 3600
+TSDB_DIR = os.environ.get("JARVIS_TSDB_DIR", "./tsdb")
+KEYFRAME_EVERY = 60
+# Advances on its own; delta subscribers get it in keyframes and extrapolate
+DELTA_EXCLUDED = ("UP_TIME",)
+# Sent only to subscribers that asked for extended telemetry
+EXTENDED_FIELDS = ("cores", "gpus", "process", "queues")
+
+
+def _round(value, precision: int):
+    if isinstance(value, float):
+        return round(value, precision)
+    if isinstance(value, dict):
+        return {k: _round(v, precision) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_round(v, precision) for v in value]
+    return value
+
+
+def _nvml_value(read: Callable[[], Any]):
+    """One NVML reading, or None if the device does not support it"""
+    try:
+        return read()
+    except pynvml.NVMLError:
+        return None
+
+
+def clamp_interval(value, default: float = DEFAULT_INTERVAL) -> float:
+    try:
+        interval = float(value)
+    except (TypeError, ValueError):
+        return default
+    return min(MAX_INTERVAL, max(MIN_INTERVAL, interval))
+
+
+class Subscription:
+    """Negotiated stream settings of one /info connection"""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, delta: bool = False,
+                 extended: bool = False, precision: int = 1):
+        self.interval = interval
+        self.delta = delta
+        self.extended = extended
+        self.precision = precision
+        self._last_sent: Optional[Dict[str, Any]] = None
+        self._frames = 0
+
+    def reset(self):
+        self._last_sent = None
+        self._frames = 0
+
+    def frame(self, sample: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Next frame for this subscriber, or None if a delta frame would be empty"""
+        if not self.extended:
+            sample = {k: v for k, v in sample.items() if k not in EXTENDED_FIELDS}
+        if not self.delta:
+            return sample
+        values = {k: _round(v, self.precision) for k, v in sample.items() if k != "t"}
+        if self._last_sent is None or self._frames % KEYFRAME_EVERY == 0:
+            self._last_sent = values
+            self._frames += 1
+            return {"t": sample["t"], "full": values}
+        changed = {k: v for k, v in values.items()
+                   if k not in DELTA_EXCLUDED and self._last_sent.get(k) != v}
+        self._frames += 1
+        if not changed:
+            return None
+        self._last_sent.update(changed)
+        return {"t": sample["t"], "d": changed}
+
+
+class TelemetrySampler:
+    def __init__(self, base_period: float = BASE_PERIOD, history_size: int = HISTORY_SIZE):
+        self.base_period = base_period
+        self.history = deque(maxlen=history_size)
+        self.latest: Optional[Dict[str, Any]] = None
+        self.subscriptions = set()
+        self._task = None
+        self._wakeup = asyncio.Event()
+        self._first_sample = asyncio.Event()
+        self._prev_net_bytes = None
+        self._prev_net_time = None
+        self._process = psutil.Process()
+        self._stats_providers: Dict[str, Callable[[], Any]] = {}
+        self._gpus = None  # [(index, name, handle)] once NVML is initialised; [] without NVML
+        self.store = None
+
+    @property
+    def period(self) -> float:
+        """Sampling period: the fastest subscriber interval, but at least every base_period"""
+        return min([self.base_period] + [s.interval for s in self.subscriptions])
+
+    def start(self):
+        if self._gpus is None:
+            self._gpus = self._init_gpus()
+        if self.store is None and TSDB_DIR.lower() != "off":
+            self.store = open_store(TSDB_DIR)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._gpus:
+            _nvml_value(pynvml.nvmlShutdown)
+        self._gpus = None
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def register_stats(self, name: str, provider: Callable[[], Any]):
+        """Report provider() under "queues" in every sample (called on the event loop)"""
+        self._stats_providers[name] = provider
+
+    def _init_gpus(self) -> list:
+        if pynvml is None:
+            log.info("pynvml is not installed; GPU telemetry disabled")
+            return []
+        try:
+            pynvml.nvmlInit()
+            gpus = []
+            for index in range(pynvml.nvmlDeviceGetCount()):
+                handle = pynvml.nvmlDeviceGetHandleByIndex(index)
+                name = pynvml.nvmlDeviceGetName(handle)
+                gpus.append((index, name.decode() if isinstance(name, bytes) else name, handle))
+            return gpus
+        except pynvml.NVMLError as e:
+            log.info("NVML unavailable (%s); GPU telemetry disabled", e)
+            return []
+
+    def subscribe(self, subscription: Subscription):
+        self.subscriptions.add(subscription)
+        self._wakeup.set()
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.discard(subscription)
+
+    def changed(self):
+        """Call after a subscription's interval changed"""
+        self._wakeup.set()
+
+    async def wait_ready(self):
+        await self._first_sample.wait()
+
+    async def _run(self):
+        while True:
+            try:
+                # psutil and NVML calls can block for milliseconds; keep them off the loop
+                sample = await asyncio.to_thread(self.collect)
+                sample["queues"] = self._collect_stats()
+                self.latest = sample
+                # History stays at base_period resolution however fast subscribers poll
+                if not self.history or sample["t"] - self.history[-1]["t"] >= self.base_period * 0.95:
+                    self.history.append(sample)
+                    if self.store is not None:
+                        await asyncio.to_thread(self.store.append, sample)
+                self._first_sample.set()
+            except Exception as e:
+                log.warning("Telemetry sample failed: %s", e)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.period)
+            except asyncio.TimeoutError:
+                pass
+
+    def collect(self) -> Dict[str, Any]:
+        now = time.time()
+        cpu = psutil.cpu_percent()
+        memory = psutil.virtual_memory().percent
+        up_time = now - psutil.boot_time()
+
+        # Network percent over the interval between samples
+        net_io = psutil.net_io_counters()
+        curr_bytes = net_io.bytes_sent + net_io.bytes_recv
+        if self._prev_net_bytes is None:
+            net = 0.0
+        else:
+            delta_t = max(now - self._prev_net_time, 1e-6)
+            bps = ((curr_bytes - self._prev_net_bytes) * 8) / delta_t  # bits per second
+            total_mbps = sum(s.speed for s in psutil.net_if_stats().values() if s.isup and s.speed)
+            net = min(100.0, (bps / (total_mbps * 1_000_000)) * 100) if total_mbps else 0.0
+        self._prev_net_bytes = curr_bytes
+        self._prev_net_time = now
+
+        gpus = self._collect_gpus()
+        # Aggregate GPU stays the first device's utilization, as before
+        gpu = float(gpus[0]["util"] or 0.0) if gpus else 0.0
+
+        with self._process.oneshot():
+            process = {
+                "rss_mb": self._process.memory_info().rss / 2**20,
+                "threads": self._process.num_threads(),
+                "cpu": self._process.cpu_percent(),
+            }
+
+        return {
+            "t": now, "CPU": cpu, "Memory": memory, "Network": net, "GPU": gpu, "UP_TIME": up_time,
+            "cores": psutil.cpu_percent(percpu=True),
+            "gpus": gpus,
+            "process": process,
+        }
+
+    def _collect_gpus(self) -> List[Dict[str, Any]]:
+        gpus = []
+        for index, name, handle in self._gpus or ():
+            util = _nvml_value(lambda: pynvml.nvmlDeviceGetUtilizationRates(handle))
+            memory = _nvml_value(lambda: pynvml.nvmlDeviceGetMemoryInfo(handle))
+            gpus.append({
+                "index": index,
+                "name": name,
+                "util": float(util.gpu) if util else None,
+                "memory_used_mb": memory.used / 2**20 if memory else None,
+                "memory_total_mb": memory.total / 2**20 if memory else None,
+                "temperature": _nvml_value(
+                    lambda: pynvml.nvmlDeviceGetTemperature(handle, pynvml.NVML_TEMPERATURE_GPU)),
+            })
+        return gpus
+
+    def _collect_stats(self) -> Dict[str, Any]:
+        stats = {}
+        for name, provider in self._stats_providers.items():
+            try:
+                stats[name] = provider()
+            except Exception as e:
+                log.debug("Stats provider %s failed: %s", name, e)
+                stats[name] = None
+        return stats
+
+    async def query(self, since: Optional[float] = None, until: Optional[float] = None,
+                    fields: Optional[List[str]] = None, max_points: Optional[int] = None,
+                    resolution: str = "auto") -> Dict[str, Any]:
+        """History in [since, until], optionally restricted to fields and thinned to max_points"""
+        since = float(since) if since is not None else None
+        until = float(until) if until is not None else None
+        max_points = int(max_points) if max_points else None
+        if self.store is not None and resolution != "memory":
+            return await asyncio.to_thread(self.store.query, since, until, fields, resolution, max_points)
+        return {"resolution": "memory", "samples": self.query_memory(since, until, fields, max_points)}
+
+    def query_memory(self, since: Optional[float], until: Optional[float],
+                     fields: Optional[List[str]], max_points: Optional[int]) -> List[Dict[str, Any]]:
+        samples = [s for s in list(self.history)
+                   if (since is None or s["t"] >= since) and (until is None or s["t"] <= until)]
+        if max_points and len(samples) > max_points:
+            stride = len(samples) / max_points
+            samples = [samples[int(i * stride)] for i in range(max_points)]
+        if fields:
+            samples = [{k: v for k, v in s.items() if k == "t" or k in fields} for s in samples]
+        return samples
+
+
+sampler = TelemetrySampler()
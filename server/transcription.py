@@ -0,0 +1,95 @@
+"""
+Streaming transcription after a wake word
+
+A /hotword client that connects with ?transcribe=true gets the speech that
+follows each wake word transcribed on the same connection. After
+wakeword_detected the connection's decoder switches to language-model search
+and the client receives
+
+    {"event": "transcript_partial", "text": "..."}     whenever the hypothesis changes
+    {"event": "transcript_final", "text": "...", "score": ..., "reason": "..."}
+
+The utterance ends when voice activity detection sees the speech stop
+(reason "endpoint"), when no speech starts within TRANSCRIBE_SILENCE_TIMEOUT
+seconds ("no_speech"), or after TRANSCRIBE_MAX_SECONDS ("max_duration"). The
+decoder then returns to wake word detection; nothing is reconnected or
+reloaded.
+
+Configuration (environment):
+    JARVIS_TRANSCRIBE_MAX_SECONDS        longest transcription (15)
+    JARVIS_TRANSCRIBE_SILENCE_TIMEOUT    wait for speech to start (5)
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+from pocketsphinx import Endpointer
+
+from metrics import transcriptions
+from wakeword import KeywordDecoder
+from jarvis_logging import get_logger
+
+log = get_logger("hotword")
+
+TRANSCRIBE_MAX_SECONDS = float(os.environ.get("JARVIS_TRANSCRIBE_MAX_SECONDS", "15"))
+TRANSCRIBE_SILENCE_TIMEOUT = float(os.environ.get("JARVIS_TRANSCRIBE_SILENCE_TIMEOUT", "5"))
+
+# 16-bit mono samples
+SAMPLE_BYTES = 2
+
+
+class Transcription:
+    """One utterance transcribed after a wake word; feed it chunks until done"""
+
+    def __init__(self, decoder: KeywordDecoder, sample_rate: int = 16000):
+        self.decoder = decoder
+        self.sample_rate = sample_rate
+        self.endpointer = Endpointer(sample_rate=sample_rate)
+        self.done = False
+        self._pending = b""
+        self._speech_started = False
+        self._audio_seconds = 0.0
+        self._last_partial = ""
+        decoder.listen()
+
+    def process(self, frames: bytes) -> List[Dict[str, Any]]:
+        """Decode a chunk; returns the events to send (partials, then the final transcript)"""
+        events = []
+        partial = self.decoder.transcribe(frames)
+        if partial and partial != self._last_partial:
+            self._last_partial = partial
+            events.append({"event": "transcript_partial", "text": partial})
+
+        self._audio_seconds += len(frames) / (SAMPLE_BYTES * self.sample_rate)
+        reason = self._endpoint(frames)
+        if reason is None and self._audio_seconds >= TRANSCRIBE_MAX_SECONDS:
+            reason = "max_duration"
+        if reason is None and not self._speech_started and self._audio_seconds >= TRANSCRIBE_SILENCE_TIMEOUT:
+            reason = "no_speech"
+        if reason is not None:
+            events.append(self.finish(reason))
+        return events
+
+    def _endpoint(self, frames: bytes) -> Optional[str]:
+        """Run voice activity detection over whole frames; "endpoint" once speech has stopped"""
+        data = self._pending + frames
+        size = self.endpointer.frame_bytes
+        offset = 0
+        while offset + size <= len(data):
+            self.endpointer.process(data[offset:offset + size])
+            offset += size
+            if self.endpointer.in_speech:
+                self._speech_started = True
+            elif self._speech_started:
+                self._pending = b""
+                return "endpoint"
+        self._pending = data[offset:]
+        return None
+
+    def finish(self, reason: str) -> Dict[str, Any]:
+        """Final transcript event; the decoder goes back to wake word detection"""
+        self.done = True
+        text, score = self.decoder.finish_listening()
+        transcriptions.labels(reason).inc()
+        log.info("Transcription finished", extra={"reason": reason, "text": text, "audio_seconds": round(self._audio_seconds, 2)})
+        return {"event": "transcript_final", "text": text, "score": score, "reason": reason}
@@ -0,0 +1,307 @@
+"""
+Ring-file time-series store for system telemetry
+
+Samples from the telemetry sampler are appended to fixed-size binary ring
+files, so memory and disk stay bounded however long the server runs:
+
+    raw.ring   one record per sample (1 s)     86400 records  (1 day)
+    1m.ring    per-minute mean / min / max      10080 records  (7 days)
+    1h.ring    per-hour mean / min / max         8760 records  (1 year)
+
+Each file is a 512-byte header (magic, version, field names, capacity, head
+and count) followed by `capacity` fixed-size little-endian records: a float64
+timestamp and float32 values. Downsampled tiers are aggregated in memory and
+written when a bucket closes; the open buckets are flushed on close().
+
+Only one process can own a store directory; other workers of a multi-worker
+deployment find it locked and run without persistence.
+"""
+
+import os
+import struct
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence
+
+import psutil
+
+from jarvis_logging import get_logger
+
+log = get_logger("tsdb")
+
+MAGIC = b"JTSD"
+VERSION = 1
+HEADER_SIZE = 512
+# magic, version, field count, capacity, head (next slot), count; field names follow
+HEADER = struct.Struct("<4sHHIII")
+
+# Telemetry fields persisted, as (store name, path into the sample)
+FIELDS = (
+    ("CPU", ("CPU",)),
+    ("Memory", ("Memory",)),
+    ("Network", ("Network",)),
+    ("GPU", ("GPU",)),
+    ("process_rss_mb", ("process", "rss_mb")),
+    ("process_threads", ("process", "threads")),
+)
+
+# name -> (bucket seconds, capacity); bucket 0 = raw samples
+TIERS = {
+    "raw": (0, 86400),
+    "1m": (60, 10080),
+    "1h": (3600, 8760),
+}
+
+
+def _field_value(sample: Dict[str, Any], path: Sequence[str]) -> float:
+    value = sample
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return float("nan")
+        value = value[key]
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _clean(value: float) -> Optional[float]:
+    return None if value != value else value  # NaN -> None
+
+
+class RingFile:
+    """Fixed-capacity circular file of fixed-size records, oldest overwritten first"""
+
+    def __init__(self, path: str, record: struct.Struct, capacity: int, fields: Sequence[str]):
+        self.path = path
+        self.record = record
+        self.capacity = capacity
+        self.fields = ",".join(fields).encode()
+        self.head = 0
+        self.count = 0
+        self._open()
+
+    def _open(self):
+        exists = os.path.exists(self.path)
+        # Unbuffered: every record reaches the OS as soon as it is appended
+        self.file = open(self.path, "r+b" if exists else "w+b", buffering=0)
+        if exists and self._read_header():
+            return
+        if exists:
+            log.warning("Time series file %s has a different layout; starting it over", self.path)
+        self.head = self.count = 0
+        self.file.truncate(0)
+        self._write_header()
+        self.file.truncate(HEADER_SIZE + self.capacity * self.record.size)
+
+    def _read_header(self) -> bool:
+        self.file.seek(0)
+        raw = self.file.read(HEADER_SIZE)
+        if len(raw) < HEADER_SIZE:
+            return False
+        magic, version, n_fields, capacity, head, count = HEADER.unpack_from(raw)
+        fields = raw[HEADER.size:].rstrip(b"\0")
+        if (magic, version, capacity, fields) != (MAGIC, VERSION, self.capacity, self.fields):
+            return False
+        self.head, self.count = head, count
+        return True
+
+    def _write_header(self):
+        header = HEADER.pack(MAGIC, VERSION, self.fields.count(b",") + 1, self.capacity, self.head, self.count)
+        self.file.seek(0)
+        self.file.write(header + self.fields.ljust(HEADER_SIZE - HEADER.size, b"\0"))
+
+    def append(self, values: Sequence):
+        self.file.seek(HEADER_SIZE + self.head * self.record.size)
+        self.file.write(self.record.pack(*values))
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self._write_header()
+
+    def _read(self, index: int) -> tuple:
+        """Record by logical index, 0 = oldest"""
+        slot = (self.head - self.count + index) % self.capacity
+        self.file.seek(HEADER_SIZE + slot * self.record.size)
+        return self.record.unpack(self.file.read(self.record.size))
+
+    def range(self, since: Optional[float], until: Optional[float]) -> List[tuple]:
+        """Records with since <= timestamp <= until, oldest first (timestamps are ascending)"""
+
+        class _Times:
+            def __len__(_):
+                return self.count
+
+            def __getitem__(_, index):
+                return self._read(index)[0]
+
+        times = _Times()
+        start = bisect_left(times, since) if since is not None else 0
+        records = []
+        for index in range(start, self.count):
+            record = self._read(index)
+            if until is not None and record[0] > until:
+                break
+            records.append(record)
+        return records
+
+    def close(self):
+        self.file.close()
+
+
+class _Bucket:
+    """Running mean / min / max of one downsampling bucket"""
+
+    def __init__(self, start: float, n_fields: int):
+        self.start = start
+        self.count = 0
+        self.sums = [0.0] * n_fields
+        self.seen = [0] * n_fields
+        self.mins = [float("nan")] * n_fields
+        self.maxs = [float("nan")] * n_fields
+
+    def add(self, values: Sequence[float]):
+        self.count += 1
+        for i, value in enumerate(values):
+            if value != value:
+                continue
+            self.sums[i] += value
+            self.seen[i] += 1
+            self.mins[i] = value if self.mins[i] != self.mins[i] else min(self.mins[i], value)
+            self.maxs[i] = value if self.maxs[i] != self.maxs[i] else max(self.maxs[i], value)
+
+    def record(self) -> list:
+        values = [self.start, self.count]
+        for i in range(len(self.sums)):
+            mean = self.sums[i] / self.seen[i] if self.seen[i] else float("nan")
+            values.extend((mean, self.mins[i], self.maxs[i]))
+        return values
+
+
+class TimeSeriesStore:
+    def __init__(self, directory: str, fields=FIELDS, tiers=TIERS):
+        self.directory = directory
+        self.fields = fields
+        self.names = [name for name, _ in fields]
+        self.tiers = tiers
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, "store.lock")
+        self._acquire_directory()
+
+        n = len(fields)
+        raw_record = struct.Struct("<d" + "f" * n)
+        aggregate_record = struct.Struct("<dI" + "fff" * n)
+        self.rings: Dict[str, RingFile] = {}
+        self._buckets: Dict[str, Optional[_Bucket]] = {}
+        for tier, (bucket_seconds, capacity) in tiers.items():
+            record = raw_record if bucket_seconds == 0 else aggregate_record
+            self.rings[tier] = RingFile(os.path.join(directory, f"{tier}.ring"), record, capacity, self.names)
+            if bucket_seconds:
+                self._buckets[tier] = None
+
+    def _acquire_directory(self):
+        try:
+            fd = os.open(self._lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(self._lock_path) as f:
+                    owner = int(f.read().strip() or 0)
+            except (OSError, ValueError):
+                owner = 0
+            if owner and owner != os.getpid() and psutil.pid_exists(owner):
+                raise RuntimeError(f"Time series store {self.directory} is in use by process {owner}")
+            # Left behind by a process that is gone
+            os.remove(self._lock_path)
+            fd = os.open(self._lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        with os.fdopen(fd, "w") as f:
+            f.write(str(os.getpid()))
+
+    def append(self, sample: Dict[str, Any]):
+        """Persist one telemetry sample and roll it into the downsampled tiers"""
+        t = float(sample["t"])
+        values = [_field_value(sample, path) for _, path in self.fields]
+        with self._lock:
+            for tier, (bucket_seconds, _) in self.tiers.items():
+                if bucket_seconds == 0:
+                    self.rings[tier].append([t] + values)
+                    continue
+                start = t - t % bucket_seconds
+                bucket = self._buckets[tier]
+                if bucket is not None and bucket.start != start:
+                    self.rings[tier].append(bucket.record())
+                    bucket = None
+                if bucket is None:
+                    bucket = self._buckets[tier] = _Bucket(start, len(self.fields))
+                bucket.add(values)
+
+    def pick_tier(self, since: Optional[float]) -> str:
+        """Finest tier whose retained range reaches back to since"""
+        if since is None:
+            return "raw"
+        with self._lock:
+            for tier in self.tiers:
+                ring = self.rings[tier]
+                if ring.count and (ring.count < ring.capacity or ring._read(0)[0] <= since):
+                    return tier
+        return list(self.tiers)[-1]
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              fields: Optional[List[str]] = None, resolution: str = "auto",
+              max_points: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Samples in [since, until] at one resolution ("raw", "1m", "1h" or "auto").
+
+        Downsampled samples carry the bucket mean under the field name and
+        <field>_min / <field>_max; raw samples carry the value only.
+        """
+        tier = self.pick_tier(since) if resolution == "auto" else resolution
+        if tier not in self.tiers:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        wanted = [name for name in self.names if not fields or name in fields]
+        with self._lock:
+            records = self.rings[tier].range(since, until)
+        if max_points and len(records) > max_points:
+            stride = len(records) / max_points
+            records = [records[int(i * stride)] for i in range(max_points)]
+
+        samples = []
+        aggregated = self.tiers[tier][0] > 0
+        for record in records:
+            sample = {"t": record[0]}
+            if aggregated:
+                sample["samples"] = record[1]
+                for i, name in enumerate(self.names):
+                    if name in wanted:
+                        mean, low, high = record[2 + 3 * i: 5 + 3 * i]
+                        sample[name] = _clean(mean)
+                        sample[f"{name}_min"] = _clean(low)
+                        sample[f"{name}_max"] = _clean(high)
+            else:
+                for i, name in enumerate(self.names):
+                    if name in wanted:
+                        sample[name] = _clean(record[1 + i])
+            samples.append(sample)
+        return {"resolution": tier, "samples": samples}
+
+    def close(self):
+        """Write the open downsampling buckets and release the directory"""
+        with self._lock:
+            for tier, bucket in self._buckets.items():
+                if bucket is not None and bucket.count:
+                    self.rings[tier].append(bucket.record())
+                self._buckets[tier] = None
+            for ring in self.rings.values():
+                ring.close()
+        try:
+            os.remove(self._lock_path)
+        except OSError:
+            pass
+
+
+def open_store(directory: str) -> Optional[TimeSeriesStore]:
+    """Open the store, or None if another process owns it or it cannot be opened"""
+    try:
+        return TimeSeriesStore(directory)
+    except (OSError, RuntimeError) as e:
+        log.info("Telemetry persistence disabled: %s", e)
+        return None
@@ -0,0 +1,258 @@
+"""
+Configurable wake words for /hotword
+
+The phrases come from the "wakeWords" setting, a list of entries such as
+
+    [{"phrase": "jarvis", "threshold": 1e-40},
+     {"phrase": "hey computer", "threshold": 1e-25, "user": "alice"}]
+
+(a bare string uses DEFAULT_THRESHOLD). Lower thresholds detect more eagerly;
+longer phrases usually want higher ones. "user" is optional and is reported
+back with the detection, so each person can have a wake word of their own.
+
+All phrases go into one pocketsphinx keyword-list (kws) search, so every audio
+chunk is decoded once however many phrases there are. Saving new phrases
+bumps WakeWords.version; each connection's KeywordDecoder notices before its
+next chunk and switches its existing decoder to a new kws search, without
+reloading the acoustic model. With several workers the new list is published
+on the shared state bus and every worker installs it.
+"""
+
+import os
+import re
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import wakeword_detections
+from jarvis_logging import get_logger
+
+log = get_logger("hotword")
+
+SETTINGS_KEY = "wakeWords"
+DEFAULT_THRESHOLD = 1e-40
+DEFAULT_WAKE_WORDS = [{"phrase": "jarvis", "threshold": DEFAULT_THRESHOLD}]
+# Decoder search used for transcription after a wake word
+LM_SEARCH = "lm"
+
+
+def parse_entries(value: Any) -> List[Dict[str, Any]]:
+    """Normalised wake word entries from a setting value; invalid entries are skipped"""
+    entries, seen = [], set()
+    for item in value if isinstance(value, list) else []:
+        if isinstance(item, str):
+            item = {"phrase": item}
+        if not isinstance(item, dict) or not isinstance(item.get("phrase"), str):
+            continue
+        phrase = " ".join(re.sub(r"[^\w' ]", " ", item["phrase"].lower()).split())
+        if not phrase or phrase in seen:
+            continue
+        try:
+            threshold = float(item.get("threshold", DEFAULT_THRESHOLD))
+        except (TypeError, ValueError):
+            threshold = DEFAULT_THRESHOLD
+        if not 0 < threshold < 1:
+            threshold = DEFAULT_THRESHOLD
+        entry = {"phrase": phrase, "threshold": threshold}
+        if item.get("user"):
+            entry["user"] = str(item["user"])
+        entries.append(entry)
+        seen.add(phrase)
+    return entries
+
+
+class WakeWords:
+    """The current wake word list, shared by every /hotword connection of this process"""
+    # Shared state bus topic carrying new wake word lists
+    BUS_TOPIC = "wake_words"
+
+    def __init__(self):
+        self.version = 0
+        self.entries: List[Dict[str, Any]] = []
+        self.keyfile: Optional[str] = None
+        self._dir: Optional[str] = None
+        self.bus = None
+        # Lists received on the bus before load(); None once loaded
+        self._early_values: Optional[List[Any]] = []
+        self._install(DEFAULT_WAKE_WORDS)
+
+    def load(self, settings: Dict[str, Any]):
+        self._install(settings.get(SETTINGS_KEY) or DEFAULT_WAKE_WORDS)
+        early, self._early_values = self._early_values or [], None
+        for value in early:
+            self._install(value)
+
+    def attach_bus(self, bus):
+        """Publish new lists to the other workers (pair with on_bus_message)"""
+        self.bus = bus
+
+    async def on_bus_message(self, topic: str, value: Any):
+        """Install a list saved through another worker"""
+        if topic != self.BUS_TOPIC:
+            return
+        if self._early_values is not None:
+            self._early_values.append(value)
+        else:
+            self._install(value)
+
+    def update(self, value: Any) -> bool:
+        """Install a new list in every worker; returns False if it is unchanged here or has no usable phrase"""
+        changed = self._install(value)
+        if self.bus is not None and parse_entries(value):
+            self.bus.publish(self.BUS_TOPIC, value)
+        return changed
+
+    def _install(self, value: Any) -> bool:
+        entries = parse_entries(value)
+        if not entries:
+            log.warning("Ignoring wake word setting without a usable phrase", extra={"value": str(value)})
+            return False
+        if entries == self.entries:
+            return False
+        self.entries = entries
+        self.version += 1
+        self._write_keyfile()
+        log.info("Wake words updated", extra={"version": self.version, "phrases": [e["phrase"] for e in entries]})
+        return True
+
+    def _write_keyfile(self):
+        # pocketsphinx reads keyword lists from a file: one "phrase /threshold/" per line
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix="jarvis-kws-")
+        previous = self.keyfile
+        self.keyfile = os.path.join(self._dir, f"wakewords-{self.version}.kws")
+        with open(self.keyfile, "w") as f:
+            for entry in self.entries:
+                f.write(f"{entry['phrase']} /{entry['threshold']:g}/\n")
+        if previous and os.path.exists(previous):
+            os.remove(previous)
+
+    def match(self, hypstr: str) -> Optional[Dict[str, Any]]:
+        """Entry for a kws hypothesis (the longest configured phrase it contains)"""
+        hypstr = " ".join(hypstr.lower().split())
+        found = [e for e in self.entries if f" {e['phrase']} " in f" {hypstr} "]
+        return max(found, key=lambda e: len(e["phrase"])) if found else None
+
+
+wake_words = WakeWords()
+
+
+class KeywordDecoder:
+    """A pocketsphinx decoder listening for the current wake word list
+
+    listen() switches the same decoder to language-model search for a
+    transcription (see transcription.py) and finish_listening() switches it
+    back; the LM is loaded into the decoder on first use and kept.
+    """
+
+    def __init__(self, decoder, lm_path: Optional[str] = None):
+        self.decoder = decoder
+        self.lm_path = lm_path
+        self.version = None
+        self.search = None
+        self.listening = False
+        self._lm_loaded = False
+        self._apply()
+
+    def _apply(self):
+        version = wake_words.version
+        name = f"kws-{version}"
+        try:
+            self.decoder.add_kws(name, wake_words.keyfile)
+            self.decoder.activate_search(name)
+        except Exception as e:
+            log.error("Failed to load wake words: %s", e, extra={"version": version})
+        else:
+            if self.search is not None:
+                self.decoder.remove_search(self.search)
+            self.search = name
+        # Do not retry a list the decoder rejected until it changes again
+        self.version = version
+
+    def start(self):
+        if self.listening:
+            self.decoder.activate_search(self.search)
+            self.listening = False
+        if self.version != wake_words.version:
+            self._apply()
+        self.decoder.start_utt()
+
+    def restart(self):
+        """End the utterance and start listening again, picking up new wake words"""
+        self.decoder.end_utt()
+        self.start()
+
+    def process(self, frames: bytes) -> Optional[Dict[str, Any]]:
+        """Decode a chunk; returns the detection ({"phrase", "score", "hypothesis", "user"?}) if a wake word fired"""
+        if self.version != wake_words.version:
+            self.restart()
+        self.decoder.process_raw(frames, False, False)
+        hyp = self.decoder.hyp()
+        if not hyp or not hyp.hypstr:
+            return None
+        entry = wake_words.match(hyp.hypstr)
+        detection = {
+            "phrase": entry["phrase"] if entry else hyp.hypstr.lower(),
+            "score": hyp.best_score,
+            "hypothesis": hyp.hypstr.lower(),
+        }
+        if entry and entry.get("user"):
+            detection["user"] = entry["user"]
+        # Only configured phrases become label values
+        wakeword_detections.labels(entry["phrase"] if entry else "unknown").inc()
+        return detection
+
+    def listen(self):
+        """End the keyword utterance and start a language-model one"""
+        self.decoder.end_utt()
+        try:
+            if not self._lm_loaded:
+                self.decoder.add_lm_file(LM_SEARCH, self.lm_path)
+                self._lm_loaded = True
+            self.decoder.activate_search(LM_SEARCH)
+        except Exception:
+            # Stay in keyword mode
+            self.decoder.start_utt()
+            raise
+        self.listening = True
+        self.decoder.start_utt()
+
+    def transcribe(self, frames: bytes) -> str:
+        """Decode a chunk in language-model mode; returns the partial transcript"""
+        self.decoder.process_raw(frames, False, False)
+        hyp = self.decoder.hyp()
+        return hyp.hypstr if hyp else ""
+
+    def finish_listening(self) -> Tuple[str, Optional[int]]:
+        """(final transcript, score), then back to wake word detection"""
+        self.decoder.end_utt()
+        hyp = self.decoder.hyp()
+        self.start()
+        return (hyp.hypstr, hyp.best_score) if hyp else ("", None)
+
+    def close(self):
+        try:
+            self.decoder.end_utt()
+        except Exception:
+            pass
+
+
+class DecoderPool:
+    """Idle KeywordDecoders kept for reuse, so a new /hotword connection skips model loading"""
+
+    def __init__(self, factory: Callable[[], KeywordDecoder], size: int = 4):
+        self.factory = factory
+        self.size = size
+        self._idle: List[KeywordDecoder] = []
+
+    def acquire(self) -> KeywordDecoder:
+        decoder = self._idle.pop() if self._idle else self.factory()
+        decoder.start()
+        return decoder
+
+    def release(self, decoder: KeywordDecoder):
+        decoder.close()
+        if len(self._idle) < self.size:
+            self._idle.append(decoder)
+
+    def idle(self) -> int:
+        return len(self._idle)
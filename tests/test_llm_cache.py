@@ -0,0 +1,129 @@
+"""
+LLMCallCache hit, miss and duplicate-request behaviour
+
+A stand-in model call (call_model) is wrapped the way AutoGen uses the cache:
+get(), the call on a miss, then set() with the response.
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server"))
+
+from llm_cache import LLMCallCache, new_usage  # noqa: E402
+
+KEY = '{"model": "stub", "messages": [{"role": "user", "content": "who is ada lovelace"}]}'
+
+
+class ModelDown(RuntimeError):
+    pass
+
+
+def call_model(cache, key, respond, usage=None):
+    """AutoGen's create(): serve a hit, otherwise call the model and store the response"""
+    with cache.guard(usage):
+        response = cache.get(key)
+        if response is None:
+            response = respond()
+            cache.set(key, response)
+        return response
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMCallCache(cache_dir=str(tmp_path), dedup_timeout=10.0)
+
+
+def test_miss_then_hit(cache):
+    calls = []
+    respond = lambda: calls.append(1) or {"content": "answer", "usage": {"total_tokens": 42}}
+
+    assert call_model(cache, KEY, respond)["content"] == "answer"
+    assert call_model(cache, KEY, respond)["content"] == "answer"
+
+    stats = cache.stats()
+    assert len(calls) == 1
+    assert (stats["hits"], stats["misses"], stats["tokens_saved"]) == (1, 1, 42)
+
+
+def test_usage_counts_only_lookups_inside_its_guard(cache):
+    respond = lambda: {"content": "answer", "usage": {"total_tokens": 42}}
+    call_model(cache, KEY, respond)
+
+    run = new_usage()
+    call_model(cache, KEY, respond, run)
+    call_model(cache, KEY + " again", respond, run)
+
+    assert (cache.stats(run)["hits"], cache.stats(run)["misses"], cache.stats(run)["tokens_saved"]) == (1, 1, 42)
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 2)
+
+
+def test_duplicate_waits_for_owner(cache):
+    owner_called = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        owner_called.set()
+        release.wait(5)
+        return {"content": "answer"}
+
+    owner = threading.Thread(target=call_model, args=(cache, KEY, slow))
+    owner.start()
+    owner_called.wait(5)
+
+    duplicate_calls = []
+    results = []
+    duplicate = threading.Thread(target=lambda: results.append(
+        call_model(cache, KEY, lambda: duplicate_calls.append(1) or {"content": "again"})))
+    duplicate.start()
+    time.sleep(0.1)
+    release.set()
+    owner.join(5)
+    duplicate.join(5)
+
+    assert results == [{"content": "answer"}]
+    assert duplicate_calls == []
+    assert cache.stats()["deduplicated"] == 1
+
+
+def test_failed_owner_does_not_stall_duplicates(cache):
+    owner_called = threading.Event()
+    fail = threading.Event()
+
+    def failing():
+        owner_called.set()
+        fail.wait(5)
+        raise ModelDown("Ollama is not running")
+
+    errors = []
+
+    def owner_run():
+        try:
+            call_model(cache, KEY, failing)
+        except ModelDown as e:
+            errors.append(e)
+
+    owner = threading.Thread(target=owner_run)
+    owner.start()
+    owner_called.wait(5)
+
+    results = []
+    started = time.monotonic()
+    duplicate = threading.Thread(target=lambda: results.append(call_model(cache, KEY, lambda: {"content": "retry"})))
+    duplicate.start()
+    time.sleep(0.1)
+    fail.set()
+    owner.join(5)
+    duplicate.join(5)
+
+    # The duplicate makes the call itself as soon as the owner fails, well before dedup_timeout
+    assert len(errors) == 1
+    assert results == [{"content": "retry"}]
+    assert time.monotonic() - started < 2
+    # A later request is a plain hit, with nothing left in flight
+    assert call_model(cache, KEY, lambda: pytest.fail("should be cached")) == {"content": "retry"}
+    assert cache._in_flight == {} and cache._miss_started == {}